@@ -1,19 +1,41 @@
 from process_txc.read_txc import process_all_xml
 from process_txc import transform
+from process_txc.incremental import transform_incremental
 from generate_outputs import output_hastus
+from helper.metrics import StageMetrics, step_runner
 
-def run_conversion(input_dir: str, output_dir: str, base_path) -> list[str]:
-    txc_tables_static = process_all_xml(input_dir)
-    transformed_tables = transform.transform_all_txc_tables(txc_tables_static, base_path=base_path)
-    return output_hastus.create_outputs(transformed_tables, output_dir)
+def run_conversion(source, output_dir: str, base_path, workers: int = 1, cache=None,
+                   output_mode: str = 'serial', metrics=None, state=None, s3_client=None) -> list[str]:
+    # source is a directory of TXC files, a ZIP archive path or a seekable binary file holding one
+    # metrics is an optional helper.metrics.StageMetrics recording each stage and the transform steps within it
+    # state is optional process_txc.incremental state; with it only the lines changed since the last run are transformed
+    # s3_client streams the outputs when output_dir is 's3://bucket/prefix'; one is made if it isn't given
+    measure = step_runner(metrics)
+    txc_tables_static = measure(process_all_xml, source, workers=workers, cache=cache)
+    if state is not None:
+        transformed_tables = measure(transform_incremental, txc_tables_static, state, base_path=base_path, metrics=metrics)
+    else:
+        transformed_tables = measure(transform.transform_all_txc_tables, txc_tables_static, base_path=base_path, metrics=metrics)
+    return measure(output_hastus.create_outputs, transformed_tables, output_dir, mode=output_mode, s3_client=s3_client)
 
 
 # 🧪 For local testing only
 if __name__ == '__main__':
     import os
     from helper.utils import get_input_dir, get_output_dir
+    from process_txc.cache import open_cache
+    from process_txc.incremental import open_state
+    from helper.copy_on_write import enable_copy_on_write
+    enable_copy_on_write(os.getenv("COPY_ON_WRITE", "false").lower() == "true")  # before any table is built
     input_dir = get_input_dir()
     output_dir = get_output_dir()
     base_path = os.getenv("LAMBDA_TASK_ROOT", os.getcwd())
     os.makedirs(output_dir, exist_ok=True)
-    run_conversion(input_dir, output_dir, base_path=base_path)
+    cache = open_cache(os.getenv("TXC_CACHE"))  # local directory or s3://bucket/prefix
+    output_mode = os.getenv("OUTPUT_MODE", "thread")  # serial, thread or process
+    state = open_state(os.getenv("TXC_STATE"))  # local directory or s3://bucket/prefix, one per region
+    metrics = None
+    if os.getenv("METRICS") or os.getenv("PROFILE"):
+        metrics = StageMetrics(os.getenv("METRICS", "json"), profiler=os.getenv("PROFILE"))  # PROFILE: cprofile or pyinstrument
+    run_conversion(input_dir, output_dir, base_path=base_path, workers=os.cpu_count() or 1, cache=cache,
+                   output_mode=output_mode, metrics=metrics, state=state)
@@ -0,0 +1,38 @@
+import pandas as pd
+
+
+def format_records(record_type, *fields):
+    """Build one '|'-separated HASTUS record per row, e.g. format_records('stop', ids, names, places).
+
+    Fields are columns (Series sharing an index) or constants. Values are rendered with str(), as an f-string would,
+    so a whole record type is built as one string column instead of row by row.
+    """
+    lines = record_type
+    for field in fields:
+        lines = lines + '|' + (field.astype(str) if isinstance(field, pd.Series) else str(field))
+    return lines
+
+
+def interleave(*columns):
+    """Alternate the lines of equally long columns row by row: row 0 of each column in turn, then row 1, ..."""
+    return pd.concat([column.reset_index(drop=True) for column in columns]).sort_index(kind='stable')
+
+
+def order_records(*parts):
+    """Put record lines from several (keys, lines) parts in the order of their keys.
+
+    keys is a DataFrame of sort columns on the same index as lines. Lines with equal keys keep their part order.
+    """
+    records = pd.concat([keys.assign(Line=lines) for keys, lines in parts], ignore_index=True)
+    return records.sort_values(list(parts[0][0].columns), kind='stable')['Line']
+
+
+def records_text(*parts):
+    """File text for record lines given as single lines or columns of lines, in order, each ending in a newline."""
+    lines = []
+    for part in parts:
+        if isinstance(part, str):
+            lines.append(part)
+        else:
+            lines.extend(part.tolist())
+    return ''.join(f"{line}\n" for line in lines)
@@ -1,15 +1,21 @@
 from helper.parameters import *
 from helper.functions import *
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from shapely import wkt
-import geopandas as gpd
-from fastkml import kml
-from fastkml.kml import Document, Folder, Placemark
+from generate_outputs.hastus_records import format_records, interleave, order_records, records_text
+from generate_outputs.transfer import default_s3_client, open_output
+from process_txc.identifiers import decode_identifiers
+from helper.copy_on_write import own
 
 
-def make_kml_document(variant_gdf: gpd.GeoDataFrame) -> kml.KML:
+def make_kml_document(variant_gdf: 'gpd.GeoDataFrame') -> 'kml.KML':
     """Build KML Document from merged variant GeoDataFrame."""
+    from fastkml import kml
+    from fastkml.kml import Document
+
     k = kml.KML()
     doc = Document()
     k.append(doc)
@@ -40,11 +46,16 @@ def make_kml_document(variant_gdf: gpd.GeoDataFrame) -> kml.KML:
     return k
 
 
-def create_link_outputs(variant_links: pd.DataFrame, variant_points: pd.DataFrame, output_dir: str):
+def create_link_outputs(variant_links: pd.DataFrame, variant_points: pd.DataFrame, output_dir: str, s3_client=None):
     """Generate merged KML output of variant paths, auto-building missing paths from stops."""
+    # The geospatial stack is slow to import and only this writer needs it, so it loads when the writer runs
+    import geopandas as gpd
+    from shapely import wkt
 
     output_path = f'{output_dir}/{region}.kml'
 
+    # Work on a copy: the tables are shared with the other writers, which may be running concurrently
+    variant_links = own(variant_links)
     variant_links['Path'] = variant_links['Path'].apply(
         lambda x: wkt.loads(x) if isinstance(x, str) else x
     )
@@ -91,11 +102,11 @@ def create_link_outputs(variant_links: pd.DataFrame, variant_points: pd.DataFram
     kml_doc = make_kml_document(merged)
 
     # --- Step 7: Save to file
-    with open(output_path, 'w') as f:
+    with open_output(output_path, s3_client) as f:
         f.write(kml_doc.to_string(prettyprint=True))
 
 def add_places(table, stops):
-    table = table.copy(deep =True)
+    table = own(table)
     table = table.merge(stops[['StopPointId','Place']], left_on='FromStopPointId', right_on = 'StopPointId', how='left')
     table = table.rename(columns={'Place':'FromPlace'})
     table = table.drop(columns=['StopPointId'])
@@ -105,9 +116,9 @@ def add_places(table, stops):
 
     return table
 
-def hastus_rte_version(variant_points, subdir):
+def hastus_rte_version(variant_points, subdir, s3_client=None):
 
-    variant_points = variant_points.copy(deep=True)
+    variant_points = own(variant_points)
     variant_points = variant_points.sort_values(['DataId','Direction','VariantCode','RouteSectionPosition', 'RouteLinkPosition']).reset_index(drop=True)
     variant_points = variant_points.drop_duplicates(subset=['Direction','VariantCode','JourneyPatternTimingLinkPositionInJourneyPattern'], keep='first')
 
@@ -118,57 +129,60 @@ def hastus_rte_version(variant_points, subdir):
         variant_points["DestinationDisplay"])
 
     # Map 'Direction' to 'Description'
-    variant_points['RouteDescription'] = variant_points.apply(
-        lambda row: row['InboundDescriptionShort'][:20] if row['Direction'] == 4
-        else row['OutboundDescriptionShort'][:20],
-        axis=1
+    variant_points['RouteDescription'] = np.where(
+        variant_points['Direction'] == 4,
+        variant_points['InboundDescriptionShort'].astype(str).str[:20],
+        variant_points['OutboundDescriptionShort'].astype(str).str[:20]
     )
 
-    lines = []
-
-    lines.append(f"route_version|{rte_version}|{region} {description}")
-
-    for route, route_group in variant_points.groupby('LineName'):
-        # Get route-wide details
-        direction = route_group['Direction'].iloc[0] if 'Direction' in route_group.columns else ''
-        route_desc = route_group['RouteDescription'].iloc[0] if 'RouteDescription' in route_group.columns else ''
-
-        # Add the route header once per route
-        lines.append(f"route|{rte_version}|{service_type}|{route}|{route_desc}|{direction}|{service_mode}|{smoothing}|{route}")
-
-        # Now group by Variant within each Route
-        for variant, variant_group in route_group.groupby('VariantCode'):
-            direction = variant_group['Direction'].iloc[0] if 'Direction' in variant_group.columns else ''
-            variant_id = variant_group['VariantCode'].iloc[0] if 'VariantCode' in variant_group.columns else ''
-            variant_desc = variant_group['CommonName'].iloc[0][:20] + ' to ' + variant_group['CommonName'].iloc[-1][:20]
-
-            # Add variant header
-            lines.append(f"rvariant|{route}|{direction}|{variant_id}|{variant_desc}|{variant_id}")
+    # Route headers come from the first point of each route
+    routes = variant_points[variant_points['LineName'].notna()]
+    route_heads = routes.drop_duplicates('LineName')
+    route_lines = format_records(
+        'route', rte_version, service_type, route_heads['LineName'], route_heads['RouteDescription'],
+        route_heads['Direction'], service_mode, smoothing, route_heads['LineName']
+    )
 
-            # Iterate through variant points
-            for _, point in variant_group.iterrows():
-                stop = point['StopPointId'][4:]
-                TP1 = '1' if point.get('TP', False) else '0'
-                TP2 = '1' if point.get('TP', False) else ''
-                distance = (
-                    f"{point['CumulativeDistance'] / 1000:.3f}"
-                    if point.get('TP') and pd.notna(point.get('Distance')) and pd.notna(point.get('CumulativeDistance'))
-                    else ""
-                )
+    # Variant headers from the first and last point of each variant, then one rvpoint per point
+    points = routes[routes['VariantCode'].notna()]
+    variant_keys = ['LineName', 'VariantCode']
+    variant_heads = points.drop_duplicates(variant_keys).merge(
+        points.drop_duplicates(variant_keys, keep='last')[variant_keys + ['CommonName']],
+        on=variant_keys, suffixes=('', 'Last')
+    )
+    variant_desc = variant_heads['CommonName'].str[:20] + ' to ' + variant_heads['CommonNameLast'].str[:20]
+    variant_lines = format_records(
+        'rvariant', variant_heads['LineName'], variant_heads['Direction'], variant_heads['VariantCode'], variant_desc,
+        variant_heads['VariantCode']
+    )
 
-                variant_id = point['VariantCode'] if 'VariantCode' in point else ''
+    tp = points['TP'].astype(bool)
+    point_lines = format_records(
+        'rvpoint', points['StopPointId'].str[4:], tp.map({True: '1', False: '0'}), tp.map({True: '1', False: ''}),
+        points['VariantCode']
+    )
 
-               #lines.append(f"rvpoint|{stop}|{TP1}|{TP2}|{distance}|{variant_id}")
-                lines.append(f"rvpoint|{stop}|{TP1}|{TP2}|{variant_id}")
+    # Routes by name, each followed by its variants by code, each followed by its points in order
+    def keys(table, level, position):
+        return pd.DataFrame({
+            'LineName': table['LineName'], 'Level': level,
+            'VariantCode': table['VariantCode'] if level else '', 'Position': position
+        }, index=table.index)
+
+    lines = order_records(
+        (keys(route_heads, 0, -1), route_lines),
+        (keys(variant_heads, 1, -1), variant_lines),
+        (keys(points, 1, range(len(points))), point_lines),
+    )
 
-    with open(f'{subdir}/route_version.txt', 'w') as f:
-        f.write('\n'.join(lines))
+    with open_output(f'{subdir}/route_version.txt', s3_client) as f:
+        f.write('\n'.join([f"route_version|{rte_version}|{region} {description}"] + lines.tolist()))
 
 
 
-def hastus_rte_distances(variant_links, subdir):
+def hastus_rte_distances(variant_links, subdir, s3_client=None):
 
-    df = variant_links.copy(deep=True)
+    df = own(variant_links)
 
     # Keep only one entry per From-To combination per variant
     df = df.groupby(['LineId', 'VariantId', 'FromStopPointId', 'ToStopPointId']).first().reset_index()
@@ -196,91 +210,56 @@ def hastus_rte_distances(variant_links, subdir):
     )
 
     # Write output file
-    df['Text'].to_csv(f'{subdir}/route_itinerary.txt', index=False, header=False)
+    with open_output(f'{subdir}/route_itinerary.txt', s3_client) as f:
+        df['Text'].to_csv(f, index=False, header=False)
 
 
-def format_time(td):
-    """Converts timedelta to HH:MM format, correctly handling times beyond 24 hours."""
-    total_minutes = int(td.total_seconds() // 60)
-    hours = (total_minutes // 60)  # Keep full hours beyond 24
-    minutes = total_minutes % 60
-    return f"{hours}:{minutes:02d}"
-
-def round_to_quarter_hour(td, round_up=False):
-    total_minutes = int(td.total_seconds() // 60)
-    if round_up:
-        rounded_minutes = ((total_minutes + 14) // 15) * 15
-    else:
-        rounded_minutes = (total_minutes // 15) * 15
-    return timedelta(minutes=rounded_minutes)
+def format_time(seconds):
+    """Converts a column of seconds to H:MM format, correctly handling times beyond 24 hours."""
+    total_minutes = seconds // 60
+    hours = (total_minutes // 60).astype(str)  # Keep full hours beyond 24
+    minutes = (total_minutes % 60).astype(str).str.zfill(2)
+    return hours + ':' + minutes
 
 
-def hastus_rt_version(trip_stops, trip_subsections, stops, subdir):
+def hastus_rt_version(trip_stops, trip_subsections, stops, subdir, s3_client=None):
 
-    trip_stops = trip_stops.copy(deep=True)
-    trip_subsections = trip_subsections.copy(deep=True)
-    stops = stops.copy(deep=True)
+    trip_stops = own(trip_stops)
+    trip_subsections = own(trip_subsections)
+    stops = own(stops)
 
     trip_stops = trip_stops[['DataId', 'VehicleJourneyCode', 'StopPointId', 'WaitTime']]
-    trip_subsections['DepartureTime'] = pd.to_timedelta(trip_subsections['DepartureTime'].astype(str))
 
     # Sort for group processing
     trip_subsections = trip_subsections.sort_values(by=['DayType', 'LineName', 'BaseJourneyPatternSubSectionId', 'DepartureTime'])
     trip_subsections = add_places(trip_subsections, stops)
 
+    # Generate runtime periods for each (LineName, BaseJourneyPatternSubSectionId, DayType), in seconds.
+    # Trips are taken in departure order. The first period starts at 0:00; each later one at its departure floored
+    # to the quarter hour, but no earlier than a minute after the previous departure. Each period ends a minute
+    # before the next one starts, and the last at 36:00.
+    period_keys = ['LineName', 'BaseJourneyPatternSubSectionId', 'DayType']
+    all_periods_df = (
+        trip_subsections.dropna(subset=period_keys)
+        .sort_values(period_keys + ['DepartureTime'], kind='stable')
+        .reset_index(drop=True)
+    )
+    departure = all_periods_df['DepartureTime'].astype('int64')
+    period = [all_periods_df[key] for key in period_keys]
+
+    quarter_hour = departure // 900 * 900
+    after_previous = departure.groupby(period, sort=False).shift(1) + 60
+    period_start = quarter_hour.where(quarter_hour >= after_previous, after_previous)
+    period_start = period_start.mask(departure.groupby(period, sort=False).cumcount() == 0, 0).astype('int64')
 
-    # Generate runtime periods for each (DataId, LineName, BaseJourneyPatternSubSectionId, DayType)
-    period_records = []
-    for (line, subsection, day), group in trip_subsections.groupby(
-        ['LineName', 'BaseJourneyPatternSubSectionId', 'DayType']):
-
-        group = group.sort_values(by='DepartureTime')
-        period_start = timedelta(hours=0)
-        period_end = timedelta(hours=36)
-        trip_times = list(group['DepartureTime'])
-
-        # Step 1: Compute all start times first
-        start_times = []
-
-        prev_start = None
-        for i, trip_time in enumerate(trip_times):
-            if i == 0:
-                start = period_start
-            else:
-                rounded_start = round_to_quarter_hour(trip_time, round_up=False)
-                start = max(rounded_start, prev_start + timedelta(minutes=1))
-
-            start_times.append(start)
-            prev_start = trip_time
-
-        # Step 2: Compute corresponding end times
-        periods = []
-        for i, start in enumerate(start_times):
-            if i < len(start_times) - 1:
-                end = start_times[i + 1] - timedelta(minutes=1)
-            else:
-                end = period_end  # Last period ends at 36:00
-            periods.append([start, end])
-
-        for (start, end), index in zip(periods, group.index):
-            period_records.append({
-                "LineName": line,
-                "VehicleJourneyCode": group.loc[index, 'VehicleJourneyCode'],
-                "DepartureTime": group.loc[index, 'DepartureTime'],
-                "DataId": group.loc[index, 'DataId'],
-                "BaseJourneyPatternSubSectionId": subsection,
-                "DayType": day,
-                "PeriodStart": start,
-                "PeriodEnd": end,
-                "FromStopPointId": group.loc[index, 'FromStopPointId'],
-                "ToStopPointId": group.loc[index, 'ToStopPointId'],
-                "FromPlace": group.loc[index, 'FromPlace'],
-                "ToPlace": group.loc[index, 'ToPlace'],
-                "RunTimeSec": group.loc[index, 'RunTimeSec']
-            })
+    next_start = period_start.groupby(period, sort=False).shift(-1)
+    period_end = (next_start - 60).fillna(36 * 3600).astype('int64')
 
     # Create a master period table
-    all_periods_df = pd.DataFrame(period_records)
+    all_periods_df = all_periods_df.assign(DepartureTime=departure, PeriodStart=period_start, PeriodEnd=period_end)[[
+        'LineName', 'VehicleJourneyCode', 'DepartureTime', 'DataId', 'BaseJourneyPatternSubSectionId', 'DayType',
+        'PeriodStart', 'PeriodEnd', 'FromStopPointId', 'ToStopPointId', 'FromPlace', 'ToPlace', 'RunTimeSec'
+    ]]
 
     # Find all VariantCodes associated with each (LineName, BaseJourneyPatternSubSectionId, DayType)
     variant_subsection_map = trip_subsections[
@@ -307,124 +286,122 @@ def hastus_rt_version(trip_stops, trip_subsections, stops, subdir):
     load = load.drop_duplicates(subset = ['DayType', 'VariantCode', 'Place', 'PeriodStart'])
 
     # Convert period times
-    expanded['PeriodStart'] = expanded['PeriodStart'].apply(format_time)
-    expanded['PeriodEnd'] = expanded['PeriodEnd'].apply(format_time)
+    expanded['PeriodStart'] = format_time(expanded['PeriodStart'])
+    expanded['PeriodEnd'] = format_time(expanded['PeriodEnd'])
     expanded['RunTimeMin'] = expanded['RunTimeSec'].astype(int) // 60
 
-    load['PeriodStart'] = load['PeriodStart'].apply(format_time)
-    load['PeriodEnd'] = load['PeriodEnd'].apply(format_time)
+    load['PeriodStart'] = format_time(load['PeriodStart'])
+    load['PeriodEnd'] = format_time(load['PeriodEnd'])
     load['WaitTimeMin'] = load['WaitTime'].astype(int) // 60
 
     # Write to file with runtime_version line per DayType
-    with open(f'{subdir}/runtime_version.txt', 'w') as f:
-        for day_type, group in expanded.groupby("DayType"):
-            day_code = day_type_code[day_type]
+    records = []
+    for day_type, group in expanded.groupby("DayType"):
+        day_code = day_type_code[day_type]
 
-            f.write(f"runtime_version|{runtime_version}_{day_code}\n")
-            for _, row in group.iterrows():
-                f.write(
-                    f"runtime_period|{row['LineName']}|{row['VariantCode']}|{row['FromPlace']}|"
-                    f"{row['ToPlace']}|{row['RunTimeMin']}|{row['PeriodStart']}|{row['PeriodEnd']}\n"
-                )
+        records.append(f"runtime_version|{runtime_version}_{day_code}")
+        records.append(format_records(
+            'runtime_period', group['LineName'], group['VariantCode'], group['FromPlace'], group['ToPlace'],
+            group['RunTimeMin'], group['PeriodStart'], group['PeriodEnd']
+        ))
 
-            load_subset = load.loc[(load['DayType'] == day_type)]
+        load_subset = load.loc[(load['DayType'] == day_type)]
+        records.append(format_records(
+            'load_time', load_subset['Place'], load_subset['PeriodStart'], load_subset['PeriodEnd'],
+            load_subset['WaitTimeMin'], load_subset['LineName'], load_subset['VariantCode']
+        ))
 
-            for _, load_row in load_subset.iterrows():
-                f.write(
-                    f"load_time|{load_row['Place']}|{load_row['PeriodStart']}|{load_row['PeriodEnd']}|"
-                    f"{load_row['WaitTimeMin']}|{load_row['LineName']}|{load_row['VariantCode']}\n"
-                )
+    with open_output(f'{subdir}/runtime_version.txt', s3_client) as f:
+        f.write(records_text(*records))
 
 
 
-def hastus_trips(trips, trip_stops, stops, subdir):
+def hastus_trips(trips, trip_stops, stops, subdir, s3_client=None):
     trips = add_places(trips, stops)
     trip_stops = trip_stops.merge(stops, on=['StopPointId'], how='left')
-    trip_number = 0
-    with open(f'{subdir}/trips.txt', 'w') as f:
-        for day_type, group in trips.groupby("DayType"):
-            group = group.sort_values("DepartureTime").reset_index(drop=True)
-            day_code = day_type_code[day_type]
-            sched_code = sched_type_code[day_type]
-            vsc_type = service_type_nickname[day_type]
-
-            # Write vehicle_schedule header
-            f.write(f"vehicle_schedule|{vsc_name}_{vsc_type}|{day_type} Import from TXC|0|{sched_code}|{rte_version}|{runtime_version}_{day_code}\n")
-
-            for i, row in group.iterrows():
-                try:
-                    trip_id = row["VehicleJourneyCode"]
-                    trip_number += 1
-                    route_id = row["LineName"]
-                    variant_code = row["VariantCode"]
-                    direction = row["HASTUSDirection"]
-                    from_place = row["FromPlace"]
-                    to_place = row["ToPlace"]
-                    departure = row["DepartureTime"][:5]
-                    arrival = row["ArrivalTime"][:5]
-                    operating_days = '|'.join(str(x) for x in row['OperatingDays'])
-                    data_id = row["DataId"]
-
-                    # Write trip header
-                    f.write(f"trip|{trip_number}|{route_id}|{trip_number}|{variant_code}|0|{direction}|{from_place}|{to_place}|{departure}|{arrival}|{operating_days}\n")
-
-                    # Get stop rows for this trip with TP == True
-                    trip_stop_subset = trip_stops[
-                        (trip_stops["DataId"] == data_id) &
-                        (trip_stops["VehicleJourneyCode"] == trip_id) &
-                        (trip_stops["TP"] == True)
-                    ]
-
-                    # Write stop lines
-                    for _, stop_row in trip_stop_subset.iterrows():
-                        run_time_sec = stop_row.get("CumulativeRunTimeSecs", 0)
-                        wait_time_sec = stop_row.get("WaitTime", 0) or 0
-
-                        base_time = compute_arrival_time(row["DepartureTime"], run_time_sec)
-                        base_time_str = base_time[:5]
-
-                        stop_id = stop_row["StopPointId"][4:]
-                        place_id = stop_row["Place"]
-
-                        f.write(f"trip_tp|{place_id}|{trip_number}|{base_time_str}|1\n")
-
-                        if wait_time_sec > 0:
-                            new_time = compute_arrival_time(row["DepartureTime"], run_time_sec + wait_time_sec)
-                            f.write(f"trip_tp|{place_id}|{trip_number}|{new_time[:5]}|1\n")
-
-                except Exception as e:
-                    print(f"⚠️ Error writing trip row {i}: {e}")
-
-
-
-def hastus_locations(stops, subdir):
-
-    stops = stops.copy(deep=True)
+
+    # Trips are numbered in writing order: day type by day type, each by departure time.
+    # Stable so trips leaving at the same time keep their (DataId, LineId, VariantId, VehicleJourneyCode) order
+    trips = trips[trips['DayType'].notna()].sort_values(['DayType', 'DepartureTime'], kind='stable')
+    trips['TripNumber'] = range(1, len(trips) + 1)
+
+    # Trips that can't be written are skipped, but keep their numbers
+    has_days = trips['OperatingDays'].map(pd.api.types.is_list_like)
+    has_times = trips['DepartureTime'].notna() & trips['ArrivalTime'].notna()
+    for trip_number, days, times in zip(trips['TripNumber'], has_days, has_times):
+        if not times:
+            print(f"⚠️ Error writing trip {trip_number}: no DepartureTime or ArrivalTime")
+        elif not days:
+            print(f"⚠️ Error writing trip {trip_number}: no OperatingDays")
+    written = trips[has_days & has_times]
+
+    operating_days = written['OperatingDays'].map(lambda days: '|'.join(str(x) for x in days))
+    trip_lines = format_records(
+        'trip', written['TripNumber'], written['LineName'], written['TripNumber'], written['VariantCode'], 0,
+        written['HASTUSDirection'], written['FromPlace'], written['ToPlace'],
+        format_clock_column(written['DepartureTime']), format_clock_column(written['ArrivalTime']), operating_days
+    )
+
+    # Timing points of each trip in trip_stops order, with a second time when the vehicle waits there
+    tp_stops = trip_stops[trip_stops["TP"] == True].dropna(subset=['DataId', 'VehicleJourneyCode'])
+    tp_stops = tp_stops.assign(StopOrder=range(len(tp_stops)))
+    trip_tps = written[['DataId', 'VehicleJourneyCode', 'TripNumber', 'DepartureTime']].merge(
+        tp_stops, on=['DataId', 'VehicleJourneyCode'], how='inner', suffixes=('', 'Stop')
+    )
+
+    run_time_sec = trip_tps.get("CumulativeRunTimeSecs", 0)
+    wait_time_sec = trip_tps["WaitTime"].fillna(0)
+    base_times = format_clock_column(trip_tps["DepartureTime"] + run_time_sec)
+    wait_times = format_clock_column(trip_tps["DepartureTime"] + run_time_sec + wait_time_sec)
+    tp_lines = format_records('trip_tp', trip_tps["Place"], trip_tps['TripNumber'], base_times, 1)
+    wait_lines = format_records('trip_tp', trip_tps["Place"], trip_tps['TripNumber'], wait_times, 1)
+
+    def keys(table, stop_order, wait):
+        return pd.DataFrame({'TripNumber': table['TripNumber'], 'StopOrder': stop_order, 'Wait': wait}, index=table.index)
+
+    records = []
+    for day_type, group in trips.groupby("DayType"):
+        day_code = day_type_code[day_type]
+        sched_code = sched_type_code[day_type]
+        vsc_type = service_type_nickname[day_type]
+
+        # Write vehicle_schedule header
+        records.append(f"vehicle_schedule|{vsc_name}_{vsc_type}|{day_type} Import from TXC|0|{sched_code}|{rte_version}|{runtime_version}_{day_code}")
+
+        in_group = trip_tps['TripNumber'].isin(group['TripNumber'])
+        has_wait = in_group & (wait_time_sec > 0)
+        records.append(order_records(
+            (keys(written[written['DayType'] == day_type], -1, 0), trip_lines[written['DayType'] == day_type]),
+            (keys(trip_tps[in_group], trip_tps['StopOrder'], 0), tp_lines[in_group]),
+            (keys(trip_tps[has_wait], trip_tps['StopOrder'], 1), wait_lines[has_wait]),
+        ))
+
+    with open_output(f'{subdir}/trips.txt', s3_client) as f:
+        f.write(records_text(*records))
+
+
+
+def hastus_locations(stops, subdir, s3_client=None):
+
+    stops = own(stops)
     stops = stops.fillna('')
 
+    stop_names = stops['LocalityName'] + ", " + stops['CommonName']
+    stop_ids = stops['StopPointId'].str[4:]
+    has_place = stops['Place'].astype(bool)
+    place_lines = format_records('place', stops['Place'], stop_names)[has_place]
+
+    # round to 6 decimal places, with Python's round so values print exactly as they always have
+    latitude = stops['Latitude'].map(lambda x: round(x, 6))
+    longitude = stops['Longitude'].map(lambda x: round(x, 6))
+
+    stop_lines = format_records('stop', stop_ids, stop_names, stops['Place'])
+    stop_loc_lines = format_records('stop_location', stop_ids, stop_names, latitude, longitude, 1)
+    #stop_loc_lines = format_records('stop_location', stop_ids, stop_names, 1)
+
     # Write to file
-    with open(f'{subdir}/locations.txt', 'w') as f:
-        for _, row in stops.iterrows():
-            place = row['Place']
-            place_name = row['LocalityName'] + ", " + row['CommonName']
-            if place:
-                f.write(f"place|{place}|{place_name}\n")
-
-        for _, row in stops.iterrows():
-            stop_id = row['StopPointId'][4:]
-            stop_name = row['LocalityName'] + ", " + row['CommonName']
-            place = row['Place']
-            # round latitude to 6 decimal places
-            latitude = round(row['Latitude'], 6)
-            #latitude = row['Latitude']
-            longitude = round(row['Longitude'], 6)
-            #longitude = row['Longitude']
-
-            stop_line = f"stop|{stop_id}|{stop_name}|{place}"
-            stop_loc_line = f"stop_location|{stop_id}|{stop_name}|{latitude}|{longitude}|1"
-            #stop_loc_line = f"stop_location|{stop_id}|{stop_name}|1"
-            f.write(stop_line + "\n")
-            f.write(stop_loc_line + "\n")
+    with open_output(f'{subdir}/locations.txt', s3_client) as f:
+        f.write(records_text(place_lines, interleave(stop_lines, stop_loc_lines)))
 
 
     # with open(f'output/hastus_files/{region}/places.txt', 'w') as f:
@@ -437,7 +414,66 @@ def hastus_locations(stops, subdir):
 
 from helper.utils import get_output_dir  # or wherever you place it
 
-def create_outputs(transformed_tables, output_dir=None):
+# How create_outputs runs its writers: one after another, or concurrently in a thread or process pool
+OUTPUT_MODES = ('serial', 'thread', 'process')
+
+
+def run_writer(name, writer, *args):
+    """Run one output writer and return its wall time in seconds. A failure is re-raised naming the writer."""
+    start = time.perf_counter()
+    try:
+        writer(*args)
+    except Exception as e:
+        raise RuntimeError(f"Output writer {name} failed: {e!r}") from e
+    return time.perf_counter() - start
+
+
+def run_writers(writers, mode='serial', workers=None):
+    """Run {name: (writer, args)} in the given mode and return {name: wall time}.
+
+    Writers only read their input tables, so they can share them. Every writer is run even if one fails; the first
+    failure is then raised.
+    """
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}, expected one of {OUTPUT_MODES}")
+
+    outcomes = {}
+    if mode != 'serial':
+        executor = ThreadPoolExecutor if mode == 'thread' else ProcessPoolExecutor
+        try:
+            with executor(max_workers=workers or len(writers)) as pool:
+                futures = {name: pool.submit(run_writer, name, writer, *args) for name, (writer, args) in writers.items()}
+                for name, future in futures.items():
+                    try:
+                        outcomes[name] = future.result()
+                    except Exception as e:
+                        outcomes[name] = e
+        except OSError as e:
+            # e.g. AWS Lambda has no /dev/shm for a process pool's queues
+            print(f"⚠️ {mode} pool unavailable ({e}), writing outputs serially")
+            outcomes = {}
+
+    for name, (writer, args) in writers.items():
+        if name not in outcomes:
+            try:
+                outcomes[name] = run_writer(name, writer, *args)
+            except Exception as e:
+                outcomes[name] = e
+
+    for name, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            print(f"❌ ERROR: {outcome}")
+        else:
+            print(f"⏱️ {name}: {outcome:.2f}s")
+
+    failures = [outcome for outcome in outcomes.values() if isinstance(outcome, Exception)]
+    if failures:
+        raise failures[0]
+
+    return outcomes
+
+
+def create_outputs(transformed_tables, output_dir=None, mode='serial', workers=None, s3_client=None):
     if output_dir is None:
         output_dir = get_output_dir()
 
@@ -446,12 +482,29 @@ def create_outputs(transformed_tables, output_dir=None):
     else:
         subdir = os.path.join(output_dir, region, 'hastus_files')
 
-    os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(subdir, exist_ok=True)
-
-    hastus_rte_version(transformed_tables['VariantPoints'], subdir)
-    hastus_rte_distances(transformed_tables['VariantLinks'], subdir)
-    hastus_rt_version(transformed_tables['TripStops'], transformed_tables['TripSubSections'], transformed_tables['Stops'], subdir)
-    hastus_trips(transformed_tables['Trips'], transformed_tables['TripStops'], transformed_tables['Stops'], subdir)
-    hastus_locations(transformed_tables['Stops'], subdir)
-    create_link_outputs(transformed_tables['VariantLinks'], transformed_tables['VariantPoints'], output_dir)
+    # An 's3://bucket/prefix' output_dir streams every file straight to S3, with nothing staged locally
+    if not output_dir.startswith('s3://'):
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(subdir, exist_ok=True)
+    elif mode == 'thread':
+        # Threads share one client, made here: creating clients concurrently on the default boto3 session isn't safe.
+        # Process pool writers each make their own, as a client can't be passed to another process
+        s3_client = s3_client or default_s3_client()
+    elif mode == 'process':
+        s3_client = None
+
+    # The transform carries identifiers as categoricals; the writers work on their strings
+    transformed_tables = {name: decode_identifiers(df) for name, df in transformed_tables.items()}
+
+    # each HASTUS writer is named after the file it writes
+    writers = {
+        'route_version': (hastus_rte_version, (transformed_tables['VariantPoints'], subdir, s3_client)),
+        'route_itinerary': (hastus_rte_distances, (transformed_tables['VariantLinks'], subdir, s3_client)),
+        'runtime_version': (hastus_rt_version, (transformed_tables['TripStops'], transformed_tables['TripSubSections'], transformed_tables['Stops'], subdir, s3_client)),
+        'trips': (hastus_trips, (transformed_tables['Trips'], transformed_tables['TripStops'], transformed_tables['Stops'], subdir, s3_client)),
+        'locations': (hastus_locations, (transformed_tables['Stops'], subdir, s3_client)),
+        'kml': (create_link_outputs, (transformed_tables['VariantLinks'], transformed_tables['VariantPoints'], output_dir, s3_client)),
+    }
+    run_writers(writers, mode, workers)
+
+    return [f'{subdir}/{name}.txt' for name in writers if name != 'kml'] + [f'{output_dir}/{region}.kml']
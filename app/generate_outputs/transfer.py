@@ -0,0 +1,116 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.s3.transfer import TransferConfig
+
+# Shared by every upload: files over 8 MiB go up as concurrent 8 MiB parts
+TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 ** 2, multipart_chunksize=8 * 1024 ** 2,
+                                 max_concurrency=8, use_threads=True)
+
+# S3 requires every part of a multipart upload but the last to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 ** 2
+
+
+def default_s3_client():
+    """A new S3 client. Make it before starting threads and share it: boto3's default session isn't thread safe."""
+    import boto3
+    return boto3.client('s3')
+
+
+def split_s3_url(url):
+    bucket, _, key = url[len('s3://'):].partition('/')
+    return bucket, key
+
+
+class S3StreamWriter:
+    """Text file object that streams what is written to an S3 object, without staging it on disk.
+
+    Writes are buffered and sent as multipart upload parts of part_size bytes. An output that never fills a part is
+    sent with a single put_object on close. If the writer is closed by an exception, the upload is aborted.
+    """
+
+    def __init__(self, s3_client, bucket, key, part_size=TRANSFER_CONFIG.multipart_chunksize):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.bytes_written = 0
+        self.started = time.perf_counter()
+        self.closed = False
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.buffer += data
+        self.bytes_written += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(text)
+
+    def _upload_part(self, data):
+        if self.upload_id is None:
+            self.upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        part_number = len(self.parts) + 1
+        response = self.s3_client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                              PartNumber=part_number, Body=data)
+        self.parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        if self.upload_id is None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+        else:
+            if self.buffer:
+                self._upload_part(bytes(self.buffer))
+            self.s3_client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                     MultipartUpload={'Parts': self.parts})
+        self.buffer = bytearray()
+        print(f"☁️ Streamed s3://{self.bucket}/{self.key}: {self.bytes_written} bytes in "
+              f"{time.perf_counter() - self.started:.2f}s")
+
+    def abort(self):
+        self.closed = True
+        if self.upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def open_output(path, s3_client=None):
+    """Open an output file for writing text: a local path, or 's3://bucket/key' streamed straight to S3."""
+    if path.startswith('s3://'):
+        bucket, key = split_s3_url(path)
+        return S3StreamWriter(s3_client or default_s3_client(), bucket, key)
+    return open(path, 'w')
+
+
+def upload_file(s3_client, path, bucket, key):
+    """Upload one local file with the shared transfer config and return (key, bytes, seconds)."""
+    start = time.perf_counter()
+    s3_client.upload_file(path, bucket, key, Config=TRANSFER_CONFIG)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f"☁️ Uploaded s3://{bucket}/{key}: {size} bytes in {elapsed:.2f}s")
+    return key, size, elapsed
+
+
+def upload_files(s3_client, paths, bucket, prefix, workers=8):
+    """Upload local files concurrently to <prefix>/<file name> in bucket. Returns the object keys in path order."""
+    keys = [f"{prefix.strip('/')}/{os.path.basename(path)}" for path in paths]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as pool:
+        results = list(pool.map(lambda args: upload_file(s3_client, *args), [(p, bucket, k) for p, k in zip(paths, keys)]))
+    return [key for key, _, _ in results]
@@ -0,0 +1,21 @@
+"""Copy-on-write execution mode.
+
+Most pipeline steps take their own copy of the tables they are given before changing them. Normally that is a deep
+copy of every column. With pandas copy-on-write on, a copy shares its columns with the original until one of the two
+changes them, so a step only pays for the columns it actually modifies. The mode is process wide and has to be set
+before any table is built: the entry points turn it on when COPY_ON_WRITE=true.
+"""
+import pandas as pd
+
+
+def enable_copy_on_write(enabled=True):
+    pd.set_option('mode.copy_on_write', enabled)
+
+
+def copy_on_write_enabled():
+    return pd.get_option('mode.copy_on_write') is True
+
+
+def own(df):
+    """A copy of df that the caller may change without changing df: lazy under copy-on-write, deep otherwise."""
+    return df.copy(deep=not copy_on_write_enabled())
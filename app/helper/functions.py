@@ -1,7 +1,5 @@
-import folium
 import os
-from shapely import LineString
-from shapely.wkt import loads
+import pandas as pd
 from helper.parameters import NAMESPACES  # Import NAMESPACES here
 import re
 
@@ -72,6 +70,10 @@ def calculate_total_distance(route_sections_df, start_stop, end_stop):
 
 
 def add_line_to_map(df):
+    # Debug helper only: folium is imported here so the converter never pays for it
+    import folium
+    from shapely.wkt import loads
+
     m = folium.Map(location=[53.479777386680375, -2.235138061840938], zoom_start=12)
     for _, row in df.iterrows():
         if row["LineString"]:
@@ -116,6 +118,7 @@ def get_linestring(link):
                 print(f"Invalid coordinates found: {lat}, {lon}")
 
     if len(coordinates) >= 2:  # Ensure at least a line (not just a point)
+        from shapely import LineString  # imported on first use, it is heavy to load at startup
         return LineString(coordinates).wkt
     return None  # Return None if there's not enough data
 
@@ -127,19 +130,13 @@ def handle_distance(series):
     return series.sum()
 
 
-def compute_arrival_time(departure, duration):
-    """Returns arrival time in HH:MM:SS format given departure time and duration in seconds."""
-    hours, minutes, seconds = map(int, departure.split(":"))
-
-    # Convert departure time to total seconds
-    total_seconds = hours * 3600 + minutes * 60 + seconds
-
-    # Add duration
-    total_seconds += duration
+def time_to_seconds(times):
+    """Convert a column of "HH:MM:SS" times to integer seconds after midnight. Hours may run past 24, missing stays <NA>."""
+    return pd.to_timedelta(times, errors='coerce').dt.total_seconds().astype('Int64')
 
-    # Convert back to HH:MM:SS format
-    new_hours = total_seconds // 3600
-    new_minutes = (total_seconds % 3600) // 60
-    new_seconds = total_seconds % 60
 
-    return f"{new_hours:02}:{new_minutes:02}:{new_seconds:02}"
+def format_clock_column(seconds):
+    """Format a column of seconds after midnight as HH:MM, e.g. 25:10 for a time past midnight."""
+    hours = (seconds // 3600).astype(str).str.zfill(2)
+    minutes = (seconds % 3600 // 60).astype(str).str.zfill(2)
+    return hours + ':' + minutes
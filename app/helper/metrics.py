@@ -0,0 +1,162 @@
+import cProfile
+import json
+import os
+import resource
+import tempfile
+import time
+
+import pandas as pd
+
+# How finished steps are logged: JSON lines, CloudWatch embedded metric format, or not at all
+METRIC_FORMATS = ('json', 'emf', None)
+PROFILERS = ('cprofile', 'pyinstrument', None)
+
+# CloudWatch namespace for metrics emitted in EMF
+EMF_NAMESPACE = 'TxcToHastus'
+
+
+def peak_rss_mib():
+    """Peak resident set size of this process since the last reset_peak_rss (or since it started), in MiB."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    """Restart peak RSS tracking where Linux allows it; elsewhere the peak stays process-wide."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def count_rows(result):
+    """Row counts of the tables a step returned: a DataFrame, or a tuple, list or dict holding DataFrames."""
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, dict):
+        return {name: len(df) for name, df in result.items() if isinstance(df, pd.DataFrame)} or None
+    if isinstance(result, (tuple, list)) and any(isinstance(df, pd.DataFrame) for df in result):
+        return [len(df) if isinstance(df, pd.DataFrame) else None for df in result]
+    return None
+
+
+def emf_record(record):
+    """A step record in CloudWatch embedded metric format, with the step as the metrics' dimension."""
+    return {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': EMF_NAMESPACE,
+                'Dimensions': [['Step']],
+                'Metrics': [
+                    {'Name': 'WallTime', 'Unit': 'Seconds'},
+                    {'Name': 'CpuTime', 'Unit': 'Seconds'},
+                    {'Name': 'PeakRss', 'Unit': 'Megabytes'},
+                ],
+            }],
+        },
+        'Step': record['step'],
+        'WallTime': record['wall_seconds'],
+        'CpuTime': record['cpu_seconds'],
+        'PeakRss': record['peak_rss_mib'],
+        'Rows': record['rows'],
+    }
+
+
+class StageMetrics:
+    """Records wall time, CPU time, peak RSS and result row counts of named pipeline steps.
+
+    A step measured inside another is recorded as parent/child. Each finished step is appended to steps and logged
+    in metric_format. With a profiler, every top-level step is profiled and the profile written to profile_dir.
+    CPU time covers this process only, not process pool workers. Steps must be measured from one thread.
+    """
+
+    def __init__(self, metric_format='json', profiler=None, profile_dir=None):
+        if metric_format not in METRIC_FORMATS:
+            raise ValueError(f"Unknown metric format {metric_format!r}, expected one of {METRIC_FORMATS}")
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profiler!r}, expected one of {PROFILERS}")
+        self.metric_format = metric_format
+        self.profiler = profiler
+        self.profile_dir = profile_dir or os.path.join(tempfile.gettempdir(), 'profiles')
+        self.steps = []
+        self.profiles = []
+        self._names = []
+        self._child_peaks = []
+
+    def measure(self, function, *args, **kwargs):
+        """Call function(*args, **kwargs) as a step named after it and return its result."""
+        if self._child_peaks:
+            # Resetting for this step would lose the parent's peak so far
+            self._child_peaks[-1] = max(self._child_peaks[-1], peak_rss_mib())
+        self._names.append(function.__name__)
+        self._child_peaks.append(0.0)
+        name = '/'.join(self._names)
+        profiler = self._start_profiler() if len(self._names) == 1 else None
+
+        reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if profiler:
+                self._save_profile(profiler, name)
+            self._names.pop()
+            peak = max(peak_rss_mib(), self._child_peaks.pop())
+            if self._child_peaks:
+                self._child_peaks[-1] = max(self._child_peaks[-1], peak)
+
+        record = {'step': name, 'wall_seconds': round(wall, 4), 'cpu_seconds': round(cpu, 4),
+                  'peak_rss_mib': round(peak, 1), 'rows': count_rows(result)}
+        self.steps.append(record)
+        self._emit(record)
+        return result
+
+    def _emit(self, record):
+        if self.metric_format == 'emf':
+            print(json.dumps(emf_record(record)))
+        elif self.metric_format == 'json':
+            print(json.dumps({'metric': 'pipeline_step', **record}))
+
+    def _start_profiler(self):
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        if self.profiler == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        return None
+
+    def _save_profile(self, profiler, name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.profiler == 'pyinstrument':
+            profiler.stop()
+            path = os.path.join(self.profile_dir, f'{name}.html')
+            with open(path, 'w') as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f'{name}.prof')
+            profiler.dump_stats(path)
+        self.profiles.append(path)
+        print(f"🔬 Profile of {name} written to {path}")
+
+
+def call(function, *args, **kwargs):
+    return function(*args, **kwargs)
+
+
+def step_runner(metrics):
+    """metrics.measure, or a plain call when there are no metrics to record."""
+    return metrics.measure if metrics is not None else call
@@ -1,10 +1,17 @@
 import os
 import boto3
-import zipfile
 import shutil
 import logging
+from datetime import datetime, timezone
 
 from converter import run_conversion  # Make sure this is in the same directory or packaged correctly
+from process_txc.cache import S3TableCache
+from process_txc.incremental import S3State
+from process_txc import reference_cache
+from helper.metrics import StageMetrics
+from process_txc.sources import open_s3_object
+from generate_outputs.transfer import upload_files
+from helper.copy_on_write import enable_copy_on_write
 
 # Configure logger
 logger = logging.getLogger()
@@ -13,6 +20,25 @@ logger.setLevel(logging.INFO)
 # S3 client
 s3_client = boto3.client('s3')
 
+# Stream outputs straight to the output bucket; set STREAM_OUTPUTS=false to write them to /tmp and upload afterwards
+STREAM_OUTPUTS = os.getenv("STREAM_OUTPUTS", "true").lower() == "true"
+
+# Read the input ZIP with ranged GETs instead of downloading it to /tmp first; set STREAM_INPUT=true when the
+# archive doesn't fit in ephemeral storage
+STREAM_INPUT = os.getenv("STREAM_INPUT", "false").lower() == "true"
+
+# Transform only the lines whose TXC changed since the last conversion, keeping the rest in the output bucket
+INCREMENTAL = os.getenv("INCREMENTAL", "false").lower() == "true"
+
+# Let tables share columns until they are changed (pandas copy-on-write) instead of deep-copying them in every step;
+# set COPY_ON_WRITE=false to go back to the copies
+COPY_ON_WRITE = os.getenv("COPY_ON_WRITE", "true").lower() == "true"
+enable_copy_on_write(COPY_ON_WRITE)
+
+# Profile each conversion stage with cprofile or pyinstrument; the profiles are uploaded to the output bucket under
+# profiles/<input zip name>/<request id>
+PROFILE = os.getenv("PROFILE") or None
+
 def lambda_handler(event, context):
     # 1. Get bucket and key from event
     if event is None:
@@ -32,51 +58,68 @@ def lambda_handler(event, context):
 
     # Set working paths
     zip_local_path = "/tmp/upload.zip"
-    extract_dir = "/tmp/extracted"
     output_dir = "/tmp/processed"
     output_bucket = "jens-output-bucket"
+    cache_prefix = "cache/txc"
+    # Shared by every invocation; overlapping ones update its variant code registry conditionally, see S3State
+    state_prefix = "state/incremental"
+    output_prefix = "converted"
 
     # Ensure clean workspace
-    for d in [extract_dir, output_dir]:
-        if os.path.exists(d):
-            shutil.rmtree(d)
-        os.makedirs(d)
-    #
-    #
-    # input_dir = "/tmp/extracted"
-    # output_dir = "/tmp/processed"
-    # os.makedirs(output_dir, exist_ok=True)
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
 
     try:
-        # 2. Download ZIP file from S3
-        s3_client.download_file(input_bucket, zip_key, zip_local_path)
-        logger.info(f"Downloaded {zip_key} to {zip_local_path}")
-
-        # 3. Extract ZIP to /tmp/extracted
-        with zipfile.ZipFile(zip_local_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-        logger.info(f"Extracted ZIP to {extract_dir}")
-
-        # 4. Run conversion logic
-
+        # 2. Open the ZIP file from S3; its TXC files, including any in nested ZIPs, are read straight from it
+        if STREAM_INPUT:
+            source = open_s3_object(s3_client, input_bucket, zip_key)
+            logger.info(f"Streaming {zip_key} from {input_bucket}")
+        else:
+            s3_client.download_file(input_bucket, zip_key, zip_local_path)
+            source = zip_local_path
+            logger.info(f"Downloaded {zip_key} to {zip_local_path}")
+
+        # 3. Run conversion logic
         base_path = os.getenv("LAMBDA_TASK_ROOT", os.getcwd())
-        output_files = run_conversion(extract_dir, output_dir, base_path=base_path)
+        cache = S3TableCache(s3_client, output_bucket, cache_prefix)
+        state = S3State(s3_client, output_bucket, state_prefix) if INCREMENTAL else None
+        target_dir = f"s3://{output_bucket}/{output_prefix}" if STREAM_OUTPUTS else output_dir
+        reference_before = reference_cache.stats()
+        # Stage and step metrics are logged in CloudWatch embedded metric format
+        metrics = StageMetrics("emf", profiler=PROFILE)
+        output_files = run_conversion(source, target_dir, base_path=base_path, cache=cache, output_mode="thread",
+                                      metrics=metrics, state=state, s3_client=s3_client)
         logger.info(f"Generated {len(output_files)} output file(s)")
 
-        # 5. Upload output files to output S3 bucket
-        for path in output_files:
-            filename = os.path.basename(path)
-            s3_key = f"converted/{filename}"
-            s3_client.upload_file(path, output_bucket, s3_key)
-            logger.info(f"Uploaded {s3_key} to {output_bucket}")
+        # Reference data stays loaded in a warm container, so only a cold start should miss
+        reference_after = reference_cache.stats()
+        reference_stats = {name: reference_after[name] - reference_before[name] for name in reference_after}
+        logger.info(f"Reference data cache: {reference_stats['hits']} hit(s), {reference_stats['misses']} miss(es)")
+
+        # 4. Upload output files to output S3 bucket, unless they were streamed there already
+        if not STREAM_OUTPUTS:
+            keys = upload_files(s3_client, output_files, output_bucket, output_prefix)
+            logger.info(f"Uploaded {len(keys)} file(s) to {output_bucket}")
+
+        if metrics.profiles:
+            # One prefix per invocation, so a run doesn't overwrite the profiles of the one before
+            request_id = getattr(context, "aws_request_id", None) or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            profile_prefix = f"profiles/{os.path.splitext(os.path.basename(zip_key))[0]}/{request_id}"
+            upload_files(s3_client, metrics.profiles, output_bucket, profile_prefix)
+            logger.info(f"Uploaded {len(metrics.profiles)} profile(s) to {output_bucket}/{profile_prefix}")
 
         # Cleanup
-        shutil.rmtree(extract_dir)
+        if STREAM_INPUT:
+            source.close()
+        else:
+            os.remove(zip_local_path)
         shutil.rmtree(output_dir)
 
         return {
             'statusCode': 200,
-            'body': f"Successfully processed {zip_key} and uploaded {len(output_files)} file(s)."
+            'body': f"Successfully processed {zip_key} and uploaded {len(output_files)} file(s).",
+            'referenceCache': reference_stats
         }
 
     except Exception as e:
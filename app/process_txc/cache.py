@@ -0,0 +1,210 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from process_txc.sources import open_source
+
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+
+MANIFEST = 'manifest.json'
+
+
+def file_cache_key(file_path, reader_version):
+    """Cache key for a TXC file (a path or ZipMember): the SHA-256 of its content plus the reader version."""
+    digest = hashlib.sha256()
+    with open_source(file_path) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return f"v{reader_version}-{digest.hexdigest()}"
+
+
+def table_to_bytes(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def table_from_bytes(data):
+    """Read a cached table back, restoring nested list columns to the lists of tuples the reader produces."""
+    table = pq.read_table(io.BytesIO(data))
+    if not table.num_columns:
+        # A table the reader found nothing for, which would come back with a different (object) column index
+        return pd.DataFrame(index=range(table.num_rows))
+    df = table.to_pandas()
+    for field in table.schema:
+        if pa.types.is_list(field.type):
+            df[field.name] = [
+                None if value is None else [tuple(item) if isinstance(item, list) else item for item in value]
+                for value in table.column(field.name).to_pylist()
+            ]
+    return df
+
+
+class LocalTableCache:
+    """Parsed TXC tables cached under a local directory, one Parquet file per table in <root>/<key>/.
+
+    Entries older than max_age_days are evicted, then the oldest entries until the total is under max_bytes.
+    Age is measured from when the entry was written.
+    """
+
+    def __init__(self, root, max_age_days=DEFAULT_MAX_AGE_DAYS, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, key):
+        entry_dir = os.path.join(self.root, key)
+        manifest_path = os.path.join(entry_dir, MANIFEST)
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path) as f:
+            tables = json.load(f)['tables']
+
+        result = {}
+        for name in tables:
+            with open(os.path.join(entry_dir, f'{name}.parquet'), 'rb') as f:
+                result[name] = table_from_bytes(f.read())
+        return result
+
+    def put(self, key, tables):
+        entry_dir = os.path.join(self.root, key)
+        os.makedirs(entry_dir, exist_ok=True)
+        for name, df in tables.items():
+            with open(os.path.join(entry_dir, f'{name}.parquet'), 'wb') as f:
+                f.write(table_to_bytes(df))
+
+        # The manifest goes last so a half-written entry is never read
+        with open(os.path.join(entry_dir, MANIFEST), 'w') as f:
+            json.dump({'tables': list(tables), 'written': time.time()}, f)
+
+    def entries(self):
+        """Yield (key, written timestamp, total bytes) for every complete entry."""
+        for key in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, key)
+            manifest_path = os.path.join(entry_dir, MANIFEST)
+            if not os.path.exists(manifest_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            yield key, os.path.getmtime(manifest_path), size
+
+    def delete(self, key):
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    def evict(self):
+        return evict_entries(self, self.max_age_days, self.max_bytes)
+
+
+class S3TableCache:
+    """Parsed TXC tables cached under an S3 prefix, one Parquet object per table in <prefix>/<key>/.
+
+    Eviction works as for LocalTableCache, using each entry's manifest LastModified as its age.
+    """
+
+    def __init__(self, s3_client, bucket, prefix, max_age_days=DEFAULT_MAX_AGE_DAYS, max_bytes=DEFAULT_MAX_BYTES):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+
+    def _object_key(self, key, name):
+        return f"{self.prefix}/{key}/{name}"
+
+    def _read(self, object_key):
+        return self.s3_client.get_object(Bucket=self.bucket, Key=object_key)['Body'].read()
+
+    def get(self, key):
+        try:
+            manifest = json.loads(self._read(self._object_key(key, MANIFEST)))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+
+        names = manifest['tables']
+        object_keys = [self._object_key(key, f'{name}.parquet') for name in names]
+        # Fetch tables concurrently, a GET per table is latency bound
+        with ThreadPoolExecutor(max_workers=len(names) or 1) as pool:
+            data = list(pool.map(self._read, object_keys))
+        return {name: table_from_bytes(body) for name, body in zip(names, data)}
+
+    def put(self, key, tables):
+        for name, df in tables.items():
+            self.s3_client.put_object(Bucket=self.bucket, Key=self._object_key(key, f'{name}.parquet'), Body=table_to_bytes(df))
+
+        # The manifest goes last so a half-written entry is never read
+        manifest = json.dumps({'tables': list(tables), 'written': time.time()})
+        self.s3_client.put_object(Bucket=self.bucket, Key=self._object_key(key, MANIFEST), Body=manifest.encode())
+
+    def entries(self):
+        """Yield (key, written timestamp, total bytes) for every complete entry."""
+        sizes, written = {}, {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/"):
+            for obj in page.get('Contents', []):
+                key, _, name = obj['Key'][len(self.prefix) + 1:].partition('/')
+                sizes[key] = sizes.get(key, 0) + obj['Size']
+                if name == MANIFEST:
+                    written[key] = obj['LastModified'].timestamp()
+
+        for key, timestamp in written.items():
+            yield key, timestamp, sizes[key]
+
+    def delete(self, key):
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/{key}/"):
+            objects = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+            if objects:
+                self.s3_client.delete_objects(Bucket=self.bucket, Delete={'Objects': objects})
+
+    def evict(self):
+        return evict_entries(self, self.max_age_days, self.max_bytes)
+
+
+def evict_entries(cache, max_age_days=None, max_bytes=None):
+    """Delete entries older than max_age_days, then the oldest entries until the total size fits in max_bytes.
+
+    Returns the evicted keys.
+    """
+    entries = sorted(cache.entries(), key=lambda entry: entry[1])
+    evicted = []
+
+    if max_age_days is not None:
+        cutoff = time.time() - max_age_days * 86400
+        evicted += [key for key, written, _ in entries if written < cutoff]
+        entries = [entry for entry in entries if entry[1] >= cutoff]
+
+    if max_bytes is not None:
+        total = sum(size for _, _, size in entries)
+        for key, _, size in entries:
+            if total <= max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+
+    for key in evicted:
+        cache.delete(key)
+
+    return evicted
+
+
+def open_cache(location, s3_client=None, **limits):
+    """Open a cache from 's3://bucket/prefix' or a local directory path. Returns None if location is empty."""
+    if not location:
+        return None
+    if location.startswith('s3://'):
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client('s3')
+        return S3TableCache(s3_client, bucket, prefix, **limits)
+    return LocalTableCache(location, **limits)
@@ -0,0 +1,58 @@
+from collections import deque
+
+
+class SequenceMatcher:
+    """Aho-Corasick automaton over sequences of hashable items (e.g. subsection IDs).
+
+    Built once from a list of patterns, it reports which patterns occur as a contiguous run inside a text in a single
+    pass over the text, so finding every containment among n sequences is linear in their total length plus the
+    number of matches rather than quadratic in n.
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # Patterns ending exactly at each node
+        self.dict_link = [0]  # Nearest node along the failure chain that ends a pattern
+
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for item in pattern:
+                child = self.goto[node].get(item)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.dict_link.append(0)
+                    self.goto[node][item] = child
+                node = child
+            self.output[node].append(pattern_id)
+
+        # Breadth-first so each node's failure target is finished before its children need it
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for item, child in self.goto[node].items():
+                queue.append(child)
+                target = self.fail[node]
+                while target and item not in self.goto[target]:
+                    target = self.fail[target]
+                target = self.goto[target].get(item, 0) if node else 0
+                self.fail[child] = target
+                self.dict_link[child] = target if self.output[target] else self.dict_link[target]
+
+    def find_in(self, text):
+        """Return the ids of all patterns occurring contiguously in text."""
+        found = set()
+        node = 0
+        for item in text:
+            while node and item not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(item, 0)
+
+            match = node if self.output[node] else self.dict_link[node]
+            while match:
+                found.update(self.output[match])
+                match = self.dict_link[match]
+        return found
@@ -0,0 +1,68 @@
+"""Interned identifiers: the string keys of the TXC tables as categoricals, with one shared dictionary per kind of key.
+
+The transform merges, groups and sorts on these keys over and over. As categoricals they travel through every
+intermediate table as integer codes into shared categories, so merges and group-bys compare integers and no table
+carries its own copy of the strings. Categories are kept sorted, so sorting on the codes orders rows as the strings
+would. A group-by on an interned key needs observed=True, or every combination of categories becomes a group.
+output_hastus decodes the tables back to strings before writing them.
+"""
+import numpy as np
+import pandas as pd
+
+# Columns interned into one dictionary, by the kind of key they hold. DataId is an integer already
+IDENTIFIER_COLUMNS = {
+    'StopPointId': ('StopPointId', 'FromStopPointId', 'ToStopPointId'),
+    'JourneyPatternId': ('JourneyPatternId',),
+    'JourneyPatternSectionId': ('JourneyPatternSectionId',),
+    'JourneyPatternTimingLinkId': ('JourneyPatternTimingLinkId',),
+    'VehicleJourneyCode': ('VehicleJourneyCode',),
+    'ServiceCode': ('ServiceCode',),
+    'LineId': ('LineId',),
+    'LineName': ('LineName',),
+    'VariantId': ('VariantId',),
+    'RouteSectionId': ('RouteSectionId',),
+    'RouteLinkId': ('RouteLinkId',),
+}
+
+
+def identifier_dtype(values):
+    """A categorical dtype over the distinct values, in sorted order. None if they can't be sorted together."""
+    values = pd.unique(pd.Series(values, dtype=object).dropna())
+    try:
+        return pd.CategoricalDtype(np.sort(values))
+    except TypeError:
+        return None
+
+
+def intern_column(column):
+    """column as a categorical over its own values, or unchanged if they can't be sorted together."""
+    dtype = identifier_dtype(column)
+    return column.astype(dtype) if dtype is not None else column
+
+
+def intern_identifiers(txc_tables):
+    """The TXC tables (with mapped column names) with every identifier column converted to its shared categorical."""
+    for columns in IDENTIFIER_COLUMNS.values():
+        found = [(name, column) for name, df in txc_tables.items() for column in columns if column in df.columns]
+        if not found:
+            continue
+        dtype = identifier_dtype(np.concatenate([txc_tables[name][column].to_numpy(dtype=object) for name, column in found]))
+        if dtype is None:
+            continue
+        for name, column in found:
+            txc_tables[name][column] = txc_tables[name][column].astype(dtype)
+    return txc_tables
+
+
+def decode_identifiers(df):
+    """df with its categorical columns back as plain object columns, as they were before interning.
+
+    The other columns are shared with df, and the decoded ones point at the strings in the categories.
+    """
+    categorical = [column for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return df
+    df = df.copy(deep=False)
+    for column in categorical:
+        df[column] = df[column].astype(object)
+    return df
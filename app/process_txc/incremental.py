@@ -0,0 +1,495 @@
+"""Incremental conversion: transform again only the lines whose TransXChange changed since an earlier run.
+
+Every service (DataId, ServiceCode) gets a fingerprint of the TXC rows that belong to it, and every LineName one of
+the fingerprints of its services and the stops they use. The transformed rows of a line are kept in a state store
+under the line's fingerprint, so a later run takes unchanged lines from the store and only builds the trip patterns,
+rationalises the variants and builds the trip tables of the rest. The line tables are then spliced back together for
+the HASTUS writers.
+
+A variant keeps its code while its stops stay the same, even when other variants of its line come, go or change
+rank: the codes given out are kept in a registry in the state store, and a new variant gets a number its line has not
+used before. The registry makes the state specific to one region, so give every region its own state location.
+
+    state = open_state('state/west-yorkshire')  # or 's3://bucket/prefix'
+    transformed = transform_incremental(txc_tables, state)
+"""
+import fcntl
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from process_txc import transform
+from process_txc.cache import DEFAULT_MAX_AGE_DAYS, LocalTableCache, S3TableCache
+from helper.metrics import step_runner
+from helper.copy_on_write import own
+from helper.parameters import column_mapping
+
+# Bump whenever the transform changes the rows it produces for a line, so lines stored by older code are recomputed
+STATE_VERSION = 1
+
+# Transformed tables with one LineName per row, which are stored and spliced line by line
+LINE_TABLES = ('VariantMapping', 'VariantLinks', 'VariantPoints', 'Trips', 'TripSections', 'TripSubSections', 'TripStops')
+
+# TXC tables that apply to every service in their file
+FILE_TABLES = ('StopPoints', 'Operators', 'ServicedOrganisations')
+
+# Columns holding a DataId, and identifiers made from one as '<DataId>_...'
+DATA_ID_COLUMNS = ('DataId', 'BaseJourneyPatternDataId')
+PREFIXED_ID_COLUMNS = ('JourneyPatternSubSectionId', 'BaseJourneyPatternSubSectionId')
+
+# Object columns that may hold shapely geometries
+GEOMETRY_COLUMNS = ('Path',)
+
+VARIANT_REGISTRY = 'variant-codes'
+
+# Times to read and update the S3 registry before giving up when other runs keep writing it first
+REGISTRY_ATTEMPTS = 5
+
+
+class LocalState(LocalTableCache):
+    """Incremental state under a local directory: line entries stored as LocalTableCache entries, evicted by age, and
+    the variant code registry as JSON."""
+
+    def __init__(self, root, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        super().__init__(root, max_age_days, max_bytes=None)
+
+    def _registry_path(self):
+        return os.path.join(self.root, f'{VARIANT_REGISTRY}.json')
+
+    def get_registry(self):
+        try:
+            with open(self._registry_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def update_registry(self, update):
+        """Call update on the registry and write the registry back, returning what update returned.
+
+        Runs sharing the directory take a lock on the registry, so one run's codes are never lost to another's.
+        """
+        with open(f'{self._registry_path()}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            registry = self.get_registry()
+            result = update(registry)
+            # Written aside and moved into place so a half-written registry is never read
+            with open(f'{self._registry_path()}.tmp', 'w') as f:
+                json.dump(registry, f)
+            os.replace(f'{self._registry_path()}.tmp', self._registry_path())
+        return result
+
+
+class S3State(S3TableCache):
+    """Incremental state under an S3 prefix: line entries stored as S3TableCache entries, evicted by age, and the
+    variant code registry as a JSON object."""
+
+    def __init__(self, s3_client, bucket, prefix, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        super().__init__(s3_client, bucket, prefix, max_age_days, max_bytes=None)
+
+    def _registry_key(self):
+        return f"{self.prefix}/{VARIANT_REGISTRY}.json"
+
+    def get_registry(self):
+        try:
+            return json.loads(self._read(self._registry_key()))
+        except self.s3_client.exceptions.NoSuchKey:
+            return {}
+
+    def update_registry(self, update, attempts=REGISTRY_ATTEMPTS):
+        """Call update on the registry and write the registry back, returning what update returned.
+
+        The write only succeeds if the registry is still the one read, so when another run wrote it in between, the
+        registry is read and updated again instead of one run's codes being lost.
+        """
+        for attempt in range(attempts):
+            try:
+                response = self.s3_client.get_object(Bucket=self.bucket, Key=self._registry_key())
+                registry = json.loads(response['Body'].read())
+                condition = {'IfMatch': response['ETag']}
+            except self.s3_client.exceptions.NoSuchKey:
+                registry = {}
+                condition = {'IfNoneMatch': '*'}
+
+            result = update(registry)
+            try:
+                self.s3_client.put_object(Bucket=self.bucket, Key=self._registry_key(),
+                                          Body=json.dumps(registry).encode(), **condition)
+                return result
+            except self.s3_client.exceptions.ClientError as e:
+                # PreconditionFailed: written by another run since it was read; ConditionalRequestConflict: being
+                # written now; NoSuchKey: deleted since it was read
+                if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict', 'NoSuchKey'):
+                    raise
+                print(f"⚠️ Variant code registry changed by another run, updating it again ({attempt + 1} of {attempts})")
+        raise RuntimeError(f"Variant code registry s3://{self.bucket}/{self._registry_key()} kept changing, "
+                           f"gave up after {attempts} attempts")
+
+
+def open_state(location, s3_client=None, **limits):
+    """Open incremental state from 's3://bucket/prefix' or a local directory path. Returns None if location is empty."""
+    if not location:
+        return None
+    if location.startswith('s3://'):
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client('s3')
+        return S3State(s3_client, bucket, prefix, **limits)
+    return LocalState(location, **limits)
+
+
+def encode_line_table(df):
+    """df as Parquet can store it exactly, and [(column, encoding)] of what decode_line_table has to restore.
+
+    Parquet reads every missing value in an object column back as None, and an object column of numbers as a number
+    column, and can't hold geometries at all. So geometries move to a '<column>.wkb' column as WKB, the cells that
+    were NaN are marked in a '<column>.nan' column, and every object column is listed to be made object again.
+    """
+    df = df.copy(deep=False)
+    encodings = []
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        encodings.append((column, 'object'))
+        if column in GEOMETRY_COLUMNS:
+            geometry = values.map(lambda value: hasattr(value, 'wkb'))
+            if geometry.any():
+                df[f'{column}.wkb'] = values.where(geometry).map(lambda value: value.wkb, na_action='ignore')
+                values = df[column] = values.where(~geometry, None)
+                encodings.append((column, 'wkb'))
+        missing = values.isna()
+        if missing.any():
+            nan = missing & values.map(lambda value: value is not None)
+            if nan.any():
+                df[f'{column}.nan'] = nan
+                encodings.append((column, 'nan'))
+    return df, encodings
+
+
+def decode_line_table(df, encodings):
+    for column, encoding in encodings:
+        if encoding == 'object':
+            # A column read back as numbers has NaN for its missing values, which are None until marked otherwise
+            values = df[column].astype(object)
+            df[column] = values.where(values.notna(), None)
+        elif encoding == 'wkb':
+            import shapely
+            wkb = df.pop(f'{column}.wkb')
+            stored = wkb.notna()
+            df.loc[stored, column] = shapely.from_wkb(wkb[stored].to_numpy())
+        elif encoding == 'nan':
+            df.loc[df.pop(f'{column}.nan'), column] = np.nan
+    return df
+
+
+def put_line(state, fingerprint, sources, tables):
+    """Store a line's transformed tables, and the sources they came from, under the line's fingerprint."""
+    encoded = {'Sources': sources}
+    encodings = []
+    for name, df in tables.items():
+        encoded[name], table_encodings = encode_line_table(df)
+        encodings += [(name, column, encoding) for column, encoding in table_encodings]
+    encoded['Encodings'] = pd.DataFrame(encodings, columns=['Table', 'Column', 'Encoding'])
+    state.put(f'line-{fingerprint}', encoded)
+
+
+def get_line(state, fingerprint):
+    """(sources, tables) stored for a line fingerprint by put_line, or None if there is no such line."""
+    entry = state.get(f'line-{fingerprint}')
+    if entry is None:
+        return None
+    encodings = entry.pop('Encodings')
+    sources = entry.pop('Sources')
+    tables = {
+        name: decode_line_table(df, [(column, encoding) for table, column, encoding in
+                                     encodings.itertuples(index=False, name=None) if table == name])
+        for name, df in entry.items()
+    }
+    return sources, tables
+
+
+def rows_of(table, keys, owners):
+    """(Row, DataId, ServiceCode) for every row of table matching an owner on DataId and keys."""
+    rows = table[['DataId'] + keys].assign(Row=np.arange(len(table)))
+    owners = owners[list(dict.fromkeys(['DataId', 'ServiceCode'] + keys))].drop_duplicates()
+    return rows.merge(owners, on=['DataId'] + keys)[['Row', 'DataId', 'ServiceCode']]
+
+
+def service_rows(txc_tables):
+    """{table name: (Row, DataId, ServiceCode)} pairing each row position of the TXC tables with the services it
+    belongs to, following journey patterns to their sections, links and routes. txc_tables have mapped column names.
+    A row shared by several services belongs to each of them.
+    """
+    services = txc_tables['Services'][['DataId', 'ServiceCode']].drop_duplicates()
+    journey_patterns = txc_tables['JourneyPatterns']
+    sections = txc_tables['JourneyPatternSections'].merge(
+        journey_patterns[['DataId', 'ServiceCode', 'JourneyPatternId']], on=['DataId', 'JourneyPatternId'])
+    route_sections = txc_tables['RouteSections'].merge(
+        journey_patterns[['DataId', 'ServiceCode', 'VariantId']], on=['DataId', 'VariantId'])
+
+    owned = {
+        'Services': rows_of(txc_tables['Services'], ['ServiceCode'], services),
+        'Lines': rows_of(txc_tables['Lines'], ['ServiceCode'], services),
+        'JourneyPatterns': rows_of(journey_patterns, ['ServiceCode'], services),
+        'JourneyPatternSections': rows_of(txc_tables['JourneyPatternSections'], ['JourneyPatternId'], journey_patterns),
+        'JourneyPatternTimingLinks': rows_of(txc_tables['JourneyPatternTimingLinks'], ['JourneyPatternSectionId'], sections),
+        'Routes': rows_of(txc_tables['Routes'], ['VariantId'], journey_patterns),
+        'RouteSections': rows_of(txc_tables['RouteSections'], ['VariantId'], journey_patterns),
+        'RouteLinks': rows_of(txc_tables['RouteLinks'], ['RouteSectionId'], route_sections),
+        'VehicleJourneys': rows_of(txc_tables['VehicleJourneys'], ['ServiceCode'], services),
+        'VehicleJourneyTimingLinks': rows_of(txc_tables['VehicleJourneyTimingLinks'], ['VehicleJourneyCode'],
+                                             txc_tables['VehicleJourneys']),
+    }
+    for name in FILE_TABLES:
+        if name in txc_tables:
+            owned[name] = rows_of(txc_tables[name], [], services)
+    return owned
+
+
+def row_hashes(df):
+    try:
+        return pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except TypeError:
+        # List columns such as DaysOfWeek can't be hashed, their text can
+        text = {column: str for column in df.columns[df.dtypes == object]}
+        return pd.util.hash_pandas_object(df.astype(text), index=False).to_numpy()
+
+
+def service_fingerprints(txc_tables, owned):
+    """{(DataId, ServiceCode): hex digest} of the rows belonging to each service. DataId itself is left out, so a
+    file keeps its fingerprints when files are added or removed before it.
+    """
+    parts = []
+    for name, rows in owned.items():
+        hashes = row_hashes(txc_tables[name].drop(columns='DataId'))
+        parts.append(rows.assign(Table=name, Hash=hashes[rows['Row'].to_numpy()]))
+    rows = pd.concat(parts, ignore_index=True).sort_values(['DataId', 'ServiceCode', 'Table', 'Row'])
+
+    fingerprints = {}
+    for service, group in rows.groupby(['DataId', 'ServiceCode'], sort=False):
+        digest = hashlib.sha256(f'v{STATE_VERSION}'.encode())
+        for name, table_rows in group.groupby('Table', sort=False):
+            digest.update(name.encode())
+            digest.update(table_rows['Hash'].to_numpy().tobytes())
+        fingerprints[service] = digest.hexdigest()
+    return fingerprints
+
+
+def service_stops(txc_tables, owned):
+    """(DataId, ServiceCode, StopPointId) of every stop the links of each service call at."""
+    parts = []
+    for name in ('RouteLinks', 'JourneyPatternTimingLinks'):
+        rows = owned[name]
+        for column in ('FromStopPointId', 'ToStopPointId'):
+            stop_ids = txc_tables[name][column].to_numpy()[rows['Row'].to_numpy()]
+            parts.append(rows[['DataId', 'ServiceCode']].assign(StopPointId=stop_ids))
+    return pd.concat(parts, ignore_index=True).dropna().drop_duplicates()
+
+
+def line_fingerprints(line_services, fingerprints, stop_ids, stops):
+    """{LineName: hex digest} of the fingerprints of the line's services and the stop rows they use."""
+    stop_hashes = pd.Series(row_hashes(stops), index=stops['StopPointId'].to_numpy())
+    stop_hashes = stop_hashes[~stop_hashes.index.duplicated()]
+
+    lines = {}
+    for line_name, services in line_services.groupby('LineName', sort=True):
+        keys = list(services[['DataId', 'ServiceCode']].itertuples(index=False, name=None))
+        digest = hashlib.sha256(f'v{STATE_VERSION}'.encode())
+        digest.update('|'.join(sorted(fingerprints.get(key, '') for key in keys)).encode())
+        used = stop_ids.merge(services[['DataId', 'ServiceCode']], on=['DataId', 'ServiceCode'])['StopPointId']
+        digest.update(stop_hashes.reindex(sorted(used.unique())).fillna(0).astype('uint64').to_numpy().tobytes())
+        lines[line_name] = digest.hexdigest()
+    return lines
+
+
+def line_sources(services, fingerprints):
+    """(DataId, Source) of the files a line comes from, Source naming a file by the line's services in it."""
+    services = services.assign(Fingerprint=[fingerprints.get(key, '') for key in
+                                            services[['DataId', 'ServiceCode']].itertuples(index=False, name=None)])
+    sources = services.groupby('DataId')['Fingerprint'].agg(lambda f: '|'.join(sorted(f))).rename('Source')
+    return sources.reset_index().sort_values(['Source', 'DataId'], ignore_index=True)
+
+
+def subset_tables(txc_tables_static, owned, services):
+    """The TXC tables cut down to the rows of the given (DataId, ServiceCode) services."""
+    subset = {}
+    data_ids = services['DataId'].unique()
+    for name, table in txc_tables_static.items():
+        if name in owned:
+            rows = owned[name].merge(services, on=['DataId', 'ServiceCode'])['Row'].unique()
+            subset[name] = table.iloc[np.sort(rows)].reset_index(drop=True)
+        else:
+            subset[name] = table[table['DataId'].isin(data_ids)].reset_index(drop=True)
+    return subset
+
+
+def relabel_data_ids(tables, data_ids):
+    """Give a line's stored tables the DataIds of this run. data_ids maps stored DataIds to current ones."""
+    if all(old == new for old, new in data_ids.items()):
+        return tables
+
+    text_ids = {str(old): str(new) for old, new in data_ids.items()}
+    relabelled = {}
+    for name, df in tables.items():
+        df = own(df)
+        for column in DATA_ID_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].map(data_ids).fillna(df[column]).astype(df[column].dtype)
+        for column in PREFIXED_ID_COLUMNS:
+            if column in df.columns:
+                # Far fewer distinct identifiers than rows, so rename each once
+                renamed = {}
+                for identifier in df[column].dropna().unique():
+                    prefix, _, rest = identifier.partition('_')
+                    renamed[identifier] = f"{text_ids.get(prefix, prefix)}_{rest}"
+                df[column] = df[column].map(renamed)
+        relabelled[name] = df
+    return relabelled
+
+
+def variant_signatures(variant_links):
+    """{VariantCode: hex digest} of the direction, stops and timing points of each variant."""
+    links = variant_links.sort_values(['VariantCode', 'JourneyPatternTimingLinkPositionInJourneyPattern'], kind='stable')
+    signatures = {}
+    for code, group in links.groupby('VariantCode', sort=False, observed=True):
+        text = group[['Direction', 'FromStopPointId', 'ToStopPointId', 'FromTP', 'ToTP']].astype(str).agg('|'.join, axis=1)
+        signatures[code] = hashlib.sha256('\n'.join(text).encode()).hexdigest()
+    return signatures
+
+
+def variant_rank(code):
+    return int(code.rsplit('-', 1)[1])
+
+
+def stable_variant_codes(line_name, tables, registry):
+    """Map the variant codes computed for a line to the codes its variants had before.
+
+    registry holds {signature: code} for every variant the line has had and is updated in place. A variant whose
+    signature is unknown gets the line's next unused number, in the order the rationalisation ranked it.
+    """
+    signatures = variant_signatures(tables['VariantLinks'])
+    used = {variant_rank(code) for code in registry.values()}
+    taken = set()
+    codes = {}
+    for code in sorted(signatures, key=variant_rank):
+        stable = registry.get(signatures[code])
+        if stable is None or stable in taken:
+            stable = f'{line_name}-{max(used | {0}) + 1}'
+            registry.setdefault(signatures[code], stable)
+        used.add(variant_rank(stable))
+        taken.add(stable)
+        codes[code] = stable
+    return codes
+
+
+def relabel_variants(tables, codes):
+    if all(old == new for old, new in codes.items()):
+        return tables
+    relabelled = {}
+    for name, df in tables.items():
+        df = own(df)
+        codes_before = df['VariantCode'].astype(object)  # interned codes can only take values they already have
+        df['VariantCode'] = codes_before.map(codes).fillna(codes_before)
+        relabelled[name] = df
+    return relabelled
+
+
+def split_by_line(transformed):
+    """{LineName: {table name: rows}} of the line tables. Rows without a LineName can't be kept and are dropped."""
+    lines = {}
+    for name in LINE_TABLES:
+        table = transformed[name]
+        missing = table['LineName'].isna()
+        if missing.any():
+            print(f"⚠️ Dropped {missing.sum()} {name} row(s) without a LineName from the incremental state")
+        for line_name, rows in table[~missing].groupby('LineName', sort=False, observed=True):
+            lines.setdefault(line_name, {})[name] = rows
+    for tables in lines.values():
+        for name in LINE_TABLES:
+            tables.setdefault(name, transformed[name].iloc[:0])
+    return lines
+
+
+def splice_lines(lines):
+    """Concatenate the line tables of every line, ordered as a full run would leave them."""
+    spliced = {}
+    for name in LINE_TABLES:
+        parts = [tables[name] for _, tables in sorted(lines.items())]
+        table = pd.concat(parts) if parts else pd.DataFrame()
+        spliced[name] = table.sort_values('DataId', kind='stable').reset_index(drop=True) if len(table) else table
+    return spliced
+
+
+def fingerprint_lines(txc_tables, stops):
+    """Fingerprints of every service and line, with what is needed to cut the TXC down to some of the lines.
+    txc_tables have mapped column names; their rows are in the same order as the unmapped tables.
+    """
+    owned = service_rows(txc_tables)
+    fingerprints = service_fingerprints(txc_tables, owned)
+    line_services = txc_tables['Lines'][['LineName', 'DataId', 'ServiceCode']].dropna().drop_duplicates()
+    lines = line_fingerprints(line_services, fingerprints, service_stops(txc_tables, owned), stops)
+    return owned, fingerprints, line_services, lines
+
+
+def load_lines(state, lines, line_services, fingerprints):
+    """{LineName: tables} of the lines found in the state, with this run's DataIds."""
+    stored = {}
+    for line_name, fingerprint in lines.items():
+        entry = get_line(state, fingerprint)
+        if entry is None:
+            continue
+        sources, tables = entry
+        current = line_sources(line_services[line_services['LineName'] == line_name], fingerprints)
+        # Same fingerprint, so the same sources: pair them up in order
+        data_ids = dict(zip(sources['DataId'], current['DataId']))
+        stored[line_name] = relabel_data_ids(tables, data_ids)
+    return stored
+
+
+def transform_incremental(txc_tables_static, state, base_path=None, metrics=None):
+    """transform_all_txc_tables, with the lines unchanged since an earlier run taken from state instead."""
+    measure = step_runner(metrics)
+    start = time.perf_counter()
+
+    txc_tables = transform.manage_distances(transform.map_column_names(
+        {key: own(df) for key, df in txc_tables_static.items()}, column_mapping))
+    stops = measure(transform.prepare_stops, txc_tables)
+    owned, fingerprints, line_services, lines = measure(fingerprint_lines, txc_tables, stops)
+    stored = measure(load_lines, state, lines, line_services, fingerprints)
+
+    changed = [line_name for line_name in lines if line_name not in stored]
+    print(f"♻️ {len(stored)} of {len(lines)} line(s) unchanged, transforming {len(changed)}")
+
+    if changed:
+        services = line_services[line_services['LineName'].isin(changed)][['DataId', 'ServiceCode']].drop_duplicates()
+        subset = subset_tables(txc_tables_static, owned, services)
+        by_line = split_by_line(transform.transform_all_txc_tables(subset, base_path=base_path, metrics=metrics, stops=stops))
+        fresh = {line_name: by_line.get(line_name) or {name: pd.DataFrame() for name in LINE_TABLES} for line_name in changed}
+
+        # Runs can overlap, so codes are given out against the registry as it is when they are written to it
+        def give_out_codes(registry):
+            return {
+                line_name: stable_variant_codes(line_name, tables, registry.setdefault(line_name, {}))
+                for line_name, tables in fresh.items() if len(tables['VariantLinks'])
+            }
+        codes = state.update_registry(give_out_codes)
+
+        for line_name, tables in fresh.items():
+            if line_name in codes:
+                tables = relabel_variants(tables, codes[line_name])
+            sources = line_sources(line_services[line_services['LineName'] == line_name], fingerprints)
+            put_line(state, lines[line_name], sources, tables)
+            stored[line_name] = tables
+
+    # The registry isn't an entry, so it is never evicted
+    state.evict()
+
+    transformed = splice_lines(stored)
+    transformed['Stops'] = stops
+    transformed['TripSummary'], transformed['StopsByRoute'] = transform.summarise_outputs(
+        transformed['Trips'], transformed['TripStops'], stops)
+    print(f"⏱️ Incremental transform: {time.perf_counter() - start:.2f}s")
+    return transformed
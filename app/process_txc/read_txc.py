@@ -1,329 +1,169 @@
-import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 import xml.etree.ElementTree as ET
-from helper.functions import get_text, get_linestring, extract_days_of_week, extract_raw_days
 from helper.parameters import NAMESPACES  # Import NAMESPACES from helper.parameters
+from process_txc.cache import file_cache_key
+from process_txc.sources import ZipMember, open_source, txc_files
+from process_txc.schema import TABLE_SCHEMAS, SERVICED_ORGANISATION_SCHEMA, compile_schema, extract_row
+
+TXC = f"{{{NAMESPACES['txc']}}}"
+
+# Bump whenever the tables process_xml_file produces change, so cached results from older readers are not reused
+READER_VERSION = 1
+
+# Tables returned by process_xml_file, in output order
+TABLE_NAMES = list(TABLE_SCHEMAS)
+
+# Column extraction plans, compiled once from the table schemas
+PLANS = {table: compile_schema(schema) for table, schema in TABLE_SCHEMAS.items()}
+SERVICED_ORGANISATION_PLAN = compile_schema(SERVICED_ORGANISATION_SCHEMA)
+
+
+def parse_serviced_organisation(org, dataid, tables):
+    context = {'DataId': dataid} | extract_row(SERVICED_ORGANISATION_PLAN, org, {})
+
+    for dr in org.findall('.//txc:WorkingDays/txc:DateRange', NAMESPACES):
+        tables['ServicedOrganisations'].append(extract_row(PLANS['ServicedOrganisations'], dr, context))
+
+
+def parse_stop_point(stop_point, dataid, tables):
+    tables['StopPoints'].append(extract_row(PLANS['StopPoints'], stop_point, {'DataId': dataid}))
+
+
+def parse_route(route, dataid, tables):
+    row = extract_row(PLANS['Routes'], route, {'DataId': dataid})
+    tables['Routes'].append(row)
+
+    context = {'DataId': dataid, 'RouteId': row['RouteId']}
+    for idx, ref in enumerate(route.findall('.//txc:RouteSectionRef', NAMESPACES)):
+        context['RouteSectionPosition'] = idx + 1
+        tables['RouteSections'].append(extract_row(PLANS['RouteSections'], ref, context))
+
+
+def parse_route_section(section, dataid, tables):
+    context = {'DataId': dataid, 'RouteSectionId': section.attrib.get('id')}
+    for idx, link in enumerate(section.findall('txc:RouteLink', NAMESPACES)):
+        context['RouteLinkPosition'] = idx + 1
+        tables['RouteLinks'].append(extract_row(PLANS['RouteLinks'], link, context))
+
+
+def parse_journey_pattern_section(jps, dataid, tables):
+    context = {'DataId': dataid, 'JourneyPatternSectionId': jps.attrib.get('id')}
+    for idx, link in enumerate(jps.findall('txc:JourneyPatternTimingLink', NAMESPACES)):
+        context['JourneyPatternTimingLinkPosition'] = idx + 1  # ✅ Assigns sequence number
+        tables['JourneyPatternTimingLinks'].append(extract_row(PLANS['JourneyPatternTimingLinks'], link, context))
+
+
+def parse_operator(operator, dataid, tables):
+    tables['Operators'].append(extract_row(PLANS['Operators'], operator, {'DataId': dataid}))
+
+
+def parse_service(service, dataid, tables):
+    row = extract_row(PLANS['Services'], service, {'DataId': dataid})
+    tables['Services'].append(row)
+
+    context = {'DataId': dataid, 'ServiceCode': row['ServiceCode']}
+    # ✅ Handles cases where no <Line> is present
+    for line in service.findall('.//txc:Line', NAMESPACES) or [None]:
+        tables['Lines'].append(extract_row(PLANS['Lines'], line, context))
+
+    for jp in service.findall('.//txc:StandardService/txc:JourneyPattern', NAMESPACES):
+        jp_row = extract_row(PLANS['JourneyPatterns'], jp, context)
+        tables['JourneyPatterns'].append(jp_row)
+
+        jp_context = {'DataId': dataid, 'JourneyPatternId': jp_row['JourneyPatternId']}
+        for idx, jps in enumerate(jp.findall('txc:JourneyPatternSectionRefs', NAMESPACES)):
+            jp_context['JourneyPatternSectionPosition'] = idx + 1
+            tables['JourneyPatternSections'].append(extract_row(PLANS['JourneyPatternSections'], jps, jp_context))
+
+
+def parse_vehicle_journey(journey, dataid, tables):
+    row = extract_row(PLANS['VehicleJourneys'], journey, {'DataId': dataid})
+    tables['VehicleJourneys'].append(row)
+
+    context = {'DataId': dataid, 'VehicleJourneyCode': row['VehicleJourneyCode'], 'VehicleJourneyTimingLinkPosition': None}
+    links = journey.findall('.//txc:VehicleJourneyTimingLink', NAMESPACES)
+
+    # A journey without its own timing links still gets one row of Nones
+    if not links:
+        tables['VehicleJourneyTimingLinks'].append(extract_row(PLANS['VehicleJourneyTimingLinks'], None, context))
+        return
+
+    for idx, link in enumerate(links):
+        context['VehicleJourneyTimingLinkPosition'] = idx + 1
+        tables['VehicleJourneyTimingLinks'].append(extract_row(PLANS['VehicleJourneyTimingLinks'], link, context))
+
+
+# Record elements and the parser that turns each one into table rows
+RECORD_PARSERS = {
+    f'{TXC}ServicedOrganisation': parse_serviced_organisation,
+    f'{TXC}AnnotatedStopPointRef': parse_stop_point,
+    f'{TXC}Route': parse_route,
+    f'{TXC}RouteSection': parse_route_section,
+    f'{TXC}JourneyPatternSection': parse_journey_pattern_section,
+    f'{TXC}Operator': parse_operator,
+    f'{TXC}Service': parse_service,
+    f'{TXC}VehicleJourney': parse_vehicle_journey,
+}
+
+
+def iter_records(source):
+    """Stream a TXC file and yield each record element in RECORD_PARSERS once its subtree is complete.
+
+    Finished subtrees are cleared and detached from their parent as soon as nothing outside them needs them, so only
+    the open path and the current record are ever held in memory.
+    """
+    stack = []
+    open_records = 0
+
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            if elem.tag in RECORD_PARSERS:
+                open_records += 1
+            continue
+
+        stack.pop()
+        if elem.tag in RECORD_PARSERS:
+            open_records -= 1
+            yield elem
+
+        # Keep anything inside a record that is still being built
+        if open_records == 0:
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
 
 
 # Function to parse and create DataFrame from XML files
 def process_xml_file(file_path, dataid, filename):
+    tables = {name: [] for name in TABLE_NAMES}
+    tables['ImportSummary'].append(extract_row(PLANS['ImportSummary'], None, {'DataId': dataid, 'FileName': filename}))
+
     try:
-        # Attempt to parse XML
-        tree = ET.parse(file_path)
-        root = tree.getroot()
+        # Single streaming pass over the file
+        with open_source(file_path) as f:
+            for elem in iter_records(f):
+                RECORD_PARSERS[elem.tag](elem, dataid, tables)
     except ET.ParseError as e:
         print(f"❌ ERROR: Failed to parse {file_path} - {e}")
         return {}  # Return empty dictionary to prevent crashes
 
+    return {name: pd.DataFrame(rows) for name, rows in tables.items()}
 
-    # Function to parse XML sections and ensure Route is included
-    def parse_section(tag, mappings, dataid):
-        """Parses a given XML section into a list of dictionaries and ensures Route is included."""
-        return [
-            {'DataId': dataid} | {key: get_text(elem, path) for key, path in mappings.items()}
-            for elem in root.findall(f'.//txc:{tag}', NAMESPACES)
-        ]
-
-    import_summary = [
-        {
-            'DataId': dataid,
-            'FileName': filename
-        }
-    ]
-
-
-    # # Extracting different sections
-    # serviced_orgs = parse_section('ServicedOrganisation', {
-    #     'OrganisationCode': 'txc:OrganisationCode',
-    #     'Name': 'txc:Name',
-    #     'StartDate': './/txc:StartDate',
-    #     'EndDate': './/txc:EndDate'
-    # }, dataid)
-
-    serviced_orgs = []
-
-    for org in root.findall('.//txc:ServicedOrganisation', NAMESPACES):
-        org_code = get_text(org, 'txc:OrganisationCode')
-        name = get_text(org, 'txc:Name')
-
-        for dr in org.findall('.//txc:WorkingDays/txc:DateRange', NAMESPACES):
-            serviced_orgs.append({
-                'DataId': dataid,
-                'OrganisationCode': org_code,
-                'Name': name,
-                'StartDate': get_text(dr, 'txc:StartDate'),
-                'EndDate': get_text(dr, 'txc:EndDate'),
-            })
-
-
-    stop_points = [{
-        'DataId': dataid,
-        'StopPointRef': get_text(stop_point, 'txc:StopPointRef'),
-        'CommonName': get_text(stop_point, 'txc:CommonName'),
-        'Longitude': get_text(stop_point, 'txc:Location/txc:Longitude'),
-        'Latitude': get_text(stop_point, 'txc:Location/txc:Latitude')
-    }
-    for stop_point in root.findall('.//txc:AnnotatedStopPointRef', NAMESPACES)
-    ]
-
-    routes = [
-        {
-            'DataId': dataid,
-            'RouteId': route.attrib.get('id'),
-            'Description': get_text(route, 'txc:Description'),
-        }
-        for route in root.findall('.//txc:Route', NAMESPACES)
-    ]
-
-    route_links = [
-        {
-            'DataId': dataid,
-            #'FileRoute': route_name,
-            'RouteSectionId': section.attrib.get('id'),
-            'RouteLinkId': link.attrib.get('id'),
-            'RouteLinkPosition': idx + 1,
-            'FromStopPointRef': get_text(link, 'txc:From/txc:StopPointRef'),
-            'FromWaitTime': get_text(link, 'txc:From/txc:WaitTime'),
-            'ToStopPointRef': get_text(link, 'txc:To/txc:StopPointRef'),
-            'ToWaitTime': get_text(link, 'txc:To/txc:WaitTime'),
-            'Distance': get_text(link, 'txc:Distance'),
-            'Direction': get_text(link, 'txc:Direction'),
-            'Path': get_linestring(link)
-        }
-        for section in root.findall('.//txc:RouteSection', NAMESPACES)
-        for idx, link in enumerate(section.findall('txc:RouteLink', NAMESPACES))
-    ]
-
-    route_sections = [
-        {
-            'DataId': dataid,
-            'RouteId': get_text(route, '@id'),  # Extract RouteId from attribute
-            'RouteSectionId': ref.text,  # Each RouteSectionRef on a separate row
-            'RouteSectionPosition': idx + 1
-        }
-        for route in root.findall('.//txc:Route', NAMESPACES)
-        for idx, ref in enumerate(route.findall('.//txc:RouteSectionRef', NAMESPACES))
-    ]
-
-
-    journey_pattern_timing_links = [
-        {
-            'DataId': dataid,
-            'JourneyPatternSectionId': jps.attrib.get('id'),
-            'JourneyPatternTimingLinkId': link.attrib.get('id'),
-            'FromActivity': get_text(link, 'txc:From/txc:Activity'),
-            'FromStopPointRef': get_text(link, 'txc:From/txc:StopPointRef'),
-            'FromTimingStatus': get_text(link, 'txc:From/txc:TimingStatus'),
-            'FromWaitTime': get_text(link, 'txc:From/txc:WaitTime'),
-            'ToActivity': get_text(link, 'txc:To/txc:Activity'),
-            'ToStopPointRef': get_text(link, 'txc:To/txc:StopPointRef'),
-            'ToTimingStatus': get_text(link, 'txc:To/txc:TimingStatus'),
-            'ToWaitTime': get_text(link, 'txc:To/txc:WaitTime'),
-            'RunTime': get_text(link, 'txc:RunTime'),
-            'Distance': get_text(link, 'txc:Distance'),
-            'RouteLinkRef': get_text(link, 'txc:RouteLinkRef'),
-            'JourneyPatternTimingLinkPosition': idx + 1  # ✅ Assigns sequence number
-        }
-        for jps in root.findall('.//txc:JourneyPatternSection', NAMESPACES)
-        for idx, link in enumerate(jps.findall('txc:JourneyPatternTimingLink', NAMESPACES))
-    ]
-
-
-    operators = parse_section('Operator', {
-        'OperatorId': '@id',  # Extract Operator ID as an attribute
-        'NationalOperatorCode': 'txc:NationalOperatorCode',
-        'OperatorShortName': 'txc:OperatorShortName',
-        'LicenceNumber': 'txc:LicenceNumber'
-    }, dataid)
-
-    services = [
-        {
-            'DataId': dataid,
-            'ServiceCode': get_text(service, 'txc:ServiceCode'),
-            'Mode': get_text(service, 'txc:Mode'),
-            'StartDate': get_text(service, 'txc:OperatingPeriod/txc:StartDate'),
-            'EndDate': get_text(service, 'txc:OperatingPeriod/txc:EndDate'),
-            'DaysOfWeek': extract_days_of_week(service),
-            'BankHolidayNonOperation': ', '.join(
-                [bh.tag.split('}')[-1] for bh in
-                 service.findall('.//txc:BankHolidayOperation/txc:DaysOfNonOperation/*', NAMESPACES)]
-            ),
-            'BankHolidayOperation': ', '.join(
-                [bh.tag.split('}')[-1] for bh in
-                 service.findall('.//txc:BankHolidayOperation/txc:DaysOfOperation/*', NAMESPACES)]
-            ),
-            'RegisteredOperatorRef': get_text(service, 'txc:RegisteredOperatorRef'),
-            'StopRequirements': get_text(service, 'txc:StopRequirements/txc:NoNewStopsRequired'),
-            'Origin': get_text(service, 'txc:StandardService/txc:Origin'),
-            'Destination': get_text(service, 'txc:StandardService/txc:Destination'),
-            'Vias': ', '.join(
-                [via.text for via in service.findall('.//txc:StandardService/txc:Vias/txc:Via', NAMESPACES)])
-        }
-        for service in root.findall('.//txc:Service', NAMESPACES)
-    ]
-
-    lines = [
-        {
-            'DataId': dataid,
-            'ServiceCode': get_text(service, 'txc:ServiceCode'),
-            'LineId': line.attrib.get('id') if line is not None else None,
-            'LineName': get_text(line, 'txc:LineName'),
-            'OutboundOrigin': get_text(line, 'txc:OutboundDescription/txc:Origin'),
-            'OutboundDestination': get_text(line, 'txc:OutboundDescription/txc:Destination'),
-            'OutboundDescription': get_text(line, 'txc:OutboundDescription/txc:Description'),
-            'InboundOrigin': get_text(line, 'txc:InboundDescription/txc:Origin'),
-            'InboundDestination': get_text(line, 'txc:InboundDescription/txc:Destination'),
-            'InboundDescription': get_text(line, 'txc:InboundDescription/txc:Description'),
-        }
-        for service in root.findall('.//txc:Service', NAMESPACES)
-        for line in service.findall('.//txc:Line', NAMESPACES) or [None]  # ✅ Handles cases where no <Line> is present
-    ]
-
-    journey_patterns = [
-        {
-            'DataId': dataid,
-            'ServiceCode': get_text(service, 'txc:ServiceCode'),
-            'JourneyPatternId': jp.attrib.get('id') if jp is not None else None,
-            'Direction': get_text(jp, 'txc:Direction'),
-            'RouteId': get_text(jp, 'txc:RouteRef'),
-            'DestinationDisplay': get_text(jp, 'txc:DestinationDisplay'),
-            'OperatorRef': get_text(jp, 'txc:OperatorRef'),
-            'BlockNumber': get_text(jp, 'txc:Operational/txc:Block/txc:BlockNumber'),
-            'BlockDescription': get_text(jp, 'txc:Operational/txc:Block/txc:Description'),
-        }
-        for service in root.findall('.//txc:Service', NAMESPACES)
-        for jp in service.findall('.//txc:StandardService/txc:JourneyPattern', NAMESPACES)
-    ]
-
-    journey_pattern_sections = [
-        {
-            'DataId': dataid,
-            'JourneyPatternId': jp.attrib.get('id') if jp is not None else None,
-            'JourneyPatternSectionPosition': idx + 1,
-            'JourneyPatternSectionRefs': jps.text if jps is not None else None
-        }
-        for service in root.findall('.//txc:Service', NAMESPACES)
-        for jp in service.findall('.//txc:StandardService/txc:JourneyPattern', NAMESPACES)
-        for idx, jps in enumerate(jp.findall('txc:JourneyPatternSectionRefs', NAMESPACES))
-    ]
-
-    #
-    # vehicle_journeys = [
-    #     {
-    #         'DataId': dataid,
-    #         'TicketMachineJourneyCode': get_text(journey, 'txc:Operational/txc:TicketMachine/txc:JourneyCode'),
-    #         'VehicleJourneyCode': get_text(journey, 'txc:VehicleJourneyCode'),
-    #         'PrivateCode': get_text(journey, 'txc:PrivateCode'),
-    #         'OperatorRef': get_text(journey, 'txc:OperatorRef'),
-    #         'ServiceRef': get_text(journey, 'txc:ServiceRef'),
-    #         'LineRef': get_text(journey, 'txc:LineRef'),
-    #         'DepartureTime': get_text(journey, 'txc:DepartureTime'),
-    #         'JourneyPatternRef': get_text(journey, 'txc:JourneyPatternRef'),
-    #         #'DaysOfWeek': extract_days_of_week(journey),
-    #         #'DaysOfWeek': ', '.join([wd.tag.split('}')[-1] for wd in journey.findall('.//txc:RegularDayType/*', NAMESPACES)]),
-    #         'DaysOfWeek': extract_raw_days(journey),
-    #         'BankHolidayNonOperation': ', '.join(
-    #             [bh.tag.split('}')[-1] for bh in journey.findall('.//txc:BankHolidayOperation/txc:DaysOfNonOperation/*', NAMESPACES)]),
-    #         'BankHolidayOperation': ', '.join(
-    #             [bh.tag.split('}')[-1] for bh in journey.findall('.//txc:BankHolidayOperation/txc:DaysOfOperation/*', NAMESPACES)])
-    #     }
-    #     for journey in root.findall('.//txc:VehicleJourney', NAMESPACES)
-    # ]
-
-    vehicle_journeys = [
-        {
-            'DataId': dataid,
-            'TicketMachineJourneyCode': get_text(journey, 'txc:Operational/txc:TicketMachine/txc:JourneyCode'),
-            'VehicleJourneyCode': get_text(journey, 'txc:VehicleJourneyCode'),
-            'PrivateCode': get_text(journey, 'txc:PrivateCode'),
-            'OperatorRef': get_text(journey, 'txc:OperatorRef'),
-            'ServiceRef': get_text(journey, 'txc:ServiceRef'),
-            'LineRef': get_text(journey, 'txc:LineRef'),
-            'DepartureTime': get_text(journey, 'txc:DepartureTime'),
-            'JourneyPatternRef': get_text(journey, 'txc:JourneyPatternRef'),
-            'DaysOfWeek': extract_raw_days(journey),
-            'BankHolidayNonOperation': ', '.join(
-                [bh.tag.split('}')[-1] for bh in
-                 journey.findall('.//txc:BankHolidayOperation/txc:DaysOfNonOperation/*', NAMESPACES)]
-            ),
-            'BankHolidayOperation': ', '.join(
-                [bh.tag.split('}')[-1] for bh in
-                 journey.findall('.//txc:BankHolidayOperation/txc:DaysOfOperation/*', NAMESPACES)]
-            ),
-            'SpecialDaysOperation': [
-                (get_text(dr, 'txc:StartDate'), get_text(dr, 'txc:EndDate'))
-                for dr in journey.findall('.//txc:SpecialDaysOperation/txc:DaysOfOperation/txc:DateRange', NAMESPACES)
-            ],
-            'SpecialDaysNonOperation': [
-                (get_text(dr, 'txc:StartDate'), get_text(dr, 'txc:EndDate'))
-                for dr in journey.findall('.//txc:SpecialDaysOperation/txc:DaysOfNonOperation/txc:DateRange', NAMESPACES)
-            ],
-            'ServicedOrganisationRef': get_text(
-                journey,
-                'txc:OperatingProfile/txc:ServicedOrganisationDayType/txc:DaysOfOperation/txc:WorkingDays/txc:ServicedOrganisationRef'
-            )
-        }
-        for journey in root.findall('.//txc:VehicleJourney', NAMESPACES)
-    ]
-
-    vehicle_journey_timing_links = [
-        {
-            'DataId': dataid,
-            'VehicleJourneyCode': get_text(journey, 'txc:VehicleJourneyCode'),
-            'VehicleJourneyTimingLinkId': link.attrib.get('id') if journey.findall(
-                './/txc:VehicleJourneyTimingLink', NAMESPACES) else None,
-            'JourneyPatternTimingLinkRef': get_text(link, 'txc:JourneyPatternTimingLinkRef') if journey.findall(
-                './/txc:VehicleJourneyTimingLink', NAMESPACES) else None,
-            'VehicleJourneyTimingLinkPosition': idx + 1 if journey.findall(
-                './/txc:VehicleJourneyTimingLink', NAMESPACES) else None,
-            'RunTime': get_text(link, 'txc:RunTime') if journey.findall(
-                './/txc:RunTime', NAMESPACES) else None,
-            'FromActivity': get_text(link, 'txc:From/txc:Activity') if journey.findall(
-                './/txc:From/txc:Activity', NAMESPACES) else None,
-            'FromWaitTime': get_text(link, 'txc:From/txc:WaitTime') if journey.findall(
-                './/txc:From/txc:WaitTime', NAMESPACES) else None,
-            'ToActivity': get_text(link, 'txc:To/txc:Activity') if journey.findall(
-                './/txc:To/txc:Activity', NAMESPACES) else None,
-            'ToWaitTime': get_text(link, 'txc:To/txc:WaitTime') if journey.findall(
-                './/txc:To/txc:WaitTime', NAMESPACES) else None
-        }
-        for journey in root.findall('.//txc:VehicleJourney', NAMESPACES)
-        for idx, link in enumerate(journey.findall('.//txc:VehicleJourneyTimingLink', NAMESPACES) or [{}])
-    ]
-
-    return {
-        "ServicedOrganisations": pd.DataFrame(serviced_orgs),
-        "StopPoints": pd.DataFrame(stop_points),
-        "ImportSummary": pd.DataFrame(import_summary),
-        "Routes": pd.DataFrame(routes),
-        "RouteSections": pd.DataFrame(route_sections),
-        "RouteLinks": pd.DataFrame(route_links),
-        "JourneyPatterns": pd.DataFrame(journey_patterns),
-        "JourneyPatternSections": pd.DataFrame(journey_pattern_sections),
-        "JourneyPatternTimingLinks": pd.DataFrame(journey_pattern_timing_links),
-        "Operators": pd.DataFrame(operators),
-        "Services": pd.DataFrame(services),
-        "Lines": pd.DataFrame(lines),
-        "VehicleJourneys": pd.DataFrame(vehicle_journeys),
-        "VehicleJourneyTimingLinks": pd.DataFrame(vehicle_journey_timing_links),
-    }
-
-
-
-# Function to read and process all .xml files
-def process_all_xml(directory_path):
+# Function to read and process all .xml files in a directory or ZIP archive (see process_txc.sources.txc_files)
+def process_all_xml(source, workers=1, cache=None):
     dataframes = {
         'ImportSummary': [], 'ServicedOrganisations': [], 'StopPoints': [],'Routes': [],  'RouteSections': [], 'RouteLinks': [], 'JourneyPatterns': [],
         'JourneyPatternSections': [], 'JourneyPatternTimingLinks': [], 'Operators': [], 'Services': [], 'Lines': [], 'VehicleJourneys': [], 'VehicleJourneyTimingLinks': []
     }
 
-    data_set = 0
-    for filename in os.listdir(directory_path):
-        if filename.endswith('.xml'):
-            data_set += 1
-            file_path = os.path.join(directory_path, filename)
-            parsed_data = process_xml_file(file_path, data_set, filename)
+    with txc_files(source) as files:
+        filenames = [filename for filename, _ in files]
+        file_paths = [file for _, file in files]
+        data_ids = list(range(1, len(filenames) + 1))
 
+        for parsed_data in parse_files(file_paths, data_ids, filenames, workers, cache):
             if parsed_data:  # Ensure parsed_data is not None
                 for key in parsed_data:
                     if not parsed_data[key].empty:  # Avoid appending empty DataFrames
@@ -338,3 +178,69 @@ def process_all_xml(directory_path):
 
     return dataframes
 
+
+def parse_files(file_paths, data_ids, filenames, workers=1, cache=None):
+    """Run process_xml_file over each file, in a process pool when workers > 1. Results come back in input order.
+
+    With a cache (see process_txc.cache), files whose content was parsed before are loaded from it instead, and newly
+    parsed files are added to it. The cache only saves parsing, so failing to read, write or evict it is a warning.
+    """
+    results = [None] * len(file_paths)
+    keys = [file_cache_key(file_path, READER_VERSION) for file_path in file_paths] if cache else []
+
+    if cache:
+        for i, key in enumerate(keys):
+            try:
+                cached = cache.get(key)
+            except Exception as e:
+                print(f"⚠️ Could not read {filenames[i]} from cache ({e}), parsing it")
+                continue
+            if cached is not None:
+                results[i] = relabel_tables(cached, data_ids[i], filenames[i])
+        print(f"♻️ Loaded {sum(r is not None for r in results)} of {len(file_paths)} file(s) from cache")
+
+    pending = [i for i, r in enumerate(results) if r is None]
+    parsed = parse_uncached([file_paths[i] for i in pending], [data_ids[i] for i in pending],
+                            [filenames[i] for i in pending], workers)
+
+    for i, parsed_data in zip(pending, parsed):
+        results[i] = parsed_data
+        if cache and parsed_data:  # Parse failures are not cached
+            try:
+                cache.put(keys[i], parsed_data)
+            except Exception as e:
+                print(f"⚠️ Could not cache {filenames[i]}: {e}")
+
+    if cache:
+        try:
+            cache.evict()
+        except Exception as e:
+            print(f"⚠️ Could not evict old cache entries: {e}")
+
+    return results
+
+
+def parse_uncached(file_paths, data_ids, filenames, workers=1):
+    # Archive members belong to archives open in this process, so only files on disk can go to a process pool
+    if workers > 1 and len(file_paths) > 1 and not any(isinstance(path, ZipMember) for path in file_paths):
+        try:
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(file_paths)))
+        except OSError as e:
+            # e.g. AWS Lambda has no /dev/shm for the pool's queues. Only creating the pool falls back: an error
+            # while parsing is raised as it would be serially
+            print(f"⚠️ Process pool unavailable ({e}), parsing files serially")
+        else:
+            with pool:
+                return list(pool.map(process_xml_file, file_paths, data_ids, filenames))
+
+    return [process_xml_file(*args) for args in zip(file_paths, data_ids, filenames)]
+
+
+def relabel_tables(tables, dataid, filename):
+    """Give tables loaded from the cache the DataId and file name of the current run."""
+    for df in tables.values():
+        if 'DataId' in df.columns:
+            df['DataId'] = dataid
+    if 'FileName' in tables['ImportSummary'].columns:
+        tables['ImportSummary']['FileName'] = filename
+    return tables
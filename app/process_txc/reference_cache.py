@@ -0,0 +1,46 @@
+"""Process-level cache of reference data (NaPTAN stops, places) loaded from files.
+
+Warm Lambda containers keep module globals between invocations, so each reference file is read once per container
+and reused for as long as its mtime and size are unchanged. Cached values are shared: callers must not modify them.
+"""
+import os
+import threading
+
+_entries = {}
+_stats = {'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+
+
+def file_signature(path):
+    """What identifies a version of a file: its modification time and size. Raises FileNotFoundError if missing."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load(path, loader):
+    """Return loader(path), reusing the result of an earlier load of path while the file is unchanged."""
+    key = (os.path.abspath(path), loader)
+    signature = file_signature(path)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == signature:
+            _stats['hits'] += 1
+            return entry[1]
+
+    value = loader(path)
+    with _lock:
+        _entries[key] = (signature, value)
+        _stats['misses'] += 1
+    return value
+
+
+def stats():
+    """Cache hits and misses since the process started, e.g. {'hits': 3, 'misses': 2}."""
+    with _lock:
+        return dict(_stats)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,250 @@
+from helper.functions import get_linestring, extract_days_of_week, extract_raw_days
+from helper.parameters import NAMESPACES
+
+# Column value supplied by the parsing loop rather than read from the row element (DataId, parent ids, positions)
+CONTEXT = None
+
+
+def qualify(step):
+    """Expand a prefixed tag ('txc:Name') to the Clark notation ElementTree stores ('{namespace}Name')."""
+    prefix, sep, local = step.partition(':')
+    return f"{{{NAMESPACES[prefix]}}}{local}" if sep else step
+
+
+def qualify_path(path):
+    return '/'.join(qualify(step) for step in path.split('/'))
+
+
+def compile_path(path):
+    """Turn a column path into an accessor returning the text (or attribute) it points at, or None.
+
+    '@name' reads an attribute and '.' the element's own text. Plain child paths are pre-split into qualified tags
+    and walked one find() at a time, which stays on ElementTree's C fast path instead of re-resolving the namespaced
+    path on every call. Anything else (e.g. './/') is qualified once and handed to find().
+    """
+    if path == '.':
+        return lambda elem: elem.text if elem is not None else None
+
+    if path.startswith('@'):
+        name = path[1:]
+        return lambda elem: elem.attrib.get(name) if elem is not None else None
+
+    if '.' in path or '*' in path or '//' in path:
+        qualified = qualify_path(path)
+
+        def find_text(elem):
+            found = elem.find(qualified) if elem is not None else None
+            return found.text if found is not None else None
+
+        return find_text
+
+    tags = tuple(qualify(step) for step in path.split('/'))
+
+    def child_text(elem):
+        for tag in tags:
+            if elem is None:
+                return None
+            elem = elem.find(tag)
+        return elem.text if elem is not None else None
+
+    return child_text
+
+
+def joined_tags(path):
+    """Accessor for the comma-separated tag names of the elements at path, e.g. the days in DaysOfNonOperation."""
+    qualified = qualify_path(path)
+    return lambda elem: ', '.join([child.tag.split('}')[-1] for child in elem.findall(qualified)])
+
+
+def joined_text(path):
+    """Accessor for the comma-separated text of the elements at path."""
+    qualified = qualify_path(path)
+    return lambda elem: ', '.join([child.text for child in elem.findall(qualified)])
+
+
+def date_ranges(path):
+    """Accessor for (StartDate, EndDate) tuples of the DateRange elements at path."""
+    qualified = qualify_path(path)
+    start_date, end_date = compile_path('txc:StartDate'), compile_path('txc:EndDate')
+    return lambda elem: [(start_date(dr), end_date(dr)) for dr in elem.findall(qualified)]
+
+
+def compile_schema(schema):
+    """Compile a column -> source mapping into a plan of (column, accessor) pairs, keeping column order.
+
+    A source is a path (see compile_path), a callable taking the row element, or CONTEXT.
+    """
+    return tuple(
+        (column, compile_path(source) if isinstance(source, str) else source)
+        for column, source in schema.items()
+    )
+
+
+def extract_row(plan, elem, context):
+    """Build one table row from its element, taking CONTEXT columns from context."""
+    return {column: context[column] if accessor is None else accessor(elem) for column, accessor in plan}
+
+
+# Fields read once per ServicedOrganisation and repeated on each of its WorkingDays DateRange rows
+SERVICED_ORGANISATION_SCHEMA = {
+    'OrganisationCode': 'txc:OrganisationCode',
+    'Name': 'txc:Name',
+}
+
+# One schema per table returned by process_xml_file, in output order. Paths are relative to the element each row
+# is built from (noted above each table).
+TABLE_SCHEMAS = {
+    # ServicedOrganisation/WorkingDays/DateRange
+    'ServicedOrganisations': {
+        'DataId': CONTEXT,
+        'OrganisationCode': CONTEXT,
+        'Name': CONTEXT,
+        'StartDate': 'txc:StartDate',
+        'EndDate': 'txc:EndDate',
+    },
+    # AnnotatedStopPointRef
+    'StopPoints': {
+        'DataId': CONTEXT,
+        'StopPointRef': 'txc:StopPointRef',
+        'CommonName': 'txc:CommonName',
+        'Longitude': 'txc:Location/txc:Longitude',
+        'Latitude': 'txc:Location/txc:Latitude',
+    },
+    'ImportSummary': {
+        'DataId': CONTEXT,
+        'FileName': CONTEXT,
+    },
+    # Route
+    'Routes': {
+        'DataId': CONTEXT,
+        'RouteId': '@id',
+        'Description': 'txc:Description',
+    },
+    # Route//RouteSectionRef
+    'RouteSections': {
+        'DataId': CONTEXT,
+        'RouteId': CONTEXT,
+        'RouteSectionId': '.',
+        'RouteSectionPosition': CONTEXT,
+    },
+    # RouteSection/RouteLink
+    'RouteLinks': {
+        'DataId': CONTEXT,
+        'RouteSectionId': CONTEXT,
+        'RouteLinkId': '@id',
+        'RouteLinkPosition': CONTEXT,
+        'FromStopPointRef': 'txc:From/txc:StopPointRef',
+        'FromWaitTime': 'txc:From/txc:WaitTime',
+        'ToStopPointRef': 'txc:To/txc:StopPointRef',
+        'ToWaitTime': 'txc:To/txc:WaitTime',
+        'Distance': 'txc:Distance',
+        'Direction': 'txc:Direction',
+        'Path': get_linestring,
+    },
+    # Service//StandardService/JourneyPattern
+    'JourneyPatterns': {
+        'DataId': CONTEXT,
+        'ServiceCode': CONTEXT,
+        'JourneyPatternId': '@id',
+        'Direction': 'txc:Direction',
+        'RouteId': 'txc:RouteRef',
+        'DestinationDisplay': 'txc:DestinationDisplay',
+        'OperatorRef': 'txc:OperatorRef',
+        'BlockNumber': 'txc:Operational/txc:Block/txc:BlockNumber',
+        'BlockDescription': 'txc:Operational/txc:Block/txc:Description',
+    },
+    # JourneyPattern/JourneyPatternSectionRefs
+    'JourneyPatternSections': {
+        'DataId': CONTEXT,
+        'JourneyPatternId': CONTEXT,
+        'JourneyPatternSectionPosition': CONTEXT,
+        'JourneyPatternSectionRefs': '.',
+    },
+    # JourneyPatternSection/JourneyPatternTimingLink
+    'JourneyPatternTimingLinks': {
+        'DataId': CONTEXT,
+        'JourneyPatternSectionId': CONTEXT,
+        'JourneyPatternTimingLinkId': '@id',
+        'FromActivity': 'txc:From/txc:Activity',
+        'FromStopPointRef': 'txc:From/txc:StopPointRef',
+        'FromTimingStatus': 'txc:From/txc:TimingStatus',
+        'FromWaitTime': 'txc:From/txc:WaitTime',
+        'ToActivity': 'txc:To/txc:Activity',
+        'ToStopPointRef': 'txc:To/txc:StopPointRef',
+        'ToTimingStatus': 'txc:To/txc:TimingStatus',
+        'ToWaitTime': 'txc:To/txc:WaitTime',
+        'RunTime': 'txc:RunTime',
+        'Distance': 'txc:Distance',
+        'RouteLinkRef': 'txc:RouteLinkRef',
+        'JourneyPatternTimingLinkPosition': CONTEXT,
+    },
+    # Operator
+    'Operators': {
+        'DataId': CONTEXT,
+        'OperatorId': '@id',
+        'NationalOperatorCode': 'txc:NationalOperatorCode',
+        'OperatorShortName': 'txc:OperatorShortName',
+        'LicenceNumber': 'txc:LicenceNumber',
+    },
+    # Service
+    'Services': {
+        'DataId': CONTEXT,
+        'ServiceCode': 'txc:ServiceCode',
+        'Mode': 'txc:Mode',
+        'StartDate': 'txc:OperatingPeriod/txc:StartDate',
+        'EndDate': 'txc:OperatingPeriod/txc:EndDate',
+        'DaysOfWeek': extract_days_of_week,
+        'BankHolidayNonOperation': joined_tags('.//txc:BankHolidayOperation/txc:DaysOfNonOperation/*'),
+        'BankHolidayOperation': joined_tags('.//txc:BankHolidayOperation/txc:DaysOfOperation/*'),
+        'RegisteredOperatorRef': 'txc:RegisteredOperatorRef',
+        'StopRequirements': 'txc:StopRequirements/txc:NoNewStopsRequired',
+        'Origin': 'txc:StandardService/txc:Origin',
+        'Destination': 'txc:StandardService/txc:Destination',
+        'Vias': joined_text('.//txc:StandardService/txc:Vias/txc:Via'),
+    },
+    # Service//Line (a service without lines gives one row of Nones)
+    'Lines': {
+        'DataId': CONTEXT,
+        'ServiceCode': CONTEXT,
+        'LineId': '@id',
+        'LineName': 'txc:LineName',
+        'OutboundOrigin': 'txc:OutboundDescription/txc:Origin',
+        'OutboundDestination': 'txc:OutboundDescription/txc:Destination',
+        'OutboundDescription': 'txc:OutboundDescription/txc:Description',
+        'InboundOrigin': 'txc:InboundDescription/txc:Origin',
+        'InboundDestination': 'txc:InboundDescription/txc:Destination',
+        'InboundDescription': 'txc:InboundDescription/txc:Description',
+    },
+    # VehicleJourney
+    'VehicleJourneys': {
+        'DataId': CONTEXT,
+        'TicketMachineJourneyCode': 'txc:Operational/txc:TicketMachine/txc:JourneyCode',
+        'VehicleJourneyCode': 'txc:VehicleJourneyCode',
+        'PrivateCode': 'txc:PrivateCode',
+        'OperatorRef': 'txc:OperatorRef',
+        'ServiceRef': 'txc:ServiceRef',
+        'LineRef': 'txc:LineRef',
+        'DepartureTime': 'txc:DepartureTime',
+        'JourneyPatternRef': 'txc:JourneyPatternRef',
+        'DaysOfWeek': extract_raw_days,
+        'BankHolidayNonOperation': joined_tags('.//txc:BankHolidayOperation/txc:DaysOfNonOperation/*'),
+        'BankHolidayOperation': joined_tags('.//txc:BankHolidayOperation/txc:DaysOfOperation/*'),
+        'SpecialDaysOperation': date_ranges('.//txc:SpecialDaysOperation/txc:DaysOfOperation/txc:DateRange'),
+        'SpecialDaysNonOperation': date_ranges('.//txc:SpecialDaysOperation/txc:DaysOfNonOperation/txc:DateRange'),
+        'ServicedOrganisationRef': 'txc:OperatingProfile/txc:ServicedOrganisationDayType/txc:DaysOfOperation/'
+                                   'txc:WorkingDays/txc:ServicedOrganisationRef',
+    },
+    # VehicleJourney//VehicleJourneyTimingLink (a journey without links gives one row of Nones)
+    'VehicleJourneyTimingLinks': {
+        'DataId': CONTEXT,
+        'VehicleJourneyCode': CONTEXT,
+        'VehicleJourneyTimingLinkId': '@id',
+        'JourneyPatternTimingLinkRef': 'txc:JourneyPatternTimingLinkRef',
+        'VehicleJourneyTimingLinkPosition': CONTEXT,
+        'RunTime': 'txc:RunTime',
+        'FromActivity': 'txc:From/txc:Activity',
+        'FromWaitTime': 'txc:From/txc:WaitTime',
+        'ToActivity': 'txc:To/txc:Activity',
+        'ToWaitTime': 'txc:To/txc:WaitTime',
+    },
+}
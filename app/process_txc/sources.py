@@ -0,0 +1,185 @@
+import io
+import os
+import posixpath
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+
+# Nested archives up to this size are held in memory while they are read, larger ones are spooled to /tmp
+SPOOL_MAX_BYTES = 64 * 1024 ** 2
+
+# Read size for S3 object streams; each buffer refill is one ranged GET
+S3_BUFFER_SIZE = 8 * 1024 ** 2
+
+
+class NestedArchive:
+    """A ZIP archive inside another one, opened from it only while its members are read.
+
+    ZipFile seeks around its input, which a compressed member can only do by decompressing it again, so an open nested
+    archive is copied out to a spooled temporary file. Only the archives on the way to the member being read are kept
+    open: opening one closes any other in opened, the list of open NestedArchives its archive shares.
+    """
+
+    def __init__(self, parent, info, opened):
+        self.parent = parent
+        self.info = info
+        self.opened = opened
+        self.spool = None
+        self.archive = None
+
+    def ancestors(self):
+        archives = []
+        archive = self
+        while isinstance(archive, NestedArchive):
+            archives.append(archive)
+            archive = archive.parent
+        return archives
+
+    def open_archive(self):
+        if self.archive is None:
+            ancestors = self.ancestors()
+            for archive in [archive for archive in self.opened if archive not in ancestors]:
+                archive.close()
+
+            self.spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+            with open_archive(self.parent).open(self.info) as f:
+                shutil.copyfileobj(f, self.spool)
+            self.spool.seek(0)
+            self.archive = zipfile.ZipFile(self.spool)
+            self.opened.append(self)
+        return self.archive
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+            self.spool.close()
+            self.archive = self.spool = None
+            self.opened.remove(self)
+
+
+def open_archive(archive):
+    """The ZipFile of an open ZIP archive or a NestedArchive, opening the NestedArchive if it isn't already."""
+    if isinstance(archive, NestedArchive):
+        return archive.open_archive()
+    return archive
+
+
+class ZipMember:
+    """A TXC file inside a ZIP archive (a ZipFile or NestedArchive), read straight from the archive."""
+
+    def __init__(self, archive, info, label):
+        self.archive = archive
+        self.info = info
+        self.label = label
+
+    def open(self):
+        return open_archive(self.archive).open(self.info)
+
+    def __str__(self):
+        return self.label
+
+
+def open_source(file):
+    """Open a TXC file for binary reading: a local path or a ZipMember."""
+    if isinstance(file, ZipMember):
+        return file.open()
+    return open(file, 'rb')
+
+
+def zip_members(archive, prefix, opened):
+    """Yield (label, ZipMember) for every .xml file in archive, descending into nested .zip files.
+
+    Nested archives are NestedArchives sharing the opened list; each is only open while it is listed.
+    """
+    for info in open_archive(archive).infolist():
+        name = info.filename
+        # Skip directories and the resource forks macOS adds to archives it creates
+        if info.is_dir() or name.startswith('__MACOSX/'):
+            continue
+
+        label = f'{prefix}/{name}' if prefix else name
+        if name.lower().endswith('.zip'):
+            nested = NestedArchive(archive, info, opened)
+            yield from zip_members(nested, label, opened)
+            nested.close()
+        elif name.lower().endswith('.xml'):
+            yield label, ZipMember(archive, info, label)
+
+
+@contextmanager
+def txc_files(source):
+    """Yield the TXC files in source as a list of (file name, file), sorted so DataIds don't depend on listing order.
+
+    source is a directory of .xml files, the path of a ZIP archive, or a seekable binary file holding one (such as
+    open_s3_object). Files in an archive, including those in nested archives, are ZipMembers read straight from it,
+    so nothing is extracted. The archive stays open until the context exits; nested ones open as their files are read.
+    Raises FileNotFoundError if source holds no .xml files.
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        filenames = sorted(filename for filename in os.listdir(source) if filename.lower().endswith('.xml'))
+        if not filenames:
+            raise FileNotFoundError(f"No TXC files (.xml) found in {source}")
+        yield [(filename, os.path.join(source, filename)) for filename in filenames]
+        return
+
+    opened = []
+    with zipfile.ZipFile(source) as archive:
+        try:
+            # Sorted by label, a nested archive's members are read one after another, so it is opened once per pass
+            members = sorted(zip_members(archive, '', opened), key=lambda member: member[0])
+            if not members:
+                raise FileNotFoundError(f"No TXC files (.xml) found in {getattr(source, 'name', source)}")
+            yield [(posixpath.basename(label), member) for label, member in members]
+        finally:
+            for nested in list(opened):
+                nested.close()
+
+
+class S3ObjectReader(io.RawIOBase):
+    """Seekable binary reader over an S3 object, each read a ranged GET. Wrap in a buffer, see open_s3_object."""
+
+    def __init__(self, s3_client, bucket, key):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.name = f's3://{bucket}/{key}'
+        self.size = s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        if self.position < 0:
+            raise ValueError(f"Negative seek position {self.position}")
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size or not len(buffer):
+            return 0
+        end = min(self.position + len(buffer), self.size) - 1
+        data = self.s3_client.get_object(Bucket=self.bucket, Key=self.key,
+                                         Range=f'bytes={self.position}-{end}')['Body'].read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def open_s3_object(s3_client, bucket, key, buffer_size=S3_BUFFER_SIZE):
+    """Open an S3 object as a seekable binary file without downloading it, e.g. to pass a ZIP to txc_files."""
+    return io.BufferedReader(S3ObjectReader(s3_client, bucket, key), buffer_size)
@@ -0,0 +1,145 @@
+"""Prebuilt NaPTAN stop store: the stop reference CSVs as memory-mapped Arrow files, looked up by StopPointId.
+
+Reading the national stop-codes.csv costs seconds on every conversion. The store holds the same columns in Arrow IPC
+files sorted by StopPointId and memory-mapped once per process (see process_txc.reference_cache), so a lookup binary
+searches the keys and copies out only the matching rows.
+The store records the modification time and size of the CSVs it was built from, and isn't used once they change.
+Rebuild it whenever the CSVs change (the Docker image build does this):
+
+    cd app && python -m process_txc.stop_store [--stops static/stop-codes.csv]
+                                               [--places static/stops-with-places.csv] [--out static/stop-store]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from process_txc import reference_cache
+
+STOPS_FILE = 'stops.arrow'
+PLACES_FILE = 'places.arrow'
+
+
+def csv_signatures(stops_path, places_path):
+    """The reference_cache.file_signature of each CSV the store is built from, None for one that doesn't exist."""
+    signatures = {}
+    for name, path in (('stops', stops_path), ('places', places_path)):
+        signatures[name] = list(reference_cache.file_signature(path)) if os.path.exists(path) else None
+    return signatures
+
+
+def write_table(df, path, source, sources):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, b'source': source.encode(),
+                                           b'sources': json.dumps(sources).encode(),
+                                           b'built': str(time.time()).encode()})
+    # Sorted by key so lookups can binary search it, and the rows for one area are paged in together
+    table = table.sort_by('StopPointId')
+    # Written aside and moved into place, so a process that has the old file mapped keeps reading the old file
+    with pa.OSFile(f'{path}.tmp', 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(f'{path}.tmp', path)
+
+
+def build_store(stops_path, places_path, store_path):
+    """Build the store from stop-codes.csv and, if present, stops-with-places.csv. Returns the files written."""
+    from process_txc.transform import import_stops
+
+    os.makedirs(store_path, exist_ok=True)
+    sources = csv_signatures(stops_path, places_path)
+    written = [os.path.join(store_path, STOPS_FILE)]
+    write_table(import_stops(stops_path), written[0], stops_path, sources)
+
+    places_file = os.path.join(store_path, PLACES_FILE)
+    if os.path.exists(places_path):
+        places = pd.read_csv(places_path, low_memory=False)
+        if {'StopPointId', 'Place'}.issubset(places.columns):
+            write_table(places[['StopPointId', 'Place']], places_file, places_path, sources)
+            written.append(places_file)
+        else:
+            print(f"⚠️ '{places_path}' is missing the StopPointId/Place headers, building the store without places")
+    if len(written) == 1 and os.path.exists(places_file):
+        os.remove(places_file)  # don't leave places from an older build behind
+
+    return written
+
+
+def read_sources(path):
+    """The CSV signatures a store file was built from, or None for a store built before they were recorded."""
+    metadata = pa.ipc.open_file(pa.memory_map(path)).schema.metadata or {}
+    return json.loads(metadata[b'sources']) if b'sources' in metadata else None
+
+
+def has_store(store_path, stops_path, places_path):
+    """Whether there is a store built from the CSVs as they are now. A CSV that doesn't exist can't have changed."""
+    path = os.path.join(store_path, STOPS_FILE)
+    if not os.path.exists(path):
+        return False
+
+    built_from = reference_cache.load(path, read_sources) or {}
+    current = csv_signatures(stops_path, places_path)
+    changed = [name for name, signature in current.items() if signature is not None and built_from.get(name) != signature]
+    if changed:
+        print(f"⚠️ Stop store {store_path} was built from a different {' and '.join(changed)} CSV, reading the CSVs instead. "
+              f"Rebuild it with python -m process_txc.stop_store")
+        return False
+    return True
+
+
+def open_table(path):
+    """A store file as an Arrow table backed by a memory map, so its pages are only read when rows are used."""
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+
+def sorted_keys(path):
+    """The StopPointIds of a store file, in their stored (sorted) order, for binary searching."""
+    keys = reference_cache.load(path, open_table)['StopPointId']
+    # Nulls sort last and can't be compared with the ids searched for
+    return keys.slice(0, len(keys) - keys.null_count).to_numpy(zero_copy_only=False)
+
+
+def lookup(store_path, file_name, stop_ids):
+    """Rows of a store file whose StopPointId is in stop_ids, as read_csv would return them. None if it is absent."""
+    path = os.path.join(store_path, file_name)
+    if not os.path.exists(path):
+        return None
+
+    table = reference_cache.load(path, open_table)
+    keys = reference_cache.load(path, sorted_keys)
+    stop_ids = np.sort(pd.unique(pd.Series(stop_ids, dtype=object).dropna().astype(str)).astype(object))
+
+    # Each id's rows are the run between its left and right insertion points, in stored order
+    starts = np.searchsorted(keys, stop_ids, side='left')
+    counts = np.searchsorted(keys, stop_ids, side='right') - starts
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = table.take(np.repeat(starts, counts) + offsets).to_pandas()
+
+    # Arrow gives None for missing strings where read_csv gives NaN
+    for column in rows.columns[rows.dtypes == object]:
+        rows[column] = rows[column].where(rows[column].notna(), np.nan)
+    return rows.reset_index(drop=True)
+
+
+def lookup_stops(store_path, stop_ids):
+    return lookup(store_path, STOPS_FILE, stop_ids)
+
+
+def lookup_places(store_path, stop_ids):
+    return lookup(store_path, PLACES_FILE, stop_ids)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stops', default=os.path.join('static', 'stop-codes.csv'), help='NaPTAN stop-codes.csv')
+    parser.add_argument('--places', default=os.path.join('static', 'stops-with-places.csv'), help='stops-with-places.csv')
+    parser.add_argument('--out', default=os.path.join('static', 'stop-store'), help='store directory to (re)build')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for path in build_store(args.stops, args.places, args.out):
+        print(f"✅ Wrote {path} ({os.path.getsize(path) / 1024 ** 2:.1f} MiB)")
+    print(f"⏱️ Built stop store in {time.perf_counter() - start:.2f}s")
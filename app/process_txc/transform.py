@@ -1,7 +1,11 @@
 import pandas as pd
 from helper.parameters import *
 from helper.functions import *
-from itertools import combinations
+from process_txc.containment import SequenceMatcher
+from process_txc import reference_cache, stop_store
+from process_txc.identifiers import intern_column, intern_identifiers
+from helper.metrics import step_runner
+from helper.copy_on_write import own
 import string
 import numpy as np
 
@@ -21,73 +25,74 @@ def find_minimal_subsection_set(trip_patterns: pd.DataFrame) -> tuple[pd.DataFra
             "LineName", "DataId", "JourneyPatternId",
             "JourneyPatternSubSectionPosition", "JourneyPatternTimingLinkPositionInJourneyPattern"
         ])
-        .groupby(["LineName", "DataId", "JourneyPatternId", "JourneyPatternSubSectionId", "JourneyPatternSubSectionPosition"], as_index=False)
+        .groupby(["LineName", "DataId", "JourneyPatternId", "JourneyPatternSubSectionId", "JourneyPatternSubSectionPosition"], as_index=False, observed=True)
         .agg({"FromStopPointId": list, "ToStopPointId": "last"})
     )
 
     # Build full stop sequence
-    grouped_stops["Stops"] = grouped_stops["FromStopPointId"] + grouped_stops["ToStopPointId"].apply(lambda x: [x])
+    grouped_stops["Stops"] = grouped_stops["FromStopPointId"] + grouped_stops["ToStopPointId"].astype(object).apply(lambda x: [x])
     grouped_stops = grouped_stops.drop(columns=["FromStopPointId", "ToStopPointId"])
 
-    # Compare stop sequences to find duplicates within LineName
-    contained_map = {}
-    all_subsections = set(map(tuple, grouped_stops[[
-        "LineName", "DataId", "JourneyPatternId",
-        "JourneyPatternSubSectionId", "JourneyPatternSubSectionPosition"
-    ]].values))
-    covered_subsections = set()
-    grouped_stops_list = list(grouped_stops.itertuples(index=False))
-
-    for row1, row2 in combinations(grouped_stops_list, 2):
-        if row1.LineName != row2.LineName:
-            continue
-        if row1.Stops == row2.Stops:
-            key1 = (row1.LineName, row1.DataId, row1.JourneyPatternId,
-                    row1.JourneyPatternSubSectionId, row1.JourneyPatternSubSectionPosition)
-            key2 = (row2.LineName, row2.DataId, row2.JourneyPatternId,
-                    row2.JourneyPatternSubSectionId, row2.JourneyPatternSubSectionPosition)
-            contained_map[key1] = key2
-            covered_subsections.add(key1)
-
-    # Determine the minimal (non-duplicated) set
-    minimal_set = all_subsections - covered_subsections
-
-    # Ensure all mappings resolve to their final base subsection
-    def resolve_mapping(subsection):
-        visited = set()
-        while subsection in contained_map:
-            if subsection in visited:
-                break
-            visited.add(subsection)
-            subsection = contained_map[subsection]
-        return subsection
+    key_columns = ["LineName", "DataId", "JourneyPatternId", "JourneyPatternSubSectionId", "JourneyPatternSubSectionPosition"]
 
-    # Generate final mapping table
-    mapping_entries = [
-        (*key, resolve_mapping(key)[3])  # Keep existing key, remap subsection ID
-        for key in all_subsections
-    ]
+    # Subsections with identical stop sequences within a LineName share one base subsection: the last of them in
+    # grouped_stops order. Hashing the sequences finds them without comparing every pair.
+    grouped_stops["Stops"] = grouped_stops["Stops"].apply(tuple)
+    duplicates = grouped_stops.groupby(["LineName", "Stops"], sort=False, observed=True)
+    grouped_stops["BaseJourneyPatternSubSectionId"] = duplicates["JourneyPatternSubSectionId"].transform("last")
+    is_base = duplicates.cumcount(ascending=False) == 0
 
-    subsection_mapping = pd.DataFrame(mapping_entries, columns=[
-        "LineName", "DataId", "JourneyPatternId",
-        "JourneyPatternSubSectionId", "JourneyPatternSubSectionPosition", "BaseJourneyPatternSubSectionId"
-    ]).sort_values([
-        "LineName", "DataId", "JourneyPatternId", "JourneyPatternSubSectionPosition"
-    ])
+    # Generate final mapping table
+    subsection_mapping = (
+        grouped_stops[key_columns + ["BaseJourneyPatternSubSectionId"]]
+        .infer_objects()
+        .sort_values(["LineName", "DataId", "JourneyPatternId", "JourneyPatternSubSectionPosition"])
+    )
 
-    # Filter to only rows part of the minimal set
+    # Filter to only rows part of the minimal (non-duplicated) set
     minimal_route_links = trip_patterns.merge(
-        pd.DataFrame(list(minimal_set), columns=[
-            "LineName", "DataId", "JourneyPatternId",
-            "JourneyPatternSubSectionId", "JourneyPatternSubSectionPosition"
-        ]),
-        on=["LineName", "DataId", "JourneyPatternId", "JourneyPatternSubSectionId", "JourneyPatternSubSectionPosition"],
+        grouped_stops.loc[is_base, key_columns].infer_objects(),
+        on=key_columns,
         how="inner"
     )
 
     return minimal_route_links, subsection_mapping
 
 
+def map_contained_sequences(sequences):
+    """Map the position of each sequence contained (as a contiguous run) in another to the position it folds into.
+
+    Matches the pairwise scan this replaces: a sequence goes to the last later sequence containing it (an identical
+    one included), otherwise to the last earlier, strictly longer one. Identical sequences therefore collapse onto
+    the last of them, and sequences contained in nothing are left unmapped.
+    """
+    positions = {}
+    for i, sequence in enumerate(sequences):
+        positions.setdefault(tuple(sequence), []).append(i)
+    distinct = list(positions)
+
+    # For each distinct sequence, the last position of any strictly longer sequence containing it
+    matcher = SequenceMatcher(distinct)
+    last_container = {}
+    for text_id, text in enumerate(distinct):
+        last = positions[text][-1]
+        for pattern_id in matcher.find_in(text):
+            if pattern_id != text_id and last > last_container.get(pattern_id, -1):
+                last_container[pattern_id] = last
+
+    targets = {}
+    for pattern_id, sequence in enumerate(distinct):
+        same = positions[sequence]
+        longer = last_container.get(pattern_id, -1)
+        for i in same:
+            later = max(same[-1], longer)
+            if later > i:
+                targets[i] = later
+            elif longer >= 0:
+                targets[i] = longer
+    return targets
+
+
 def find_minimal_variant_set_by_subsections(subsection_mapping):
 
     # Step 1: Construct ordered sequences of JourneyPatternSubSections for each JourneyPattern
@@ -95,30 +100,20 @@ def find_minimal_variant_set_by_subsections(subsection_mapping):
         subsection_mapping.sort_values([
             "LineName", "DataId", "JourneyPatternId", "JourneyPatternSubSectionPosition"
         ])
-        .groupby(["LineName", "DataId", "JourneyPatternId"], group_keys=False)["BaseJourneyPatternSubSectionId"]
+        .groupby(["LineName", "DataId", "JourneyPatternId"], group_keys=False, observed=True)["BaseJourneyPatternSubSectionId"]
         .apply(list)
         .reset_index(name="SubSectionSequence")
     )
 
-    variant_map = {}
-    all_variants = set(grouped[["LineName", "DataId", "JourneyPatternId"]].itertuples(index=False, name=None))
-    covered_variants = set()
-    grouped_list = list(grouped.itertuples(index=False))
-
-    for row1, row2 in combinations(grouped_list, 2):
-        if row1.LineName != row2.LineName:
-            continue  # Only compare within the same LineName
-
-        seq1, seq2 = row1.SubSectionSequence, row2.SubSectionSequence
-        key1 = (row1.LineName, row1.DataId, row1.JourneyPatternId)
-        key2 = (row2.LineName, row2.DataId, row2.JourneyPatternId)
+    all_variants = list(grouped[["LineName", "DataId", "JourneyPatternId"]].itertuples(index=False, name=None))
+    sequences = grouped["SubSectionSequence"].tolist()
 
-        if len(seq1) <= len(seq2) and any(seq1 == seq2[k:k+len(seq1)] for k in range(len(seq2) - len(seq1) + 1)):
-            variant_map[key1] = key2
-            covered_variants.add(key1)
-        elif len(seq2) <= len(seq1) and any(seq2 == seq1[k:k+len(seq2)] for k in range(len(seq1) - len(seq2) + 1)):
-            variant_map[key2] = key1
-            covered_variants.add(key2)
+    # Fold each variant into one containing its subsection sequence, comparing only within the same LineName
+    variant_map = {}
+    for positions in grouped.groupby("LineName", sort=False, observed=True).indices.values():
+        targets = map_contained_sequences([sequences[i] for i in positions])
+        for local, target in targets.items():
+            variant_map[all_variants[positions[local]]] = all_variants[positions[target]]
 
     def resolve_mapping(variant_key):
         visited = set()
@@ -129,7 +124,7 @@ def find_minimal_variant_set_by_subsections(subsection_mapping):
             variant_key = variant_map[variant_key]
         return variant_key
 
-    minimal_set = all_variants - covered_variants
+    minimal_set = set(all_variants) - set(variant_map)
 
     # Step 2: Create mapping DataFrame
     mapping_entries = [
@@ -161,12 +156,14 @@ def find_minimal_variant_set_by_subsections(subsection_mapping):
 
     base_sequences["VariantRank"] = (
         base_sequences
-        .groupby("BaseLineName")["SequenceLength"]
+        .groupby("BaseLineName", observed=True)["SequenceLength"]
         .rank(method="first", ascending=False)
         .astype(int)
     )
 
-    base_sequences["VariantCode"] = base_sequences["BaseLineName"] + "-" + base_sequences["VariantRank"].astype(str)
+    base_sequences["VariantCode"] = intern_column(
+        base_sequences["BaseLineName"].astype(str) + "-" + base_sequences["VariantRank"].astype(str)
+    )
 
     # Merge VariantCode into variant_mapping_df
     variant_mapping_df = variant_mapping_df.merge(
@@ -195,14 +192,21 @@ def import_stops(file_path):
     return stops
 
 
+def read_places(file_path):
+    return pd.read_csv(file_path, low_memory=False)
+
+
+
+# ISO-8601 durations as used by TXC RunTime/WaitTime, e.g. PT1H5M30S
+RUNTIME_PATTERN = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+
 
 def parse_runtime(runtime_str):
 
     if pd.isna(runtime_str) or not isinstance(runtime_str, str):
         return 0  # If empty or invalid, return 0 seconds
 
-    pattern = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
-    match = pattern.match(runtime_str)
+    match = RUNTIME_PATTERN.match(runtime_str)
 
     if not match:
         return 0  # Return 0 if the format is unrecognized
@@ -214,13 +218,21 @@ def parse_runtime(runtime_str):
     return hours * 3600 + minutes * 60 + seconds  # Convert to total seconds
 
 
+def parse_runtimes(column):
+    """parse_runtime for a whole column, in int seconds. Each distinct string is parsed once and mapped back."""
+    codes, uniques = pd.factorize(column)
+    # Missing values get code -1, which picks the trailing 0
+    seconds = np.array([parse_runtime(value) for value in uniques] + [0], dtype=int)
+    return pd.Series(seconds[codes], index=column.index, name=column.name)
+
+
 def create_journey_pattern_table(journey_patterns, journey_pattern_sections, journey_pattern_timing_links, lines):
 
-    journey_patterns = journey_patterns.copy(deep=True)
+    journey_patterns = own(journey_patterns)
     journey_patterns = journey_patterns.drop_duplicates().reset_index(drop=True)
-    journey_pattern_sections = journey_pattern_sections.copy(deep=True)
+    journey_pattern_sections = own(journey_pattern_sections)
     journey_pattern_sections = journey_pattern_sections.drop_duplicates().reset_index(drop=True)
-    journey_pattern_timing_links = journey_pattern_timing_links.copy(deep=True)
+    journey_pattern_timing_links = own(journey_pattern_timing_links)
     journey_pattern_timing_links = journey_pattern_timing_links.drop_duplicates().reset_index(drop=True)
 
     journey_patterns = journey_patterns.merge(lines, on=['DataId', 'JourneyPatternId', 'ServiceCode'], how='left')
@@ -233,8 +245,8 @@ def create_journey_pattern_table(journey_patterns, journey_pattern_sections, jou
 
 def add_days_of_week(vehicle_journeys, services):
 
-    vehicle_journeys = vehicle_journeys.copy(deep=True)
-    services = services.copy(deep=True)
+    vehicle_journeys = own(vehicle_journeys)
+    services = own(services)
 
     # Fill missing info from services
     services.rename(columns = {'DaysOfWeek': 'ServiceDaysOfWeek', 'BankHolidayNonOperation': 'ServiceBankHolidayNonOperation', 'OperatorId': 'ServiceOperatorId'}, inplace=True)
@@ -251,9 +263,9 @@ def add_days_of_week(vehicle_journeys, services):
 
 def links_to_points(table, type):
 
-    table = table.copy(deep = 'True')
-    table['FromWaitTime'] = table['FromWaitTime'].apply(parse_runtime)
-    table['ToWaitTime'] = table['ToWaitTime'].apply(parse_runtime)
+    table = own(table)
+    table['FromWaitTime'] = parse_runtimes(table['FromWaitTime'])
+    table['ToWaitTime'] = parse_runtimes(table['ToWaitTime'])
 
     if type == 'trips':
         table = table.sort_values(['DataId', 'LineId', 'VehicleJourneyCode', 'RouteSectionPosition', 'RouteLinkPosition']).reset_index(drop=True)
@@ -274,7 +286,7 @@ def links_to_points(table, type):
                     table['DataId'] != table['DataId'].shift(-1))
 
         # handle first stop in variant
-        first_stop = table[table['FirstInRoute']].copy(deep=True)
+        first_stop = own(table[table['FirstInRoute']])
         first_stop['FirstInSubSection'] = True
         first_stop['JourneyPatternTimingLinkPosition'] = 0
         first_stop['RunTime'] = 'PT0H0M00S'
@@ -284,7 +296,7 @@ def links_to_points(table, type):
         first_stop['TP'] = first_stop['FromTP']
 
     else:
-        table = table.sort_values(['DataId', 'LineId', 'BaseJourneyPatternId', 'JourneyPatternSectionPosition', 'JourneyPatternTimingLinkPosition']).copy(deep=True).reset_index(drop=True)
+        table = own(table.sort_values(['DataId', 'LineId', 'BaseJourneyPatternId', 'JourneyPatternSectionPosition', 'JourneyPatternTimingLinkPosition'])).reset_index(drop=True)
         table['FirstInRoute'] = (table['VariantCode'] != table['VariantCode'].shift(1)) | (
                 table['LineName'] != table['LineName'].shift(1))
 
@@ -300,7 +312,7 @@ def links_to_points(table, type):
 
 
         # handle first stop in variant
-        first_stop = table[table['FirstInRoute']].copy(deep=True)
+        first_stop = own(table[table['FirstInRoute']])
         first_stop['FirstInSubSection'] = True
         first_stop['RouteLinkPosition'] = 0
         first_stop['RunTime'] = 'PT0H0M00S'
@@ -310,7 +322,7 @@ def links_to_points(table, type):
         first_stop['JourneyPatternTimingLinkPositionInJourneyPattern'] = 0
 
         has_missing_distance = (
-            table.groupby(['DataId', 'LineId', 'BaseJourneyPatternId'])['Distance']
+            table.groupby(['DataId', 'LineId', 'BaseJourneyPatternId'], observed=True)['Distance']
             .apply(lambda x: x.isna().any())
             .reset_index(name='HasMissing')
         )
@@ -336,7 +348,7 @@ def links_to_points(table, type):
     if type == 'trips':
         table = table.sort_values(['DataId', 'LineId', 'VehicleJourneyCode', 'RouteSectionPosition', 'RouteLinkPosition']).reset_index(drop=True)
         table['WaitTime'] = (
-                table.groupby(['DataId', 'LineId', 'VehicleJourneyCode'])['FromWaitTime'].shift(-1).fillna(0)
+                table.groupby(['DataId', 'LineId', 'VehicleJourneyCode'], observed=True)['FromWaitTime'].shift(-1).fillna(0)
                 + table['ToWaitTime'].fillna(0)
         )
     else:
@@ -344,7 +356,7 @@ def links_to_points(table, type):
 
         # Apply condition: same stop as next row → add ToWaitTime + next FromWaitTime
         table['WaitTime'] = (
-                table.groupby(['DataId', 'LineId', 'VariantCode'])['FromWaitTime'].shift(-1).fillna(0)
+                table.groupby(['DataId', 'LineId', 'VariantCode'], observed=True)['FromWaitTime'].shift(-1).fillna(0)
                 + table['ToWaitTime'].fillna(0)
         )
 
@@ -355,7 +367,7 @@ def links_to_points(table, type):
 
 
 def add_day_type(table):
-    table = table.copy(deep=True)
+    table = own(table)
     dow = table['DaysOfWeek'].fillna('')
 
     # Boolean checks
@@ -406,7 +418,7 @@ def operates_on_day(day, day_string):
 
 
 def add_operating_days(table):
-    table = table.copy(deep=True)
+    table = own(table)
     day_strs = table["DaysOfWeek"].fillna('')
 
     def compute_operating_days(row):
@@ -426,8 +438,8 @@ def add_trip_pattern_info(vehicle_journey_links: pd.DataFrame, trip_patterns: pd
     shared_columns = set(vehicle_journey_links.columns) & set(trip_patterns.columns) - set(full_keys)
 
     # Split vehicle_journey_links based on presence of JourneyPatternTimingLinkId
-    with_timing = vehicle_journey_links[vehicle_journey_links['JourneyPatternTimingLinkId'].notna()].copy()
-    without_timing = vehicle_journey_links[vehicle_journey_links['JourneyPatternTimingLinkId'].isna()].copy()
+    with_timing = own(vehicle_journey_links[vehicle_journey_links['JourneyPatternTimingLinkId'].notna()])
+    without_timing = own(vehicle_journey_links[vehicle_journey_links['JourneyPatternTimingLinkId'].isna()])
 
     # Merge each subset accordingly
     merged_with_timing = with_timing.merge(
@@ -479,35 +491,33 @@ def manage_distances(txc_tables):
 def add_subsections(trip_patterns):
 
     # Step 1: Recalculate position within JourneyPattern
-    trip_patterns = trip_patterns.sort_values(
+    trip_patterns = own(trip_patterns.sort_values(
         ['DataId', 'JourneyPatternId', 'JourneyPatternSectionPosition', 'JourneyPatternTimingLinkPosition']
-    ).copy()
+    ))
 
     trip_patterns['JourneyPatternTimingLinkPositionInJourneyPattern'] = (
-        trip_patterns.groupby(['DataId', 'JourneyPatternId']).cumcount() + 1
+        trip_patterns.groupby(['DataId', 'JourneyPatternId'], observed=True).cumcount() + 1
     )
 
     # Step 2: Create subsection IDs based on FromTP
-    trip_patterns['JourneyPatternSubSectionId'] = None
-    trip_patterns['JourneyPatternSubSectionPosition'] = None
-
-    for (data_id, journey_pattern_id), group in trip_patterns.groupby(['DataId', 'JourneyPatternId']):
-        group = group.sort_values(by='JourneyPatternTimingLinkPositionInJourneyPattern')
-        subsection_id = 1
-        subsection_ids, subsection_positions = [], []
-
-        for _, row in group.iterrows():
-            if row['JourneyPatternTimingLinkPositionInJourneyPattern'] == 1:
-                subsection_id = 1
-            elif row['FromTP']:
-                subsection_id += 1
-
-            sub_id = f"{data_id}_{journey_pattern_id}_{subsection_id}"
-            subsection_ids.append(sub_id)
-            subsection_positions.append(subsection_id)
+    # A timing point after the first link of a pattern starts a new subsection, so the subsection number is one plus
+    # the running count of those within the pattern (rows are already in pattern order from Step 1)
+    keys = ['DataId', 'JourneyPatternId']
+    starts_subsection = (
+        trip_patterns['FromTP'].astype(bool) & (trip_patterns['JourneyPatternTimingLinkPositionInJourneyPattern'] != 1)
+    )
+    subsection_positions = (
+        starts_subsection.astype(int).groupby([trip_patterns[key] for key in keys], dropna=False, observed=True).cumsum() + 1
+    )
+    subsection_ids = (
+        trip_patterns['DataId'].astype(str) + '_' + trip_patterns['JourneyPatternId'].astype(str) + '_'
+        + subsection_positions.astype(str)
+    )
 
-        trip_patterns.loc[group.index, 'JourneyPatternSubSectionId'] = subsection_ids
-        trip_patterns.loc[group.index, 'JourneyPatternSubSectionPosition'] = subsection_positions
+    # Links without a DataId or JourneyPatternId belong to no pattern and get no subsection
+    in_pattern = trip_patterns[keys].notna().all(axis=1)
+    trip_patterns['JourneyPatternSubSectionId'] = subsection_ids.where(in_pattern, None)
+    trip_patterns['JourneyPatternSubSectionPosition'] = subsection_positions.astype(object).where(in_pattern, None)
 
     return trip_patterns
 
@@ -515,9 +525,9 @@ def add_subsections(trip_patterns):
 def create_routes_table(routes, route_sections, route_links, lines, stops):
     # Merge RouteSections with RouteLinks
     #route_links = routes.merge(route_sections, on=['RouteId', 'RouteSectionId'], how='left')
-    route_sections = route_sections.copy(deep=True)
+    route_sections = own(route_sections)
     route_sections = route_sections.drop_duplicates().reset_index(drop=True)
-    route_links = route_links.copy(deep=True)
+    route_links = own(route_links)
     route_links = route_links.drop_duplicates().reset_index(drop=True)
 
     # Merge RouteLinks with Routes
@@ -606,7 +616,7 @@ def boolean_tps(table):
 
 def get_variant_info(vehicle_journeys, journey_patterns, lines, services):
 
-    variant_info = vehicle_journeys[['DataId', 'ServiceCode', 'LineId', 'JourneyPatternId']].copy(deep=True)
+    variant_info = own(vehicle_journeys[['DataId', 'ServiceCode', 'LineId', 'JourneyPatternId']])
     variant_info = variant_info.drop_duplicates(subset=['DataId', 'ServiceCode', 'LineId', 'JourneyPatternId']).reset_index(drop=True)
     variant_info = variant_info.merge(lines, on=['DataId', 'LineId', 'ServiceCode'], how='left')
     variant_info = variant_info.merge(journey_patterns, on=['DataId', 'ServiceCode', 'JourneyPatternId'], how='left')
@@ -629,8 +639,8 @@ def get_variant_info(vehicle_journeys, journey_patterns, lines, services):
 
 def get_lines(vehicle_journeys, lines):
 
-        lines = lines.copy(deep=True)
-        pattern_lines = vehicle_journeys[['DataId', 'ServiceCode', 'LineId', 'JourneyPatternId']].copy(deep=True)
+        lines = own(lines)
+        pattern_lines = own(vehicle_journeys[['DataId', 'ServiceCode', 'LineId', 'JourneyPatternId']])
         pattern_lines = pattern_lines.drop_duplicates().reset_index(drop=True)
 
         lines = lines.drop_duplicates(subset=['DataId', 'LineId']).reset_index(drop=True)
@@ -639,25 +649,31 @@ def get_lines(vehicle_journeys, lines):
         return pattern_lines
 
 def cumulative_dist(variant_points):
-    variant_points = variant_points.copy()
-
-    def reset_cumsum(group):
-        reset_group = group['FirstInSubSection'].cumsum()
-        group['CumulativeDistance'] = group.groupby(reset_group)['Distance'].cumsum()
-        return group
+    """Distance along each subsection of a variant, restarting at every subsection's first point.
 
+    Points missing any of DataId, LineName or VariantCode belong to no variant and are left out.
+    """
+    variant_keys = ['DataId', 'LineName', 'VariantCode']
     variant_points = (
         variant_points
+        .dropna(subset=variant_keys)
         .sort_values(['DataId', 'LineId', 'BaseJourneyPatternId', 'JourneyPatternSectionPosition', 'JourneyPatternTimingLinkPosition'])
-        .groupby(['DataId', 'LineName', 'VariantCode'], group_keys=False)
-        .apply(reset_cumsum)
         .reset_index(drop=True)
     )
 
+    # Counting subsection starts within each variant numbers its subsections, so one grouped sum over variant and
+    # subsection restarts at every start
+    variants = variant_points.groupby(variant_keys, sort=False, observed=True)
+    subsection = variants['FirstInSubSection'].cumsum()
+    variant_points['CumulativeDistance'] = (
+        variant_points.groupby(variant_keys + [subsection], sort=False, observed=True)['Distance'].cumsum()
+    )
+
     return variant_points
 
 def create_stop_stop_paths(variant_links, stops):
     """Fill only missing Paths in variant_links using stop coordinates."""
+    from shapely import LineString
 
     # Step 1: Prepare stop coordinates
     stop_coords = stops[['StopPointId', 'Latitude', 'Longitude']]
@@ -688,23 +704,22 @@ def create_stop_stop_paths(variant_links, stops):
     return variant_links
 
 
-def prepare_stops(txc_tables, uk_stops_path=None, places_path=None):
+def prepare_stops(txc_tables, uk_stops_path=None, places_path=None, store_path=None):
     base_path = os.getenv("LAMBDA_TASK_ROOT", os.getcwd())
+    static_dir = os.path.join(base_path, "static") if os.getenv("LAMBDA_TASK_ROOT") else os.path.join(base_path, "app", "static")
+
+    # The prebuilt stop store (see process_txc.stop_store) replaces the CSVs unless a CSV is asked for explicitly
+    if store_path is None and uk_stops_path is None and places_path is None:
+        store_path = os.path.join(static_dir, "stop-store")
+
     if uk_stops_path is None:
-        if os.getenv("LAMBDA_TASK_ROOT"):
-            uk_stops_path = os.path.join(base_path, "static", "stop-codes.csv")
-        else:
-            uk_stops_path = os.path.join(base_path, "app", "static", "stop-codes.csv")
+        uk_stops_path = os.path.join(static_dir, "stop-codes.csv")
 
     if places_path is None:
-        if os.getenv("LAMBDA_TASK_ROOT"):
-            places_path = os.path.join(base_path, "static", "stops-with-places.csv")
-        else:
-            places_path = os.path.join(base_path, "app", "static", "stops-with-places.csv")
-    try:
-        uk_stops = import_stops(uk_stops_path)
-    except Exception as e:
-        raise FileNotFoundError(f"Failed to load UK stops from {uk_stops_path}: {e}")
+        places_path = os.path.join(static_dir, "stops-with-places.csv")
+
+    # A store built before the CSVs last changed is stale, so the CSVs are read instead
+    use_store = store_path is not None and stop_store.has_store(store_path, uk_stops_path, places_path)
 
     if 'StopPoints' not in txc_tables or 'StopPointId' not in txc_tables['StopPoints'].columns:
         raise KeyError("TXC tables do not contain 'StopPoints' with a 'StopPointId' column.")
@@ -715,12 +730,26 @@ def prepare_stops(txc_tables, uk_stops_path=None, places_path=None):
         .reset_index(drop=True)
     )
 
+    try:
+        if use_store:
+            uk_stops = stop_store.lookup_stops(store_path, base_stops['StopPointId'])
+        else:
+            uk_stops = reference_cache.load(uk_stops_path, import_stops)
+    except Exception as e:
+        raise FileNotFoundError(f"Failed to load UK stops from {store_path if use_store else uk_stops_path}: {e}")
+
     stops = base_stops.merge(uk_stops, on='StopPointId', how='left')
 
     use_generated_places = True
 
     try:
-        stops_with_places = pd.read_csv(places_path, low_memory=False)
+        if use_store:
+            places_path = os.path.join(store_path, stop_store.PLACES_FILE)
+            stops_with_places = stop_store.lookup_places(store_path, base_stops['StopPointId'])
+            if stops_with_places is None:
+                raise FileNotFoundError(places_path)
+        else:
+            stops_with_places = reference_cache.load(places_path, read_places)
 
         if {'StopPointId', 'Place'}.issubset(stops_with_places.columns):
             stops = stops.merge(stops_with_places[['StopPointId', 'Place']], on='StopPointId', how='left')
@@ -760,6 +789,8 @@ def extract_variant_info(txc_tables):
 
 def prepare_vehicle_journeys(txc_tables):
     vehicle_journeys = enrich_vehicle_journeys(txc_tables['VehicleJourneys'], txc_tables['Services'])
+    # Departure times are integer seconds after midnight from here on, only the output writers format them
+    vehicle_journeys['DepartureTime'] = time_to_seconds(vehicle_journeys['DepartureTime'])
     vehicle_journey_links = txc_tables['VehicleJourneyTimingLinks'].merge(vehicle_journeys, on=['DataId', 'VehicleJourneyCode'], how='left')
     return vehicle_journeys, vehicle_journey_links
 
@@ -785,19 +816,19 @@ def extract_variant_links(trip_patterns):
 
 
 def summarise_trips(trips):
-    return trips.groupby(['DataId', 'LineName', 'DayType', 'Direction']).agg(
+    return trips.groupby(['DataId', 'LineName', 'DayType', 'Direction'], observed=True).agg(
         Count=('LineName', 'count'),
         Variants=('VariantCode', 'unique')
     ).reset_index()
 
 
 def summarise_stops_by_route(trip_stops, stops):
-    stops_by_route = trip_stops.copy()
+    stops_by_route = own(trip_stops)
     stops_by_route['Terminus'] = stops_by_route['FirstInRoute'] | stops_by_route['FirstInRoute'].shift(-1)
 
     stops_by_route = (
         stops_by_route[stops_by_route['TP'] == True]
-        .groupby('StopPointId')
+        .groupby('StopPointId', observed=True)
         .agg(
             Routes=('LineName', lambda x: list(x.unique())),
             TerminusRoutes=('Terminus', lambda t: list(stops_by_route.loc[t.index[t], 'LineName'].unique()))
@@ -811,7 +842,7 @@ def summarise_stops_by_route(trip_stops, stops):
 def create_all_hastus_trip_tables(vehicle_journey_links, trip_patterns):
     trip_links = add_trip_pattern_info(vehicle_journey_links, trip_patterns)
 
-    trip_links['RunTimeSec'] = trip_links['RunTime'].apply(parse_runtime)
+    trip_links['RunTimeSec'] = parse_runtimes(trip_links['RunTime'])
     trip_links['HASTUSDirection'] = trip_links['Direction'].map({'inbound': '4', 'outbound': '5'})
 
     trip_stops = links_to_points(trip_links, 'trips')
@@ -824,11 +855,11 @@ def create_all_hastus_trip_tables(vehicle_journey_links, trip_patterns):
 
 
 def build_trip_sections(trip_stops):
-    trip_stops = trip_stops.copy()
+    trip_stops = own(trip_stops)
     trip_stops['Distance'] = trip_stops['Distance'].replace("None", None).astype(float)
 
     trip_sections = trip_stops.groupby(
-        ['DataId', 'LineId', 'VariantId', 'VehicleJourneyCode', 'JourneyPatternId','JourneyPatternSectionPosition']).agg(
+        ['DataId', 'LineId', 'VariantId', 'VehicleJourneyCode', 'JourneyPatternId','JourneyPatternSectionPosition'], observed=True).agg(
         LineName=('BaseLineName', 'first'),
         BaseJourneyPatternId=('BaseJourneyPatternId', 'first'),
         VariantCode=('VariantCode', 'first'),
@@ -850,7 +881,7 @@ def build_trip_sections(trip_stops):
 
 def build_trip_subsections(trip_links):
     return trip_links.groupby(
-        ['DataId', 'LineId', 'VariantId', 'VehicleJourneyCode', 'JourneyPatternId', 'JourneyPatternSubSectionId']).agg(
+        ['DataId', 'LineId', 'VariantId', 'VehicleJourneyCode', 'JourneyPatternId', 'JourneyPatternSubSectionId'], observed=True).agg(
         LineName=('BaseLineName', 'first'),
         BaseJourneyPatternId=('BaseJourneyPatternId', 'first'),
         BaseJourneyPatternSubSectionId=('BaseJourneyPatternSubSectionId', 'first'),
@@ -869,7 +900,7 @@ def build_trip_subsections(trip_links):
 
 def build_trip_headers(trip_sections):
     trips = trip_sections.groupby(
-        ['DataId', 'LineId', 'VariantId', 'VehicleJourneyCode', 'JourneyPatternId']).agg(
+        ['DataId', 'LineId', 'VariantId', 'VehicleJourneyCode', 'JourneyPatternId'], observed=True).agg(
         LineName=('LineName', 'first'),
         BaseJourneyPatternId=('BaseJourneyPatternId', 'first'),
         DepartureTime=('DepartureTime', 'first'),
@@ -884,7 +915,7 @@ def build_trip_headers(trip_sections):
         OperatingDays=('OperatingDays', 'first')
     ).reset_index()
 
-    trips['ArrivalTime'] = trips.apply(lambda row: compute_arrival_time(row["DepartureTime"], row["RunTimeSec"]), axis=1)
+    trips['ArrivalTime'] = trips['DepartureTime'] + trips['RunTimeSec']
     return trips
 
 
@@ -913,26 +944,33 @@ def generate_variant_geometry(trip_patterns, stops, variant_info):
     return variant_links, variant_points
 
 
-def transform_all_txc_tables(txc_tables_static, base_path=None):
-    txc_tables = {key: df.copy(deep=True) for key, df in txc_tables_static.items()}
-    txc_tables = map_column_names(txc_tables, column_mapping)
-    txc_tables = manage_distances(txc_tables)
+def transform_all_txc_tables(txc_tables_static, base_path=None, metrics=None, stops=None):
+    # With metrics (see helper.metrics), each step below is timed and its result tables counted
+    # stops replaces prepare_stops, for a subset of the TXC that must share Places with the whole region
+    measure = step_runner(metrics)
+
+    txc_tables = {key: own(df) for key, df in txc_tables_static.items()}
+    txc_tables = measure(map_column_names, txc_tables, column_mapping)
+    # Identifiers are categoricals from here on (see process_txc.identifiers); output_hastus decodes them
+    txc_tables = measure(intern_identifiers, txc_tables)
+    txc_tables = measure(manage_distances, txc_tables)
 
-    stops = prepare_stops(txc_tables)
-    variant_info = extract_variant_info(txc_tables)
+    if stops is None:
+        stops = measure(prepare_stops, txc_tables)
+    variant_info = measure(extract_variant_info, txc_tables)
 
-    route_table = create_routes_table(txc_tables['Routes'], txc_tables['RouteSections'], txc_tables['RouteLinks'], txc_tables['Lines'], stops)
-    journey_pattern_lines = get_lines(txc_tables['VehicleJourneys'], txc_tables['Lines'])
-    journey_pattern_table = create_journey_pattern_table(txc_tables['JourneyPatterns'], txc_tables['JourneyPatternSections'], txc_tables['JourneyPatternTimingLinks'], journey_pattern_lines)
+    route_table = measure(create_routes_table, txc_tables['Routes'], txc_tables['RouteSections'], txc_tables['RouteLinks'], txc_tables['Lines'], stops)
+    journey_pattern_lines = measure(get_lines, txc_tables['VehicleJourneys'], txc_tables['Lines'])
+    journey_pattern_table = measure(create_journey_pattern_table, txc_tables['JourneyPatterns'], txc_tables['JourneyPatternSections'], txc_tables['JourneyPatternTimingLinks'], journey_pattern_lines)
 
-    trip_patterns = create_full_trip_patterns(journey_pattern_table, route_table)
-    trip_patterns, subsection_mapping, variant_mapping = rationalise_subsections_and_variants(trip_patterns)
-    variant_links, variant_points = generate_variant_geometry(trip_patterns, stops, variant_info)
+    trip_patterns = measure(create_full_trip_patterns, journey_pattern_table, route_table)
+    trip_patterns, subsection_mapping, variant_mapping = measure(rationalise_subsections_and_variants, trip_patterns)
+    variant_links, variant_points = measure(generate_variant_geometry, trip_patterns, stops, variant_info)
 
-    vehicle_journeys, vehicle_journey_links = prepare_vehicle_journeys(txc_tables)
-    trips, trip_sections, trip_subsections, trip_stops = create_all_hastus_trip_tables(vehicle_journey_links, trip_patterns)
+    vehicle_journeys, vehicle_journey_links = measure(prepare_vehicle_journeys, txc_tables)
+    trips, trip_sections, trip_subsections, trip_stops = measure(create_all_hastus_trip_tables, vehicle_journey_links, trip_patterns)
 
-    trip_summary, stops_by_route = summarise_outputs(trips, trip_stops, stops)
+    trip_summary, stops_by_route = measure(summarise_outputs, trips, trip_stops, stops)
 
     transformed_tables = {
         'VariantMapping': variant_mapping,
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The application modules import each other relative to app/, as they do inside the Lambda image
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+sys.path.insert(0, APP_DIR)
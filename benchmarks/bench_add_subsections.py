@@ -0,0 +1,88 @@
+"""Benchmark transform.add_subsections on a large table of journey pattern timing links.
+
+Compares the previous per-group iterrows assignment with the vectorized add_subsections on the same table.
+
+    python -m benchmarks.bench_add_subsections [--links 1000000] [--links-per-pattern 40]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from process_txc.transform import add_subsections
+
+
+def legacy_add_subsections(trip_patterns):
+    """The assignment as it was before: one Python iteration per timing link."""
+    trip_patterns = trip_patterns.sort_values(
+        ['DataId', 'JourneyPatternId', 'JourneyPatternSectionPosition', 'JourneyPatternTimingLinkPosition']
+    ).copy()
+
+    trip_patterns['JourneyPatternTimingLinkPositionInJourneyPattern'] = (
+        trip_patterns.groupby(['DataId', 'JourneyPatternId']).cumcount() + 1
+    )
+
+    trip_patterns['JourneyPatternSubSectionId'] = None
+    trip_patterns['JourneyPatternSubSectionPosition'] = None
+
+    for (data_id, journey_pattern_id), group in trip_patterns.groupby(['DataId', 'JourneyPatternId']):
+        group = group.sort_values(by='JourneyPatternTimingLinkPositionInJourneyPattern')
+        subsection_id = 1
+        subsection_ids, subsection_positions = [], []
+
+        for _, row in group.iterrows():
+            if row['JourneyPatternTimingLinkPositionInJourneyPattern'] == 1:
+                subsection_id = 1
+            elif row['FromTP']:
+                subsection_id += 1
+
+            subsection_ids.append(f"{data_id}_{journey_pattern_id}_{subsection_id}")
+            subsection_positions.append(subsection_id)
+
+        trip_patterns.loc[group.index, 'JourneyPatternSubSectionId'] = subsection_ids
+        trip_patterns.loc[group.index, 'JourneyPatternSubSectionPosition'] = subsection_positions
+
+    return trip_patterns
+
+
+def synthetic_timing_links(links, links_per_pattern, seed=0):
+    """Timing links for links / links_per_pattern journey patterns over 10 files, two sections each, shuffled."""
+    rng = np.random.default_rng(seed)
+    pattern = np.arange(links) // links_per_pattern
+    position = np.arange(links) % links_per_pattern
+    section_length = links_per_pattern // 2 or 1
+
+    table = pd.DataFrame({
+        'DataId': pattern % 10 + 1,
+        'JourneyPatternId': pd.Series(pattern).map('JP{:07d}'.format),
+        'JourneyPatternSectionPosition': position // section_length + 1,
+        'JourneyPatternTimingLinkPosition': position % section_length + 1,
+        'FromTP': rng.random(links) < 0.3,
+    })
+    return table.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def run(links, links_per_pattern):
+    timing_links = synthetic_timing_links(links, links_per_pattern)
+
+    start = time.perf_counter()
+    legacy = legacy_add_subsections(timing_links)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = add_subsections(timing_links)
+    current_time = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(legacy, current)
+
+    print(f"{links} timing links in {timing_links['JourneyPatternId'].nunique()} journey patterns")
+    print(f"before: {legacy_time:.3f}s  after: {current_time:.3f}s  speed-up: {legacy_time / current_time:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--links', type=int, default=1_000_000, help='timing links in total')
+    parser.add_argument('--links-per-pattern', type=int, default=40, help='timing links per journey pattern')
+    args = parser.parse_args()
+    run(args.links, args.links_per_pattern)
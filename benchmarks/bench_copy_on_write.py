@@ -0,0 +1,114 @@
+"""Peak memory of the conversion pipeline with and without pandas copy-on-write.
+
+Converts the same synthetic TransXChange once per mode, each in a fresh interpreter so the peaks don't carry over,
+and reports the peak RSS and wall time of every stage (measured with helper.metrics.StageMetrics), then checks that
+both modes wrote identical outputs.
+
+    python -m benchmarks.bench_copy_on_write [--scale medium] [--json results.json]
+    python -m benchmarks.bench_copy_on_write --files 4 --services 10 --journey-patterns 8 --timing-links 40 \
+                                             --vehicle-journeys 50
+"""
+import argparse
+import filecmp
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import APP_DIR
+from benchmarks.bench_pipeline import SCALES, STAGES
+from benchmarks.synthetic_txc import write_stop_reference, write_txc_bundle
+
+MODES = {'off': False, 'on': True}
+
+
+def convert(txc_dir, output_dir, copy_on_write):
+    """Run the pipeline in this process and return the StageMetrics step records."""
+    import contextlib
+    from helper.copy_on_write import enable_copy_on_write
+    enable_copy_on_write(copy_on_write)
+
+    from generate_outputs.output_hastus import create_outputs
+    from helper.metrics import StageMetrics
+    from process_txc.read_txc import process_all_xml
+    from process_txc.transform import transform_all_txc_tables
+
+    metrics = StageMetrics(None)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tables = metrics.measure(process_all_xml, txc_dir)
+        transformed = metrics.measure(transform_all_txc_tables, tables)
+        metrics.measure(create_outputs, transformed, output_dir)
+    return metrics.steps
+
+
+def convert_in_child(scale_dir, mode):
+    """Convert scale_dir/txc with copy-on-write on or off in a fresh interpreter, writing to scale_dir/output-<mode>."""
+    output_dir = os.path.join(scale_dir, f'output-{mode}')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(APP_DIR), APP_DIR]))
+    # prepare_stops finds the stop reference under <cwd>/app/static outside Lambda
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.bench_copy_on_write', '--child', mode,
+                             os.path.join(scale_dir, 'txc'), output_dir],
+                            cwd=scale_dir, env=env, capture_output=True, text=True, check=True)
+    steps = json.loads(result.stdout.splitlines()[-1])
+    return {step['step']: step for step in steps if step['step'] in STAGES}, output_dir
+
+
+def same_tree(left, right):
+    comparison = filecmp.dircmp(left, right)
+    if comparison.left_only or comparison.right_only or comparison.diff_files or comparison.funny_files:
+        return False
+    # dircmp only compares the files' stat signatures, so compare content too
+    _, mismatch, errors = filecmp.cmpfiles(left, right, comparison.common_files, shallow=False)
+    return not mismatch and not errors and all(
+        same_tree(os.path.join(left, name), os.path.join(right, name)) for name in comparison.common_dirs)
+
+
+def run(name, params, json_path=None, workdir=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        scale_dir = os.path.join(workdir or tmp, name)
+        write_txc_bundle(os.path.join(scale_dir, 'txc'), **params)
+        write_stop_reference(os.path.join(scale_dir, 'app', 'static'), **params)
+
+        results, outputs = {}, {}
+        for mode in MODES:
+            results[mode], outputs[mode] = convert_in_child(scale_dir, mode)
+        identical = same_tree(outputs['off'], outputs['on'])
+
+    print(f"{name}: copy-on-write off vs on")
+    for stage in STAGES:
+        off, on = results['off'][stage], results['on'][stage]
+        print(f"  {stage:<26} peak RSS {off['peak_rss_mib']:8.1f} -> {on['peak_rss_mib']:8.1f} MiB "
+              f"({on['peak_rss_mib'] - off['peak_rss_mib']:+.1f}), "
+              f"{off['wall_seconds']:7.2f}s -> {on['wall_seconds']:7.2f}s")
+    print("✅ Outputs identical" if identical else "❌ ERROR: outputs differ between the modes")
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'scale': name, 'params': params, 'identical': identical, 'stages': results}, f, indent=2)
+        print(f"✅ Results written to {json_path}")
+    return results, identical
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='medium', help=f"one of {', '.join(SCALES)}")
+    parser.add_argument('--files', type=int, help='use a custom scale with this many TXC files')
+    parser.add_argument('--services', type=int, default=2, help='services per file (custom scale)')
+    parser.add_argument('--journey-patterns', type=int, default=4, help='journey patterns per service (custom scale)')
+    parser.add_argument('--timing-links', type=int, default=20, help='timing links per journey pattern (custom scale)')
+    parser.add_argument('--vehicle-journeys', type=int, default=10, help='journeys per journey pattern (custom scale)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--workdir', help='keep the generated TXC and outputs here instead of a temporary directory')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('paths', nargs='*', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(convert(*args.paths, copy_on_write=MODES[args.child])))
+    elif args.files:
+        run('custom', dict(files=args.files, services=args.services, journey_patterns=args.journey_patterns,
+                           timing_links=args.timing_links, vehicle_journeys=args.vehicle_journeys),
+            args.json, args.workdir)
+    else:
+        run(args.scale, SCALES[args.scale], args.json, args.workdir)
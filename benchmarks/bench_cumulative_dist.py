@@ -0,0 +1,81 @@
+"""Benchmark transform.cumulative_dist on a large table of variant points.
+
+Compares the previous per-variant groupby.apply with the single grouped cumulative sum on the same table.
+
+    python -m benchmarks.bench_cumulative_dist [--points 2000000] [--points-per-variant 40]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from process_txc.transform import cumulative_dist
+
+
+def legacy_cumulative_dist(variant_points):
+    """The sum as it was before: a Python call per variant, each grouping its points again by subsection."""
+    variant_points = variant_points.copy(deep=True)
+
+    def reset_cumsum(group):
+        reset_group = group['FirstInSubSection'].cumsum()
+        group['CumulativeDistance'] = group.groupby(reset_group)['Distance'].cumsum()
+        return group
+
+    return (
+        variant_points
+        .sort_values(['DataId', 'LineId', 'BaseJourneyPatternId', 'JourneyPatternSectionPosition', 'JourneyPatternTimingLinkPosition'])
+        .groupby(['DataId', 'LineName', 'VariantCode'], group_keys=False, observed=True)
+        .apply(reset_cumsum)
+        .reset_index(drop=True)
+    )
+
+
+def synthetic_variant_points(points, points_per_variant, seed=0):
+    """Points of points / points_per_variant variants over 10 files and 50 lines, two sections each, shuffled.
+
+    Some distances are missing, as they are for links without a length.
+    """
+    rng = np.random.default_rng(seed)
+    variant = np.arange(points) // points_per_variant
+    position = np.arange(points) % points_per_variant
+    section_length = points_per_variant // 2 or 1
+    line = variant % 50
+
+    table = pd.DataFrame({
+        'DataId': variant % 10 + 1,
+        'LineId': pd.Series(line).map('L{:03d}'.format),
+        'LineName': pd.Series(line).map(str).astype('category'),
+        'VariantCode': pd.Series(variant).map(lambda v: f'{v % 50}-{v // 50 + 1}').astype('category'),
+        'BaseJourneyPatternId': pd.Series(variant).map('JP{:07d}'.format),
+        'JourneyPatternSectionPosition': position // section_length + 1,
+        'JourneyPatternTimingLinkPosition': position % section_length + 1,
+        'FirstInSubSection': (position == 0) | (rng.random(points) < 0.2),
+        'Distance': np.where(rng.random(points) < 0.02, np.nan, rng.uniform(50, 800, points).round(1)),
+    })
+    return table.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def run(points, points_per_variant):
+    variant_points = synthetic_variant_points(points, points_per_variant)
+
+    start = time.perf_counter()
+    legacy = legacy_cumulative_dist(variant_points)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = cumulative_dist(variant_points)
+    current_time = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(legacy, current)
+
+    print(f"{points} variant points in {variant_points['VariantCode'].nunique()} variants")
+    print(f"before: {legacy_time:.3f}s  after: {current_time:.3f}s  speed-up: {legacy_time / current_time:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=2_000_000, help='variant points in total')
+    parser.add_argument('--points-per-variant', type=int, default=40, help='points per variant')
+    args = parser.parse_args()
+    run(args.points, args.points_per_variant)
@@ -0,0 +1,61 @@
+"""Benchmark the cold import of the Lambda handler module, as paid on every cold start.
+
+Imports the module in fresh interpreters under `python -X importtime`, reports the median total and the slowest
+imports by cumulative time, and checks that the geospatial and mapping packages are not loaded at startup.
+
+    python -m benchmarks.bench_import_time [--module new_lambda] [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks import APP_DIR
+
+# Only needed by the stages that use them, so they must not be imported by the handler module
+LAZY_MODULES = ('geopandas', 'fastkml', 'folium', 'shapely')
+
+
+def import_times(module):
+    """Import module in a fresh interpreter and return {imported module: (self us, cumulative us)}."""
+    env = dict(os.environ, PYTHONPATH=APP_DIR, PYTHONDONTWRITEBYTECODE='1')
+    env.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')  # the handler creates its S3 client at import
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            env=env, capture_output=True, text=True, check=True)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def run(module, runs, top):
+    samples = [import_times(module) for _ in range(runs)]
+    totals = [sample[module][1] / 1e6 for sample in samples]
+    last = samples[-1]
+
+    print(f"import {module}: median {statistics.median(totals):.3f}s over {runs} run(s) "
+          f"(min {min(totals):.3f}s, max {max(totals):.3f}s), {len(last)} modules")
+
+    print(f"slowest {top} imports by cumulative time:")
+    for name, (_, cumulative_us) in sorted(last.items(), key=lambda item: -item[1][1])[:top]:
+        print(f"  {cumulative_us / 1e6:8.3f}s  {name}")
+
+    loaded = [name for name in LAZY_MODULES if name in last]
+    if loaded:
+        print(f"⚠️ loaded at import although only needed later: {', '.join(loaded)}")
+    else:
+        print(f"✅ none of {', '.join(LAZY_MODULES)} loaded at import")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='new_lambda', help='module to import, relative to app/')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to time')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    args = parser.parse_args()
+    run(args.module, args.runs, args.top)
@@ -0,0 +1,193 @@
+"""End-to-end benchmark of the conversion pipeline on synthetic TransXChange at several scales.
+
+Times process_all_xml, transform_all_txc_tables and create_outputs for each scale, measures the peak memory each
+stage allocates (with tracemalloc, in a separate untimed run), and writes the results as JSON. Passing an earlier
+results file as --baseline prints the change per stage, so regressions show up between commits.
+
+    python -m benchmarks.bench_pipeline [--scales small,medium,large] [--repeat 3] [--json results.json]
+                                        [--baseline previous.json]
+    python -m benchmarks.bench_pipeline --files 4 --services 10 --journey-patterns 8 --timing-links 40 \
+                                        --vehicle-journeys 50
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic_txc import write_stop_reference, write_txc_bundle
+from generate_outputs.output_hastus import create_outputs
+from process_txc import reference_cache
+from process_txc.read_txc import process_all_xml
+from process_txc.transform import transform_all_txc_tables
+
+# Generator arguments per named scale: TXC files, services per file, journey patterns per service, timing links per
+# journey pattern and vehicle journeys per journey pattern
+SCALES = {
+    'small': dict(files=2, services=2, journey_patterns=4, timing_links=12, vehicle_journeys=6),
+    'medium': dict(files=4, services=4, journey_patterns=8, timing_links=30, vehicle_journeys=20),
+    'large': dict(files=8, services=6, journey_patterns=12, timing_links=40, vehicle_journeys=40),
+}
+
+STAGES = ('process_all_xml', 'transform_all_txc_tables', 'create_outputs')
+
+# A stage this much slower than the baseline is flagged
+REGRESSION_THRESHOLD = 1.10
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    # prepare_stops finds the stop reference under <cwd>/app/static outside Lambda
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def run_pipeline(txc_dir, output_dir, output_mode, measure):
+    """Run the three stages in order, calling measure(stage, function, *args) around each one."""
+    tables = measure('process_all_xml', process_all_xml, txc_dir)
+    transformed = measure('transform_all_txc_tables', transform_all_txc_tables, tables)
+    measure('create_outputs', create_outputs, transformed, output_dir, output_mode)
+    return tables, transformed
+
+
+def run_scale(name, params, repeat, output_mode, workdir):
+    scale_dir = os.path.join(workdir, name)
+    txc_dir = os.path.join(scale_dir, 'txc')
+    output_dir = os.path.join(scale_dir, 'output')
+    write_txc_bundle(txc_dir, **params)
+    write_stop_reference(os.path.join(scale_dir, 'app', 'static'), **params)
+
+    seconds = {stage: [] for stage in STAGES}
+    peak_bytes = {}
+
+    def timed(stage, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds[stage].append(time.perf_counter() - start)
+        return result
+
+    def traced(stage, function, *args):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = function(*args)
+        peak_bytes[stage] = tracemalloc.get_traced_memory()[1] - before
+        return result
+
+    # The pipeline's progress output would drown the report
+    with working_directory(scale_dir), open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            reference_cache.clear()  # every run is a cold conversion
+            tables, transformed = run_pipeline(txc_dir, output_dir, output_mode, timed)
+
+        reference_cache.clear()
+        tracemalloc.start()
+        try:
+            run_pipeline(txc_dir, output_dir, output_mode, traced)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'scale': name,
+        'params': params,
+        'rows': {
+            'timing_links': len(tables['JourneyPatternTimingLinks']),
+            'vehicle_journeys': len(tables['VehicleJourneys']),
+            'trips': len(transformed['Trips']),
+        },
+        'txc_bytes': sum(entry.stat().st_size for entry in os.scandir(txc_dir)),
+        'stages': {
+            stage: {
+                'seconds': seconds[stage],
+                'median_seconds': statistics.median(seconds[stage]),
+                'peak_mib': peak_bytes[stage] / 1024 ** 2,
+            }
+            for stage in STAGES
+        },
+        # ru_maxrss is in KiB on Linux; the process high-water mark so far, so it only grows across scales
+        'max_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(result, baseline=None):
+    rows = result['rows']
+    print(f"{result['scale']}: {result['txc_bytes'] / 1024 ** 2:.1f} MiB TXC, {rows['timing_links']} timing links, "
+          f"{rows['vehicle_journeys']} vehicle journeys, {rows['trips']} trips, max RSS {result['max_rss_mib']:.0f} MiB")
+    for stage, numbers in result['stages'].items():
+        line = f"  {stage:<26} {numbers['median_seconds']:8.3f}s  peak {numbers['peak_mib']:8.1f} MiB"
+        previous = (baseline or {}).get(stage)
+        if previous:
+            ratio = numbers['median_seconds'] / previous['median_seconds']
+            flag = '⚠️ ' if ratio > REGRESSION_THRESHOLD else ''
+            line += f"  {flag}{ratio:.2f}x baseline time, {numbers['peak_mib'] - previous['peak_mib']:+.1f} MiB"
+        print(line)
+
+
+def run(scales, repeat, output_mode, json_path=None, baseline_path=None, workdir=None):
+    baseline = {}
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = {result['scale']: result['stages'] for result in json.load(f)['results']}
+
+    report = {
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': repeat,
+        'output_mode': output_mode,
+        'results': [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, params in scales.items():
+            result = run_scale(name, params, repeat, output_mode, workdir or tmp)
+            report['results'].append(result)
+            print_result(result, baseline.get(name))
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {json_path}")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='small,medium,large', help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument('--files', type=int, help='run one custom scale with this many TXC files')
+    parser.add_argument('--services', type=int, default=2, help='services per file (custom scale)')
+    parser.add_argument('--journey-patterns', type=int, default=4, help='journey patterns per service (custom scale)')
+    parser.add_argument('--timing-links', type=int, default=20, help='timing links per journey pattern (custom scale)')
+    parser.add_argument('--vehicle-journeys', type=int, default=10, help='journeys per journey pattern (custom scale)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per scale')
+    parser.add_argument('--output-mode', default='serial', help='create_outputs mode: serial, thread or process')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file from an earlier run to compare against')
+    parser.add_argument('--workdir', help='keep the generated TXC and outputs here instead of a temporary directory')
+    args = parser.parse_args()
+
+    if args.files:
+        selected = {'custom': dict(files=args.files, services=args.services, journey_patterns=args.journey_patterns,
+                                   timing_links=args.timing_links, vehicle_journeys=args.vehicle_journeys)}
+    else:
+        selected = {name: SCALES[name] for name in args.scales.split(',')}
+    run(selected, args.repeat, args.output_mode, args.json, args.baseline, args.workdir)
@@ -0,0 +1,74 @@
+"""Benchmark VehicleJourneyTimingLinks extraction on journeys with long per-journey timing links.
+
+Compares the previous per-field findall extraction with read_txc.parse_vehicle_journey on the same parsed journeys.
+
+    python -m benchmarks.bench_vehicle_journey_links [--links 200] [--journeys 40]
+"""
+import argparse
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from benchmarks.synthetic_txc import write_txc_bundle
+from helper.functions import get_text
+from helper.parameters import NAMESPACES
+from process_txc.read_txc import TABLE_NAMES, parse_vehicle_journey
+
+
+def legacy_timing_links(journey, dataid):
+    """The extraction as it was before: every field re-scans the whole journey for each link."""
+    return [
+        {
+            'DataId': dataid,
+            'VehicleJourneyCode': get_text(journey, 'txc:VehicleJourneyCode'),
+            'VehicleJourneyTimingLinkId': link.attrib.get('id') if journey.findall(
+                './/txc:VehicleJourneyTimingLink', NAMESPACES) else None,
+            'JourneyPatternTimingLinkRef': get_text(link, 'txc:JourneyPatternTimingLinkRef') if journey.findall(
+                './/txc:VehicleJourneyTimingLink', NAMESPACES) else None,
+            'VehicleJourneyTimingLinkPosition': idx + 1 if journey.findall(
+                './/txc:VehicleJourneyTimingLink', NAMESPACES) else None,
+            'RunTime': get_text(link, 'txc:RunTime') if journey.findall(
+                './/txc:RunTime', NAMESPACES) else None,
+            'FromActivity': get_text(link, 'txc:From/txc:Activity') if journey.findall(
+                './/txc:From/txc:Activity', NAMESPACES) else None,
+            'FromWaitTime': get_text(link, 'txc:From/txc:WaitTime') if journey.findall(
+                './/txc:From/txc:WaitTime', NAMESPACES) else None,
+            'ToActivity': get_text(link, 'txc:To/txc:Activity') if journey.findall(
+                './/txc:To/txc:Activity', NAMESPACES) else None,
+            'ToWaitTime': get_text(link, 'txc:To/txc:WaitTime') if journey.findall(
+                './/txc:To/txc:WaitTime', NAMESPACES) else None
+        }
+        for idx, link in enumerate(journey.findall('.//txc:VehicleJourneyTimingLink', NAMESPACES) or [{}])
+    ]
+
+
+def run(links, journeys):
+    with tempfile.TemporaryDirectory() as tmp:
+        [path] = write_txc_bundle(tmp, services=1, journey_patterns=2, timing_links=links,
+                                  vehicle_journeys=journeys)
+        vehicle_journeys = ET.parse(path).getroot().findall('.//txc:VehicleJourney', NAMESPACES)
+
+    start = time.perf_counter()
+    legacy_rows = [row for journey in vehicle_journeys for row in legacy_timing_links(journey, 1)]
+    legacy_time = time.perf_counter() - start
+
+    tables = {name: [] for name in TABLE_NAMES}
+    start = time.perf_counter()
+    for journey in vehicle_journeys:
+        parse_vehicle_journey(journey, 1, tables)
+    current_time = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(pd.DataFrame(legacy_rows), pd.DataFrame(tables['VehicleJourneyTimingLinks']))
+
+    print(f"{len(vehicle_journeys)} journeys, {len(legacy_rows)} timing link rows")
+    print(f"before: {legacy_time:.3f}s  after: {current_time:.3f}s  speed-up: {legacy_time / current_time:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--links', type=int, default=200, help='timing links per journey pattern')
+    parser.add_argument('--journeys', type=int, default=40, help='vehicle journeys per journey pattern')
+    args = parser.parse_args()
+    run(args.links, args.journeys)
@@ -0,0 +1,246 @@
+"""Synthetic TransXChange generator used by the benchmarks.
+
+The generated files follow the element layout that process_txc.read_txc.process_xml_file expects, so they can be
+fed through the full conversion pipeline. Stop reference data matching the generated stops can be written alongside.
+"""
+import os
+import random
+import xml.etree.ElementTree as ET
+
+from helper.parameters import NAMESPACES
+
+TXC_NS = NAMESPACES['txc']
+
+DAY_PATTERNS = [['MondayToFriday'], ['Saturday'], ['Sunday']]
+
+
+def _el(parent, tag, text=None, **attrib):
+    element = ET.SubElement(parent, f'{{{TXC_NS}}}{tag}', attrib)
+    if text is not None:
+        element.text = str(text)
+    return element
+
+
+def _stop_id(n):
+    return f"450A{n:08d}"
+
+
+def _coords(n):
+    return 53.7 + (n % 1000) * 0.0005, -1.6 + (n // 1000) * 0.0005
+
+
+def _format_time(total_seconds):
+    return f"{total_seconds // 3600:02}:{(total_seconds % 3600) // 60:02}:{total_seconds % 60:02}"
+
+
+def build_txc(file_index=0, services=2, journey_patterns=4, timing_links=20, vehicle_journeys=10,
+              journey_timing_links=True, seed=0):
+    """Build a TransXChange tree.
+
+    Each service has one line whose journey patterns are slices of a shared trunk of stops, alternating between
+    outbound and inbound, so subsection and variant rationalisation have duplicates and contained sequences to find.
+    Every journey pattern is split over two route sections / journey pattern sections and gets `vehicle_journeys`
+    journeys; when `journey_timing_links` is set every other journey carries its own VehicleJourneyTimingLinks.
+    """
+    rng = random.Random(seed * 7919 + file_index)
+    root = ET.Element(f'{{{TXC_NS}}}TransXChange')
+
+    serviced_orgs = _el(root, 'ServicedOrganisations')
+    org = _el(serviced_orgs, 'ServicedOrganisation')
+    _el(org, 'OrganisationCode', f'SCH{file_index}')
+    _el(org, 'Name', f'School {file_index}')
+    working_days = _el(org, 'WorkingDays')
+    for start, end in [('2025-04-01', '2025-04-11'), ('2025-04-22', '2025-05-23')]:
+        date_range = _el(working_days, 'DateRange')
+        _el(date_range, 'StartDate', start)
+        _el(date_range, 'EndDate', end)
+
+    stop_points = _el(root, 'StopPoints')
+    route_sections = _el(root, 'RouteSections')
+    routes = _el(root, 'Routes')
+    journey_pattern_sections = _el(root, 'JourneyPatternSections')
+
+    operators = _el(root, 'Operators')
+    operator = _el(operators, 'Operator', id=f'O{file_index}')
+    _el(operator, 'NationalOperatorCode', f'NOC{file_index}')
+    _el(operator, 'OperatorShortName', f'Operator {file_index}')
+    _el(operator, 'LicenceNumber', f'PB{file_index:07d}')
+
+    services_el = _el(root, 'Services')
+    vehicle_journeys_el = _el(root, 'VehicleJourneys')
+
+    trunk_length = timing_links + 1
+    stop_base = file_index * services * trunk_length
+    vj_number = 0
+
+    for s in range(services):
+        service_code = f'SVC{file_index}_{s}'
+        line_id = f'L{file_index}_{s}'
+        line_name = str(file_index * services + s + 1)
+        trunk = [stop_base + s * trunk_length + i for i in range(trunk_length)]
+
+        for n in trunk:
+            stop = _el(stop_points, 'AnnotatedStopPointRef')
+            _el(stop, 'StopPointRef', _stop_id(n))
+            _el(stop, 'CommonName', f'Stop {n}')
+            location = _el(stop, 'Location')
+            lat, lon = _coords(n)
+            _el(location, 'Longitude', f'{lon:.6f}')
+            _el(location, 'Latitude', f'{lat:.6f}')
+
+        service = _el(services_el, 'Service')
+        _el(service, 'ServiceCode', service_code)
+        lines = _el(service, 'Lines')
+        line = _el(lines, 'Line', id=line_id)
+        _el(line, 'LineName', line_name)
+        for direction, origin, destination in [('Outbound', 'Town', 'City'), ('Inbound', 'City', 'Town')]:
+            description = _el(line, f'{direction}Description')
+            _el(description, 'Origin', origin)
+            _el(description, 'Destination', destination)
+            _el(description, 'Description', f'{origin} to {destination}')
+        period = _el(service, 'OperatingPeriod')
+        _el(period, 'StartDate', '2025-04-01')
+        _el(period, 'EndDate', '2025-12-31')
+        profile = _el(service, 'OperatingProfile')
+        days = _el(_el(profile, 'RegularDayType'), 'DaysOfWeek')
+        _el(days, 'MondayToFriday')
+        bank_holidays = _el(profile, 'BankHolidayOperation')
+        _el(_el(bank_holidays, 'DaysOfNonOperation'), 'ChristmasDay')
+        _el(service, 'RegisteredOperatorRef', f'O{file_index}')
+        _el(_el(service, 'StopRequirements'), 'NoNewStopsRequired')
+        _el(service, 'Mode', 'bus')
+        standard_service = _el(service, 'StandardService')
+        _el(standard_service, 'Origin', 'Town')
+        _el(standard_service, 'Destination', 'City')
+        _el(_el(standard_service, 'Vias'), 'Via', 'Village')
+
+        for p in range(journey_patterns):
+            # Trim a few stops off either end of the trunk so later patterns are contained in earlier ones
+            trim_start = min((p // 2) % 3, max(trunk_length - 2, 0))
+            trim_end = min((p // 2) // 3 % 3, max(trunk_length - 2 - trim_start, 0))
+            stops = trunk[trim_start:trunk_length - trim_end]
+            direction = 'outbound' if p % 2 == 0 else 'inbound'
+            if direction == 'inbound':
+                stops = stops[::-1]
+
+            key = f'{file_index}_{s}_{p}'
+            route_id, jp_id = f'R{key}', f'JP{key}'
+            route = _el(routes, 'Route', id=route_id)
+            _el(route, 'Description', f'Route {key}')
+
+            split = max(len(stops) // 2, 1)
+            link_pairs = list(zip(stops[:-1], stops[1:]))
+            sections = [link_pairs[:split], link_pairs[split:]]
+            jp_section_ids = []
+            run_times = []
+
+            for sec_idx, pairs in enumerate(sections):
+                if not pairs:
+                    continue
+                rs_id, jps_id = f'RS{key}_{sec_idx}', f'JPS{key}_{sec_idx}'
+                _el(route, 'RouteSectionRef', rs_id)
+                jp_section_ids.append(jps_id)
+                route_section = _el(route_sections, 'RouteSection', id=rs_id)
+                jp_section = _el(journey_pattern_sections, 'JourneyPatternSection', id=jps_id)
+
+                for link_idx, (from_n, to_n) in enumerate(pairs):
+                    rl_id, jptl_id = f'RL{key}_{sec_idx}_{link_idx}', f'JPTL{key}_{sec_idx}_{link_idx}'
+                    route_link = _el(route_section, 'RouteLink', id=rl_id)
+                    _el(_el(route_link, 'From'), 'StopPointRef', _stop_id(from_n))
+                    _el(_el(route_link, 'To'), 'StopPointRef', _stop_id(to_n))
+                    _el(route_link, 'Distance', rng.randint(150, 900))
+                    _el(route_link, 'Direction', direction)
+                    if link_idx % 5 != 4:
+                        mapping = _el(_el(route_link, 'Track'), 'Mapping')
+                        for n in (from_n, to_n):
+                            location = _el(mapping, 'Location')
+                            lat, lon = _coords(n)
+                            _el(location, 'Latitude', f'{lat:.6f}')
+                            _el(location, 'Longitude', f'{lon:.6f}')
+
+                    position = stops.index(from_n)
+                    timing_link = _el(jp_section, 'JourneyPatternTimingLink', id=jptl_id)
+                    from_el = _el(timing_link, 'From')
+                    _el(from_el, 'Activity', 'pickUp' if position == 0 else 'pickUpAndSetDown')
+                    _el(from_el, 'StopPointRef', _stop_id(from_n))
+                    _el(from_el, 'TimingStatus', 'PTP' if position % 4 == 0 else 'OTH')
+                    if position % 6 == 3:
+                        _el(from_el, 'WaitTime', 'PT1M')
+                    to_el = _el(timing_link, 'To')
+                    _el(to_el, 'Activity', 'setDown' if position + 2 == len(stops) else 'pickUpAndSetDown')
+                    _el(to_el, 'StopPointRef', _stop_id(to_n))
+                    _el(to_el, 'TimingStatus',
+                        'PTP' if (position + 1) % 4 == 0 or position + 2 == len(stops) else 'OTH')
+                    _el(timing_link, 'RouteLinkRef', rl_id)
+                    run_time = rng.choice([60, 90, 120, 180])
+                    run_times.append((jptl_id, run_time))
+                    _el(timing_link, 'RunTime', f'PT{run_time // 60}M{run_time % 60}S' if run_time % 60 else f'PT{run_time // 60}M')
+                    _el(timing_link, 'Distance', rng.randint(150, 900))
+
+            journey_pattern = _el(standard_service, 'JourneyPattern', id=jp_id)
+            _el(journey_pattern, 'DestinationDisplay', 'City' if direction == 'outbound' else 'Town')
+            _el(journey_pattern, 'OperatorRef', f'O{file_index}')
+            _el(journey_pattern, 'Direction', direction)
+            _el(journey_pattern, 'RouteRef', route_id)
+            for jps_id in jp_section_ids:
+                _el(journey_pattern, 'JourneyPatternSectionRefs', jps_id)
+
+            first_departure = 5 * 3600 + p * 300
+            headway = max((19 * 3600) // max(vehicle_journeys, 1), 60)
+            for v in range(vehicle_journeys):
+                vj_number += 1
+                journey = _el(vehicle_journeys_el, 'VehicleJourney')
+                _el(journey, 'PrivateCode', f'PC{file_index}_{vj_number}')
+                _el(_el(_el(journey, 'Operational'), 'TicketMachine'), 'JourneyCode', f'{vj_number:04d}')
+                profile = _el(journey, 'OperatingProfile')
+                days = _el(_el(profile, 'RegularDayType'), 'DaysOfWeek')
+                for day in DAY_PATTERNS[v % len(DAY_PATTERNS)]:
+                    _el(days, day)
+                if v % 7 == 6:
+                    serviced = _el(_el(_el(profile, 'ServicedOrganisationDayType'), 'DaysOfOperation'), 'WorkingDays')
+                    _el(serviced, 'ServicedOrganisationRef', f'SCH{file_index}')
+                if v % 5 == 4:
+                    special = _el(_el(_el(profile, 'SpecialDaysOperation'), 'DaysOfNonOperation'), 'DateRange')
+                    _el(special, 'StartDate', '2025-12-24')
+                    _el(special, 'EndDate', '2025-12-26')
+                _el(journey, 'VehicleJourneyCode', f'VJ{file_index}_{vj_number}')
+                _el(journey, 'ServiceRef', service_code)
+                _el(journey, 'LineRef', line_id)
+                _el(journey, 'JourneyPatternRef', jp_id)
+                _el(journey, 'DepartureTime', _format_time(first_departure + v * headway))
+
+                if journey_timing_links and v % 2 == 1:
+                    for link_idx, (jptl_id, run_time) in enumerate(run_times):
+                        vj_link = _el(journey, 'VehicleJourneyTimingLink', id=f'VJTL{file_index}_{vj_number}_{link_idx}')
+                        _el(vj_link, 'JourneyPatternTimingLinkRef', jptl_id)
+                        _el(vj_link, 'RunTime', f'PT{run_time // 60 + 1}M')
+                        if link_idx % 8 == 7:
+                            _el(_el(vj_link, 'To'), 'WaitTime', 'PT2M')
+
+    return ET.ElementTree(root)
+
+
+def write_txc_bundle(directory, files=1, **kwargs):
+    """Write `files` synthetic TransXChange files to `directory` and return their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f'synthetic_{i:03d}.xml')
+        tree = build_txc(file_index=i, **kwargs)
+        ET.register_namespace('', TXC_NS)
+        tree.write(path, encoding='utf-8', xml_declaration=True)
+        paths.append(path)
+    return paths
+
+
+def write_stop_reference(static_dir, files=1, services=2, timing_links=20, **kwargs):
+    """Write a stop-codes.csv covering every stop generated by write_txc_bundle with the same arguments."""
+    os.makedirs(static_dir, exist_ok=True)
+    trunk_length = timing_links + 1
+    path = os.path.join(static_dir, 'stop-codes.csv')
+    with open(path, 'w') as f:
+        f.write('ATCOCode,NaptanCode,CommonName,LocalityName,Latitude,Longitude\n')
+        for n in range(files * services * trunk_length):
+            lat, lon = _coords(n)
+            f.write(f'{_stop_id(n)},wyo{n:05d},Stop {n},Locality {n // 50},{lat:.8f},{lon:.8f}\n')
+    return path
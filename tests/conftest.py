@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The application modules import each other relative to app/, as they do inside the Lambda image
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT_DIR, 'app')
+sys.path.insert(0, APP_DIR)
+# The tests build their TXC files with the benchmarks' synthetic generator
+sys.path.insert(0, ROOT_DIR)
@@ -0,0 +1,118 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_txc import TXC_NS, build_txc
+from process_txc import read_txc
+from process_txc.cache import LocalTableCache, file_cache_key
+from process_txc.read_txc import parse_files
+
+
+def write_txc(directory, filename, file_index, serviced_organisations=True):
+    """Write a small synthetic TXC file, optionally without serviced organisations, and return its path."""
+    tree = build_txc(file_index=file_index, services=1, journey_patterns=2, timing_links=4, vehicle_journeys=3)
+    if not serviced_organisations:
+        for parent in tree.getroot().iter():
+            for child in list(parent):
+                if child.tag in (f'{{{TXC_NS}}}ServicedOrganisations', f'{{{TXC_NS}}}ServicedOrganisationDayType'):
+                    parent.remove(child)
+    ET.register_namespace('', TXC_NS)
+    path = os.path.join(directory, filename)
+    tree.write(path, encoding='utf-8', xml_declaration=True)
+    return path
+
+
+@pytest.fixture
+def txc_dir(tmp_path):
+    directory = tmp_path / 'txc'
+    directory.mkdir()
+    write_txc(str(directory), 'a.xml', 0)
+    write_txc(str(directory), 'b.xml', 1, serviced_organisations=False)
+    return str(directory)
+
+
+def parse(directory, filenames, cache=None):
+    paths = [os.path.join(directory, filename) for filename in filenames]
+    return parse_files(paths, list(range(1, len(paths) + 1)), filenames, cache=cache)
+
+
+def assert_same_results(actual, expected):
+    assert len(actual) == len(expected)
+    for tables, expected_tables in zip(actual, expected):
+        assert tables.keys() == expected_tables.keys()
+        for name in expected_tables:
+            pd.testing.assert_frame_equal(tables[name], expected_tables[name], obj=name)
+
+
+def test_cold_and_warm_runs_give_the_parsed_tables(txc_dir, tmp_path, capsys):
+    cache = LocalTableCache(str(tmp_path / 'cache'))
+    uncached = parse(txc_dir, ['a.xml', 'b.xml'])
+    assert uncached[1]['ServicedOrganisations'].empty
+
+    assert_same_results(parse(txc_dir, ['a.xml', 'b.xml'], cache), uncached)
+    assert_same_results(parse(txc_dir, ['a.xml', 'b.xml'], cache), uncached)
+    printed = capsys.readouterr().out
+    assert "Loaded 0 of 2 file(s) from cache" in printed
+    assert "Loaded 2 of 2 file(s) from cache" in printed
+
+
+def test_cache_hit_takes_the_data_id_and_file_name_of_this_run(txc_dir, tmp_path, capsys):
+    cache = LocalTableCache(str(tmp_path / 'cache'))
+    parse(txc_dir, ['a.xml'], cache)
+
+    # The same content under another name, now the second file
+    os.rename(os.path.join(txc_dir, 'a.xml'), os.path.join(txc_dir, 'renamed.xml'))
+    results = parse(txc_dir, ['b.xml', 'renamed.xml'], cache)
+
+    assert "Loaded 1 of 2 file(s) from cache" in capsys.readouterr().out
+    assert_same_results(results, parse(txc_dir, ['b.xml', 'renamed.xml']))
+    assert results[1]['ImportSummary']['FileName'].tolist() == ['renamed.xml']
+    assert set(results[1]['VehicleJourneys']['DataId']) == {2}
+
+
+def test_changed_file_misses_the_cache(txc_dir, tmp_path, capsys):
+    cache = LocalTableCache(str(tmp_path / 'cache'))
+    parse(txc_dir, ['a.xml', 'b.xml'], cache)
+    key = file_cache_key(os.path.join(txc_dir, 'a.xml'), read_txc.READER_VERSION)
+
+    write_txc(txc_dir, 'a.xml', 2)
+    assert file_cache_key(os.path.join(txc_dir, 'a.xml'), read_txc.READER_VERSION) != key
+    results = parse(txc_dir, ['a.xml', 'b.xml'], cache)
+
+    assert "Loaded 1 of 2 file(s) from cache" in capsys.readouterr().out
+    assert_same_results(results, parse(txc_dir, ['a.xml', 'b.xml']))
+
+
+def test_reader_version_bump_invalidates_entries(txc_dir, tmp_path, monkeypatch, capsys):
+    cache = LocalTableCache(str(tmp_path / 'cache'))
+    parse(txc_dir, ['a.xml', 'b.xml'], cache)
+
+    monkeypatch.setattr(read_txc, 'READER_VERSION', read_txc.READER_VERSION + 1)
+    parse(txc_dir, ['a.xml', 'b.xml'], cache)
+
+    assert "Loaded 0 of 2 file(s) from cache" in capsys.readouterr().out.splitlines()[-1]
+
+
+class BrokenCache:
+    """A cache whose storage fails, e.g. an S3 bucket the function may not use."""
+
+    def get(self, key):
+        raise OSError("read failed")
+
+    def put(self, key, tables):
+        raise OSError("write failed")
+
+    def evict(self):
+        raise OSError("list failed")
+
+
+def test_broken_cache_falls_back_to_parsing(txc_dir, capsys):
+    results = parse(txc_dir, ['a.xml', 'b.xml'], BrokenCache())
+
+    assert_same_results(results, parse(txc_dir, ['a.xml', 'b.xml']))
+    printed = capsys.readouterr().out
+    assert "Could not read a.xml from cache (read failed), parsing it" in printed
+    assert "Could not cache b.xml: write failed" in printed
+    assert "Could not evict old cache entries: list failed" in printed
@@ -0,0 +1,175 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+from shapely.geometry import LineString
+
+from process_txc.incremental import LocalState, S3State, get_line, put_line, relabel_data_ids, stable_variant_codes
+
+BUCKET = 'state-bucket'
+
+
+def variant_links(variants):
+    """VariantLinks of {VariantCode: [stop, ...]}, each variant a run of links between its stops."""
+    rows = []
+    for code, stops in variants.items():
+        for position, (from_stop, to_stop) in enumerate(zip(stops, stops[1:]), 1):
+            rows.append({
+                'VariantCode': code, 'JourneyPatternTimingLinkPositionInJourneyPattern': position,
+                'Direction': 'outbound', 'FromStopPointId': from_stop, 'ToStopPointId': to_stop,
+                'FromTP': position == 1, 'ToTP': to_stop == stops[-1],
+            })
+    return {'VariantLinks': pd.DataFrame(rows)}
+
+
+def test_unchanged_variants_keep_their_codes_when_their_rank_changes():
+    registry = {}
+    first = stable_variant_codes('1', variant_links({'1-1': ['A', 'B', 'C'], '1-2': ['A', 'B']}), registry)
+    assert first == {'1-1': '1-1', '1-2': '1-2'}
+
+    # The short variant now ranks first
+    second = stable_variant_codes('1', variant_links({'1-1': ['A', 'B'], '1-2': ['A', 'B', 'C']}), registry)
+    assert second == {'1-1': '1-2', '1-2': '1-1'}
+
+
+def test_new_variants_get_numbers_the_line_has_not_used():
+    registry = {}
+    stable_variant_codes('1', variant_links({'1-1': ['A', 'B', 'C'], '1-2': ['A', 'B'], '1-3': ['B', 'C']}), registry)
+
+    # 1-2 and 1-3 are gone and a new variant comes, so it can't reuse either number
+    codes = stable_variant_codes('1', variant_links({'1-1': ['A', 'B', 'C'], '1-2': ['C', 'D']}), registry)
+    assert codes == {'1-1': '1-1', '1-2': '1-4'}
+    assert len(registry) == 4
+
+
+def test_variants_with_the_same_signature_get_different_codes():
+    registry = {}
+    codes = stable_variant_codes('1', variant_links({'1-1': ['A', 'B'], '1-2': ['A', 'B']}), registry)
+    assert codes == {'1-1': '1-1', '1-2': '1-2'}
+
+
+def test_relabel_data_ids():
+    tables = {
+        'TripSubSections': pd.DataFrame({
+            'DataId': [1, 2, 2],
+            'BaseJourneyPatternDataId': [1, 1, 2],
+            'JourneyPatternSubSectionId': ['1_JPS1_1', '2_JPS1_1', None],
+            'LineName': ['1', '1', '1'],
+        }),
+    }
+    relabelled = relabel_data_ids(tables, {1: 5, 2: 12})['TripSubSections']
+
+    assert relabelled['DataId'].tolist() == [5, 12, 12]
+    assert relabelled['BaseJourneyPatternDataId'].tolist() == [5, 5, 12]
+    assert relabelled['JourneyPatternSubSectionId'].tolist()[:2] == ['5_JPS1_1', '12_JPS1_1']
+    assert pd.isna(relabelled['JourneyPatternSubSectionId'].iloc[2])
+    assert relabelled['DataId'].dtype == tables['TripSubSections']['DataId'].dtype
+    # Nothing to do when every DataId stays the same
+    assert relabel_data_ids(tables, {1: 1, 2: 2}) is tables
+
+
+def line_tables():
+    return {
+        'VariantLinks': pd.DataFrame({
+            'LineName': pd.Series(['1', '1', '1'], dtype='category'),
+            'Path': [LineString([(-1.5491, 53.8008), (-1.5502, 53.8011)]), None, 'not a path'],
+            'Distance': [120.5, np.nan, 80.0],
+            'JourneyPatternSubSectionPosition': pd.Series([1, 2, 3], dtype=object),
+            'RunTime': pd.array([60, None, 90], dtype='Int64'),
+        }),
+        'Trips': pd.DataFrame({
+            'LineName': ['1', '1'],
+            'OperatingDays': pd.Series([np.nan, None], dtype=object),
+            'Stops': [['A', 'B'], ['B']],
+        }),
+    }
+
+
+def assert_line_round_trips(state):
+    sources = pd.DataFrame({'DataId': [1, 2], 'ServiceCode': ['PB0001', 'PB0002']})
+    tables = line_tables()
+    put_line(state, 'abc', sources, tables)
+    stored_sources, stored = get_line(state, 'abc')
+
+    pd.testing.assert_frame_equal(stored_sources, sources)
+    for name, df in tables.items():
+        pd.testing.assert_frame_equal(stored[name], df)
+    # NaN and None stay apart, they are written differently
+    assert np.isnan(stored['Trips']['OperatingDays'].iloc[0])
+    assert stored['Trips']['OperatingDays'].iloc[1] is None
+    assert stored['VariantLinks']['Path'].iloc[0].equals_exact(tables['VariantLinks']['Path'].iloc[0], 0)
+    assert get_line(state, 'missing') is None
+
+    assert state.get_registry() == {}
+    assert state.update_registry(lambda registry: registry.setdefault('1', {}).update({'f00d': '1-1'})) is None
+    assert state.get_registry() == {'1': {'f00d': '1-1'}}
+    # The registry is not an entry, so eviction can't remove it
+    assert [key for key, _, _ in state.entries()] == ['line-abc']
+
+
+def test_line_round_trips_through_local_state(tmp_path):
+    assert_line_round_trips(LocalState(str(tmp_path / 'state')))
+
+
+def test_local_registry_updates_do_not_lose_each_other(tmp_path):
+    state = LocalState(str(tmp_path / 'state'))
+
+    def add_codes(run):
+        for n in range(20):
+            # Read, then yield to the other run before writing, as an overlapping run would
+            state.update_registry(lambda registry: (time.sleep(0.001), registry.update({f'{run}-{n}': n})))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(add_codes, ['a', 'b']))
+
+    assert len(state.get_registry()) == 40
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def test_line_round_trips_through_s3_state(s3_client):
+    assert_line_round_trips(S3State(s3_client, BUCKET, 'state/incremental'))
+
+
+def test_registry_update_retries_when_another_run_writes_first(s3_client):
+    state = S3State(s3_client, BUCKET, 'state/incremental')
+    other_run = S3State(s3_client, BUCKET, 'state/incremental')
+    links = variant_links({'1-1': ['A', 'B', 'C'], '1-2': ['C', 'D']})
+    other_links = variant_links({'1-1': ['A', 'B', 'C'], '1-2': ['D', 'E']})
+    attempts = []
+
+    def give_out_codes(registry):
+        if not attempts:
+            # Another run gives out 1-2 between this run's read and write; the same happens again once written
+            other_run.update_registry(lambda registry: stable_variant_codes('1', other_links, registry.setdefault('1', {})))
+        attempts.append(dict(registry))
+        return stable_variant_codes('1', links, registry.setdefault('1', {}))
+
+    codes = state.update_registry(give_out_codes)
+
+    assert len(attempts) == 2
+    # Both new variants keep a number of their own
+    assert codes == {'1-1': '1-1', '1-2': '1-3'}
+    assert sorted(state.get_registry()['1'].values()) == ['1-1', '1-2', '1-3']
+
+
+def test_registry_update_gives_up_when_the_registry_keeps_changing(s3_client):
+    state = S3State(s3_client, BUCKET, 'state/incremental')
+
+    def interrupted(registry):
+        S3State(s3_client, BUCKET, 'state/incremental').update_registry(lambda registry: registry.update(n=len(registry)))
+
+    with pytest.raises(RuntimeError, match='kept changing'):
+        state.update_registry(interrupted, attempts=2)
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+from generate_outputs.output_hastus import (
+    hastus_locations, hastus_rt_version, hastus_rte_distances, hastus_rte_version, hastus_trips
+)
+
+# One line with an outbound variant A-B-C and an inbound one C-B-A; stop D has no place
+STOPS = pd.DataFrame({
+    'StopPointId': ['450A0001', '450A0002', '450A0003', '450A0004'],
+    'NaptanCode': ['wyoa', 'wyob', 'wyoc', 'wyod'],
+    'CommonName': ['Bus Station', 'Market Street', 'Infirmary Street Stand Z', 'Depot'],
+    'LocalityName': ['Leeds', 'Leeds', 'Leeds', 'Headingley'],
+    'Latitude': [53.79551234, 53.7960005, 53.8, 53.81923456],
+    'Longitude': [-1.54912345, -1.5502, -1.546789, -1.58],
+    'Place': ['LDBS', 'LDMK', 'LDIN', None],
+})
+
+VARIANT_STOPS = {'1-1': ('outbound', ['450A0001', '450A0002', '450A0003']),
+                 '1-2': ('inbound', ['450A0003', '450A0002', '450A0001'])}
+
+
+def variant_points():
+    rows = []
+    for code, (direction, stops) in VARIANT_STOPS.items():
+        for position, stop in enumerate(stops):
+            rows.append({
+                'DataId': 1, 'LineName': '1', 'VariantCode': code, 'Direction': direction,
+                'RouteSectionPosition': 1, 'RouteLinkPosition': position + 1,
+                'JourneyPatternTimingLinkPositionInJourneyPattern': position,
+                'OutboundDescriptionShort': 'Leeds - Leeds General Infirmary' if direction == 'outbound' else None,
+                'InboundDescriptionShort': None,
+                'DestinationDisplay': 'Bus Station',
+                'StopPointId': stop, 'TP': position != 1,
+                'CommonName': STOPS.set_index('StopPointId').loc[stop, 'CommonName'],
+            })
+    return pd.DataFrame(rows)
+
+
+def variant_links():
+    rows = []
+    for code, (direction, stops) in VARIANT_STOPS.items():
+        for position, (from_stop, to_stop) in enumerate(zip(stops, stops[1:])):
+            rows.append({
+                'LineId': 'L1', 'VariantId': f'V{code}', 'LineName': '1', 'VariantCode': code, 'Direction': direction,
+                'FromStopPointId': from_stop, 'ToStopPointId': to_stop,
+                'Distance': np.nan if (code, position) == ('1-2', 1) else 250.25 * (position + 1),
+            })
+    return pd.DataFrame(rows)
+
+
+# (VehicleJourneyCode, VariantCode, DayType, DepartureTime, OperatingDays): VJ1 and VJ2 leave at the same time,
+# VJ3 after midnight, VJ4 has no times and VJ5 no operating days
+TRIPS = [
+    ('VJ1', '1-1', 'Weekday', 7 * 3600, [1, 1, 1, 1, 1, 0, 0]),
+    ('VJ2', '1-1', 'Weekday', 7 * 3600, [1, 1, 1, 1, 0, 0, 0]),
+    ('VJ3', '1-2', 'Weekday', 24 * 3600 + 35 * 60, [1, 1, 1, 1, 1, 0, 0]),
+    ('VJ4', '1-1', 'Weekday', None, [1, 1, 1, 1, 1, 0, 0]),
+    ('VJ5', '1-2', 'Saturday', 9 * 3600 + 15 * 60, np.nan),
+    ('VJ6', '1-1', 'Saturday', 8 * 3600 + 5 * 60, [0, 0, 0, 0, 0, 1, 0]),
+]
+
+# Run time to each stop of a variant, and the wait at its middle stop
+RUN_TIMES = [0, 600, 1380]
+WAIT_TIMES = {'VJ1': 120, 'VJ3': 60}
+
+
+def trips():
+    rows = []
+    for code, variant, day_type, departure, days in TRIPS:
+        direction, stops = VARIANT_STOPS[variant]
+        rows.append({
+            'DataId': 1, 'LineId': 'L1', 'VariantId': f'V{variant}', 'VehicleJourneyCode': code, 'LineName': '1',
+            'VariantCode': variant, 'Direction': direction, 'HASTUSDirection': '5' if direction == 'outbound' else '4',
+            'FromStopPointId': stops[0], 'ToStopPointId': stops[-1], 'DepartureTime': departure,
+            'RunTimeSec': RUN_TIMES[-1], 'DayType': day_type, 'OperatingDays': days,
+        })
+    df = pd.DataFrame(rows)
+    df['DepartureTime'] = df['DepartureTime'].astype('Int64')
+    df['ArrivalTime'] = df['DepartureTime'] + df['RunTimeSec']
+    return df
+
+
+def trip_stops():
+    rows = []
+    for code, variant, day_type, departure, days in TRIPS:
+        for position, stop in enumerate(VARIANT_STOPS[variant][1]):
+            rows.append({
+                'DataId': 1, 'VehicleJourneyCode': code, 'StopPointId': stop, 'TP': True,
+                'CumulativeRunTimeSecs': RUN_TIMES[position],
+                'WaitTime': WAIT_TIMES.get(code, 0) if position == 1 else 0,
+            })
+    return pd.DataFrame(rows)
+
+
+def trip_subsections():
+    rows = []
+    for code, variant, day_type, departure, days in TRIPS:
+        if departure is None:
+            continue
+        stops = VARIANT_STOPS[variant][1]
+        for position, (from_stop, to_stop) in enumerate(zip(stops, stops[1:])):
+            rows.append({
+                'DataId': 1, 'VehicleJourneyCode': code, 'LineName': '1', 'VariantCode': variant, 'DayType': day_type,
+                'BaseJourneyPatternSubSectionId': f'1_{variant}_{position + 1}',
+                'DepartureTime': departure + RUN_TIMES[position],
+                'FromStopPointId': from_stop, 'ToStopPointId': to_stop,
+                'RunTimeSec': float(RUN_TIMES[position + 1] - RUN_TIMES[position]),
+            })
+    return pd.DataFrame(rows)
+
+
+def read_output(directory, name):
+    with open(directory / name) as f:
+        return f.read()
+
+
+def test_route_version(tmp_path):
+    hastus_rte_version(variant_points(), tmp_path)
+
+    assert read_output(tmp_path, 'route_version.txt') == (
+        "route_version|WYOR-IMP|West Yorkshire Import from TXC\n"
+        "route|WYOR-IMP|0|1|Bus Station|4|0|4|1\n"
+        "rvariant|1|5|1-1|Bus Station to Infirmary Street Sta|1-1\n"
+        "rvpoint|0001|1|1|1-1\n"
+        "rvpoint|0002|0||1-1\n"
+        "rvpoint|0003|1|1|1-1\n"
+        "rvariant|1|4|1-2|Infirmary Street Sta to Bus Station|1-2\n"
+        "rvpoint|0003|1|1|1-2\n"
+        "rvpoint|0002|0||1-2\n"
+        "rvpoint|0001|1|1|1-2"
+    )
+
+
+def test_route_itinerary(tmp_path):
+    hastus_rte_distances(variant_links(), tmp_path)
+
+    assert read_output(tmp_path, 'route_itinerary.txt') == (
+        "variant_itinerary|0001|0002|821.0|WYOR-IMP|1|1-1|5|1|1\n"
+        "variant_itinerary|0002|0003|1642.1|WYOR-IMP|1|1-1|5|1|1\n"
+        "variant_itinerary|0002|0001||WYOR-IMP|1|1-2|4|1|1\n"
+        "variant_itinerary|0003|0002|821.0|WYOR-IMP|1|1-2|4|1|1\n"
+    )
+
+
+def test_runtime_version(tmp_path):
+    hastus_rt_version(trip_stops(), trip_subsections(), STOPS, tmp_path)
+
+    # VJ1 and VJ2 leave together, so the weekday periods of 1-1 split a minute after them
+    assert read_output(tmp_path, 'runtime_version.txt') == (
+        "runtime_version|WYOR-IMP_6\n"
+        "runtime_period|1|1-1|LDBS|LDMK|10|0:00|36:00\n"
+        "runtime_period|1|1-1|LDMK|LDIN|13|0:00|36:00\n"
+        "runtime_period|1|1-2|LDIN|LDMK|10|0:00|36:00\n"
+        "runtime_period|1|1-2|LDMK|LDBS|13|0:00|36:00\n"
+        "load_time|LDBS|0:00|36:00|0|1|1-1\n"
+        "load_time|LDIN|0:00|36:00|0|1|1-1\n"
+        "load_time|LDMK|0:00|36:00|0|1|1-1\n"
+        "load_time|LDBS|0:00|36:00|0|1|1-2\n"
+        "load_time|LDIN|0:00|36:00|0|1|1-2\n"
+        "load_time|LDMK|0:00|36:00|0|1|1-2\n"
+        "runtime_version|WYOR-IMP_1\n"
+        "runtime_period|1|1-1|LDBS|LDMK|10|0:00|7:00\n"
+        "runtime_period|1|1-1|LDBS|LDMK|10|7:01|36:00\n"
+        "runtime_period|1|1-1|LDMK|LDIN|13|0:00|7:10\n"
+        "runtime_period|1|1-1|LDMK|LDIN|13|7:11|36:00\n"
+        "runtime_period|1|1-2|LDIN|LDMK|10|0:00|36:00\n"
+        "runtime_period|1|1-2|LDMK|LDBS|13|0:00|36:00\n"
+        "load_time|LDBS|0:00|7:00|0|1|1-1\n"
+        "load_time|LDIN|0:00|7:10|0|1|1-1\n"
+        "load_time|LDMK|0:00|7:00|2|1|1-1\n"
+        "load_time|LDBS|7:01|36:00|0|1|1-1\n"
+        "load_time|LDIN|7:11|36:00|0|1|1-1\n"
+        "load_time|LDMK|7:01|36:00|0|1|1-1\n"
+        "load_time|LDMK|7:11|36:00|0|1|1-1\n"
+        "load_time|LDBS|0:00|36:00|0|1|1-2\n"
+        "load_time|LDIN|0:00|36:00|0|1|1-2\n"
+        "load_time|LDMK|0:00|36:00|1|1|1-2\n"
+    )
+
+
+def test_trips(tmp_path, capsys):
+    hastus_trips(trips(), trip_stops(), STOPS, tmp_path)
+
+    # Trips are numbered day type by day type in departure order, VJ1 before VJ2 as they leave together. VJ5 (2)
+    # and VJ4 (6) can't be written but keep their numbers
+    assert read_output(tmp_path, 'trips.txt') == (
+        "vehicle_schedule|IMP_SAT|Saturday Import from TXC|0|5|WYOR-IMP|WYOR-IMP_6\n"
+        "trip|1|1|1|1-1|0|5|LDBS|LDIN|08:05|08:28|0|0|0|0|0|1|0\n"
+        "trip_tp|LDBS|1|08:05|1\n"
+        "trip_tp|LDMK|1|08:15|1\n"
+        "trip_tp|LDIN|1|08:28|1\n"
+        "vehicle_schedule|IMP_WKD|Weekday Import from TXC|0|0|WYOR-IMP|WYOR-IMP_1\n"
+        "trip|3|1|3|1-1|0|5|LDBS|LDIN|07:00|07:23|1|1|1|1|1|0|0\n"
+        "trip_tp|LDBS|3|07:00|1\n"
+        "trip_tp|LDMK|3|07:10|1\n"
+        "trip_tp|LDMK|3|07:12|1\n"
+        "trip_tp|LDIN|3|07:23|1\n"
+        "trip|4|1|4|1-1|0|5|LDBS|LDIN|07:00|07:23|1|1|1|1|0|0|0\n"
+        "trip_tp|LDBS|4|07:00|1\n"
+        "trip_tp|LDMK|4|07:10|1\n"
+        "trip_tp|LDIN|4|07:23|1\n"
+        "trip|5|1|5|1-2|0|4|LDIN|LDBS|24:35|24:58|1|1|1|1|1|0|0\n"
+        "trip_tp|LDIN|5|24:35|1\n"
+        "trip_tp|LDMK|5|24:45|1\n"
+        "trip_tp|LDMK|5|24:46|1\n"
+        "trip_tp|LDBS|5|24:58|1\n"
+    )
+    printed = capsys.readouterr().out
+    assert "Error writing trip 2: no OperatingDays" in printed
+    assert "Error writing trip 6: no DepartureTime or ArrivalTime" in printed
+
+
+def test_locations(tmp_path):
+    hastus_locations(STOPS, tmp_path)
+
+    assert read_output(tmp_path, 'locations.txt') == (
+        "place|LDBS|Leeds, Bus Station\n"
+        "place|LDMK|Leeds, Market Street\n"
+        "place|LDIN|Leeds, Infirmary Street Stand Z\n"
+        "stop|0001|Leeds, Bus Station|LDBS\n"
+        "stop_location|0001|Leeds, Bus Station|53.795512|-1.549123|1\n"
+        "stop|0002|Leeds, Market Street|LDMK\n"
+        "stop_location|0002|Leeds, Market Street|53.796|-1.5502|1\n"
+        "stop|0003|Leeds, Infirmary Street Stand Z|LDIN\n"
+        "stop_location|0003|Leeds, Infirmary Street Stand Z|53.8|-1.546789|1\n"
+        "stop|0004|Headingley, Depot|\n"
+        "stop_location|0004|Headingley, Depot|53.819235|-1.58|1\n"
+    )
@@ -0,0 +1,149 @@
+import io
+import os
+import zipfile
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from benchmarks.synthetic_txc import write_txc_bundle
+from process_txc.read_txc import process_all_xml
+from process_txc.sources import S3ObjectReader, open_s3_object, open_source, txc_files
+
+BUCKET = 'input-bucket'
+
+
+@pytest.fixture
+def txc_dir(tmp_path):
+    """Three synthetic TXC files, the last with an upper-case extension."""
+    paths = write_txc_bundle(str(tmp_path / 'txc'), files=3, services=1, journey_patterns=2, timing_links=4,
+                             vehicle_journeys=3)
+    os.rename(paths[-1], paths[-1][:-len('.xml')] + '.XML')
+    return str(tmp_path / 'txc')
+
+
+def read_files(txc_dir):
+    """{file name: content} of the TXC files in txc_dir."""
+    files = {}
+    for filename in sorted(os.listdir(txc_dir)):
+        with open(os.path.join(txc_dir, filename), 'rb') as f:
+            files[filename] = f.read()
+    return files
+
+
+def zip_bytes(members):
+    """A ZIP archive of {member name: content}."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def nested_zip_bytes(files):
+    """The last file at the top of the archive and the others in a ZIP inside a ZIP, so they sort in the same order,
+    with a directory and macOS resource forks to skip."""
+    *others, last = files
+    inner = zip_bytes({f'timetables/{name}': files[name] for name in others})
+    middle = zip_bytes({'inner.zip': inner, '__MACOSX/inner.zip': b'not a zip'})
+    return zip_bytes({last: files[last], 'bundles/': b'', 'bundles/middle.zip': middle,
+                      '__MACOSX/bundles/._middle.zip': b'not a zip', 'readme.txt': b'not TXC'})
+
+
+def assert_same_tables(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name], obj=name)
+
+
+def test_flat_zip_gives_the_tables_of_the_directory(txc_dir, tmp_path):
+    zip_path = tmp_path / 'flat.zip'
+    zip_path.write_bytes(zip_bytes(read_files(txc_dir)))
+
+    assert_same_tables(process_all_xml(str(zip_path)), process_all_xml(txc_dir))
+
+
+def test_nested_zip_gives_the_tables_of_the_directory(txc_dir, tmp_path):
+    zip_path = tmp_path / 'nested.zip'
+    zip_path.write_bytes(nested_zip_bytes(read_files(txc_dir)))
+
+    with txc_files(str(zip_path)) as files:
+        assert [filename for filename, _ in files] == ['synthetic_000.xml', 'synthetic_001.xml', 'synthetic_002.XML']
+        assert str(files[0][1]) == 'bundles/middle.zip/inner.zip/timetables/synthetic_000.xml'
+
+    assert_same_tables(process_all_xml(str(zip_path)), process_all_xml(txc_dir))
+
+
+def test_nested_archives_are_open_only_while_read(txc_dir, tmp_path):
+    zip_path = tmp_path / 'nested.zip'
+    zip_path.write_bytes(nested_zip_bytes(read_files(txc_dir)))
+
+    with txc_files(str(zip_path)) as files:
+        nested = files[0][1].archive
+        # Listing closes every nested archive again
+        assert nested.archive is None and nested.parent.archive is None
+
+        with open_source(files[0][1]) as f:
+            assert f.read() == read_files(txc_dir)['synthetic_000.xml']
+        assert nested.opened == [nested.parent, nested]
+
+        # The next file is in the same nested archive, which stays open for it
+        assert files[1][1].archive is nested
+        with open_source(files[1][1]) as f:
+            assert f.read() == read_files(txc_dir)['synthetic_001.xml']
+        assert nested.opened == [nested.parent, nested]
+
+        # The top-level file is read straight from the outer archive
+        with open_source(files[2][1]) as f:
+            assert f.read() == read_files(txc_dir)['synthetic_002.XML']
+    assert nested.opened == [] and nested.archive is None
+
+
+def test_zip_without_txc_files_is_an_error(tmp_path):
+    zip_path = tmp_path / 'empty.zip'
+    zip_path.write_bytes(zip_bytes({'readme.txt': b'not TXC', 'inner.zip': zip_bytes({'notes.txt': b''})}))
+
+    with pytest.raises(FileNotFoundError, match='No TXC files'):
+        with txc_files(str(zip_path)):
+            pass
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def test_s3_zip_gives_the_tables_of_the_local_zip(txc_dir, tmp_path, s3_client):
+    data = nested_zip_bytes(read_files(txc_dir))
+    zip_path = tmp_path / 'nested.zip'
+    zip_path.write_bytes(data)
+    s3_client.put_object(Bucket=BUCKET, Key='uploads/nested.zip', Body=data)
+
+    # A small buffer, so the archive is read in many ranged GETs
+    with open_s3_object(s3_client, BUCKET, 'uploads/nested.zip', buffer_size=4096) as source:
+        tables = process_all_xml(source)
+
+    assert_same_tables(tables, process_all_xml(str(zip_path)))
+
+
+def test_s3_object_reader_seeks_and_reads(s3_client):
+    s3_client.put_object(Bucket=BUCKET, Key='data.bin', Body=bytes(range(100)))
+    reader = S3ObjectReader(s3_client, BUCKET, 'data.bin')
+
+    assert reader.size == 100 and reader.name == f's3://{BUCKET}/data.bin'
+    assert reader.read(5) == bytes(range(5))
+    assert reader.seek(10, io.SEEK_CUR) == 15
+    assert reader.read(3) == bytes([15, 16, 17])
+    assert reader.seek(-4, io.SEEK_END) == 96
+    # Reads stop at the end of the object
+    assert reader.read(10) == bytes([96, 97, 98, 99])
+    assert reader.read(10) == b''
+    assert reader.seek(200) == 200 and reader.read(1) == b''
+    with pytest.raises(ValueError):
+        reader.seek(-1)
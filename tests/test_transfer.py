@@ -0,0 +1,53 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from generate_outputs.transfer import MIN_PART_SIZE, S3StreamWriter, open_output
+
+BUCKET = 'output-bucket'
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def read_object(s3_client, key):
+    return s3_client.get_object(Bucket=BUCKET, Key=key)['Body'].read().decode('utf-8')
+
+
+def test_small_output_is_a_single_put(s3_client):
+    with open_output(f's3://{BUCKET}/converted/trips.txt', s3_client) as f:
+        f.write('trip|1\n')
+        f.write('trip_tp|000000|1|05:57|1\n')
+
+    assert f.upload_id is None
+    assert read_object(s3_client, 'converted/trips.txt') == 'trip|1\ntrip_tp|000000|1|05:57|1\n'
+
+
+def test_large_output_is_a_multipart_upload(s3_client):
+    line = 'trip_tp|000000|1|05:57|1\n'
+    lines = MIN_PART_SIZE * 2 // len(line) + 10
+
+    with S3StreamWriter(s3_client, BUCKET, 'converted/trips.txt', part_size=MIN_PART_SIZE) as f:
+        for _ in range(lines):
+            f.write(line)
+
+    assert [part['PartNumber'] for part in f.parts] == [1, 2, 3]
+    assert f.bytes_written == lines * len(line)
+    assert read_object(s3_client, 'converted/trips.txt') == line * lines
+
+
+def test_failed_output_aborts_the_upload(s3_client):
+    with pytest.raises(RuntimeError):
+        with S3StreamWriter(s3_client, BUCKET, 'converted/trips.txt', part_size=MIN_PART_SIZE) as f:
+            f.write('x' * (MIN_PART_SIZE + 1))
+            raise RuntimeError('writer failed')
+
+    assert 'Contents' not in s3_client.list_objects_v2(Bucket=BUCKET)
+    assert 'Uploads' not in s3_client.list_multipart_uploads(Bucket=BUCKET)
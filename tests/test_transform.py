@@ -0,0 +1,125 @@
+from itertools import combinations
+
+import pandas as pd
+import pytest
+
+from process_txc.identifiers import decode_identifiers, intern_identifiers
+from process_txc.transform import find_minimal_subsection_set
+
+KEY_COLUMNS = ["LineName", "DataId", "JourneyPatternId", "JourneyPatternSubSectionId", "JourneyPatternSubSectionPosition"]
+
+
+def pairwise_minimal_subsection_set(trip_patterns):
+    """find_minimal_subsection_set as it was before: every pair of subsections compared."""
+    grouped_stops = trip_patterns.drop_duplicates(
+        subset=["DataId", "JourneyPatternId", "JourneyPatternSectionId", "JourneyPatternSubSectionId",
+                "RouteLinkPosition"]
+    )
+    grouped_stops = (
+        grouped_stops.sort_values([
+            "LineName", "DataId", "JourneyPatternId",
+            "JourneyPatternSubSectionPosition", "JourneyPatternTimingLinkPositionInJourneyPattern"
+        ])
+        .groupby(KEY_COLUMNS, as_index=False)
+        .agg({"FromStopPointId": list, "ToStopPointId": "last"})
+    )
+    grouped_stops["Stops"] = grouped_stops["FromStopPointId"] + grouped_stops["ToStopPointId"].apply(lambda x: [x])
+
+    contained_map = {}
+    all_subsections = set(map(tuple, grouped_stops[KEY_COLUMNS].values))
+    covered_subsections = set()
+    for row1, row2 in combinations(list(grouped_stops.itertuples(index=False)), 2):
+        if row1.LineName != row2.LineName:
+            continue
+        if row1.Stops == row2.Stops:
+            key1 = (row1.LineName, row1.DataId, row1.JourneyPatternId,
+                    row1.JourneyPatternSubSectionId, row1.JourneyPatternSubSectionPosition)
+            key2 = (row2.LineName, row2.DataId, row2.JourneyPatternId,
+                    row2.JourneyPatternSubSectionId, row2.JourneyPatternSubSectionPosition)
+            contained_map[key1] = key2
+            covered_subsections.add(key1)
+
+    def resolve_mapping(subsection):
+        visited = set()
+        while subsection in contained_map:
+            if subsection in visited:
+                break
+            visited.add(subsection)
+            subsection = contained_map[subsection]
+        return subsection
+
+    subsection_mapping = pd.DataFrame(
+        [(*key, resolve_mapping(key)[3]) for key in all_subsections],
+        columns=KEY_COLUMNS + ["BaseJourneyPatternSubSectionId"]
+    )
+    minimal_route_links = trip_patterns.merge(
+        pd.DataFrame(list(all_subsections - covered_subsections), columns=KEY_COLUMNS), on=KEY_COLUMNS, how="inner"
+    )
+    return minimal_route_links, subsection_mapping
+
+
+def subsection_links(line, data_id, pattern, position, stops, section='S1'):
+    """Timing link rows of one subsection running through stops."""
+    subsection = f"{data_id}-{pattern}-{position}"
+    return [
+        {
+            'LineName': line, 'DataId': data_id, 'JourneyPatternId': pattern, 'JourneyPatternSectionId': section,
+            'JourneyPatternSubSectionId': subsection, 'JourneyPatternSubSectionPosition': position,
+            'JourneyPatternTimingLinkPositionInJourneyPattern': position * 10 + link, 'RouteLinkPosition': link + 1,
+            'FromStopPointId': from_stop, 'ToStopPointId': to_stop,
+        }
+        for link, (from_stop, to_stop) in enumerate(zip(stops, stops[1:]))
+    ]
+
+
+@pytest.fixture
+def trip_patterns():
+    a, b, c, d, e = 'StopA', 'StopB', 'StopC', 'StopD', 'StopE'
+    links = (
+        # Line 1: a-b-c is repeated across patterns, and across files, so three subsections share one base
+        subsection_links('1', 1, 'JP1', 1, [a, b, c])
+        + subsection_links('1', 1, 'JP1', 2, [c, d, e])
+        + subsection_links('1', 1, 'JP2', 1, [a, b, c])
+        + subsection_links('1', 1, 'JP2', 2, [c, d])
+        + subsection_links('1', 2, 'JP1', 1, [a, b, c])
+        # ... and c-d-e is repeated within one pattern
+        + subsection_links('1', 2, 'JP1', 2, [c, d, e])
+        + subsection_links('1', 2, 'JP1', 3, [c, d, e])
+        # Line 2 runs a-b-c as well, but subsections are only shared within a line
+        + subsection_links('2', 1, 'JP3', 1, [a, b, c])
+        + subsection_links('2', 1, 'JP3', 2, [e, d, c])
+        + subsection_links('2', 1, 'JP4', 1, [e, d, c])
+    )
+    # A timing link listed twice, as happens when journeys share it
+    links.append(dict(links[0]))
+    return pd.DataFrame(links).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def sorted_rows(df, columns):
+    return df.sort_values(columns).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('interned', [False, True])
+def test_find_minimal_subsection_set_matches_pairwise(trip_patterns, interned):
+    expected_links, expected_mapping = pairwise_minimal_subsection_set(trip_patterns)
+
+    tables = {'TripPatterns': trip_patterns.copy()}
+    if interned:
+        tables = intern_identifiers(tables)
+    minimal_links, subsection_mapping = (decode_identifiers(df) for df in find_minimal_subsection_set(tables['TripPatterns']))
+
+    mapping_columns = KEY_COLUMNS + ["BaseJourneyPatternSubSectionId"]
+    pd.testing.assert_frame_equal(
+        sorted_rows(subsection_mapping[mapping_columns], mapping_columns),
+        sorted_rows(expected_mapping[mapping_columns], mapping_columns),
+    )
+    link_columns = list(trip_patterns.columns)
+    pd.testing.assert_frame_equal(
+        sorted_rows(minimal_links[link_columns], link_columns),
+        sorted_rows(expected_links[link_columns], link_columns),
+    )
+
+    bases = dict(zip(subsection_mapping['JourneyPatternSubSectionId'], subsection_mapping['BaseJourneyPatternSubSectionId']))
+    assert bases['1-JP1-1'] == bases['1-JP2-1'] == bases['2-JP1-1'] == '2-JP1-1'
+    assert bases['2-JP1-2'] == bases['2-JP1-3'] == '2-JP1-3'
+    assert bases['1-JP3-1'] == '1-JP3-1'